@@ -0,0 +1,122 @@
+// Browser side of the resumable upload protocol in
+// video_segment_splitter/api/resumable.py.
+//
+// The upload ID of every file is remembered in localStorage, so a retry
+// after a dropped connection or a page reload only sends the chunks the
+// server is still missing.
+(function () {
+  const PARALLEL_CHUNKS = 3;
+  const MAX_ATTEMPTS = 5;
+
+  const storageKey = (file) =>
+    `clipshift-upload:${file.name}:${file.size}:${file.lastModified}`;
+
+  const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+  async function withRetry(send) {
+    for (let attempt = 1; ; attempt++) {
+      try {
+        const response = await send();
+        if (response.ok || response.status < 500) {
+          return response;
+        }
+      } catch (error) {
+        if (attempt >= MAX_ATTEMPTS) {
+          throw error;
+        }
+      }
+      if (attempt >= MAX_ATTEMPTS) {
+        throw new Error("Upload failed after " + MAX_ATTEMPTS + " attempts");
+      }
+      await sleep(500 * 2 ** attempt);
+    }
+  }
+
+  // Sessions belong to the tab's client token; one saved by another tab
+  // is unknown to this one, and a new session is opened instead.
+  async function openSession(apiUrl, file, headers) {
+    const saved = localStorage.getItem(storageKey(file));
+    if (saved) {
+      const response = await withRetry(() =>
+        fetch(`${apiUrl}/_upload/sessions/${saved}`, { headers }),
+      );
+      if (response.ok) {
+        return response.json();
+      }
+    }
+    const response = await withRetry(() =>
+      fetch(`${apiUrl}/_upload/sessions`, {
+        method: "POST",
+        headers: { ...headers, "Content-Type": "application/json" },
+        body: JSON.stringify({ filename: file.name, size: file.size }),
+      }),
+    );
+    if (!response.ok) {
+      throw new Error(`Could not start upload: ${response.status}`);
+    }
+    const session = await response.json();
+    localStorage.setItem(storageKey(file), session.upload_id);
+    return session;
+  }
+
+  async function sendChunks(apiUrl, file, session, headers) {
+    const queue = [...session.missing];
+    const worker = async () => {
+      while (queue.length > 0) {
+        const index = queue.shift();
+        const start = index * session.chunk_size;
+        const chunk = file.slice(start, start + session.chunk_size);
+        const response = await withRetry(() =>
+          fetch(`${apiUrl}/_upload/sessions/${session.upload_id}/chunks/${index}`, {
+            method: "PUT",
+            headers,
+            body: chunk,
+          }),
+        );
+        if (!response.ok) {
+          throw new Error(`Chunk ${index} was rejected: ${response.status}`);
+        }
+      }
+    };
+    await Promise.all(Array.from({ length: PARALLEL_CHUNKS }, worker));
+  }
+
+  // Upload files and hand them to a state event handler, like
+  // rx.upload_files does. options: {apiUrl, handler, onError}; onError
+  // gets the message when the upload gives up.
+  window.clipshiftResumableUpload = async (files, options) => {
+    if (!files || files.length === 0) {
+      return;
+    }
+    const apiUrl = options.apiUrl.replace(/\/$/, "");
+    const token = window.sessionStorage.getItem("token");
+    const headers = { "Reflex-Client-Token": token };
+    try {
+      const uploadIds = [];
+      for (const file of files) {
+        const session = await openSession(apiUrl, file, headers);
+        await sendChunks(apiUrl, file, session, headers);
+        uploadIds.push(session.upload_id);
+      }
+      const response = await withRetry(() =>
+        fetch(`${apiUrl}/_upload/complete`, {
+          method: "POST",
+          headers: {
+            "Content-Type": "application/json",
+            "Reflex-Client-Token": token,
+            "Reflex-Event-Handler": options.handler,
+          },
+          body: JSON.stringify({ upload_ids: uploadIds }),
+        }),
+      );
+      if (!response.ok) {
+        throw new Error(`Could not finish upload: ${response.status}`);
+      }
+      for (const file of files) {
+        localStorage.removeItem(storageKey(file));
+      }
+    } catch (error) {
+      options.onError(error.message);
+    }
+  };
+})();
@@ -0,0 +1,330 @@
+"""Benchmark the split, thumbnail and ZIP stages without the UI.
+
+Synthetic sources (ffmpeg testsrc video with a sine tone) are generated
+for every resolution and duration asked for, then each split mode runs the
+pipeline's own code on them:
+
+- split: plan_segments and encode_segments, as run_split_job does
+  (without the split cache, so every run encodes);
+- thumbnail: attach_cover of every part's cover into a copy of the part;
+- zip: stream_zip of all parts, as served by /_zip.
+
+Every stage records wall time, CPU time (this process and its ffmpeg
+children, from getrusage), peak RSS (this process plus its live
+children, sampled every RSS_SAMPLE_INTERVAL) and bytes written to storage
+(getrusage block writes; tmpfs reports 0, use --workdir on a disk).
+
+Results are printed as JSON. --save-baseline writes them to a file, and
+--baseline compares a run with such a file and exits with status 1 if a
+stage got slower than --tolerance allows. Baselines only compare runs on
+the same machine.
+
+    poetry run python benchmarks/split_pipeline.py --save-baseline bench.json
+    poetry run python benchmarks/split_pipeline.py --baseline bench.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from contextlib import aclosing
+from pathlib import Path
+
+import psutil
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from video_segment_splitter.api.zip_stream import stream_zip  # noqa: E402
+from video_segment_splitter.services.encode_profiles import (  # noqa: E402
+    get_encode_profile,
+)
+from video_segment_splitter.services.mp4_cover import (  # noqa: E402
+    attach_cover,
+    read_cover,
+)
+from video_segment_splitter.services.splitter import (  # noqa: E402
+    encode_segments,
+    equal_cut_points,
+    get_ffmpeg_path,
+    plan_segments,
+    run_ffmpeg,
+    segment_filename,
+)
+
+RSS_SAMPLE_INTERVAL = 0.05
+
+# Measurements compared with the baseline, and the least absolute change
+# that counts, so noise on tiny values is not reported.
+COMPARED = {"wall_seconds": 0.05, "cpu_seconds": 0.05, "peak_rss": 16 * 1024 * 1024}
+
+
+async def _make_source(ffmpeg: str, path: Path, duration: int, size: str) -> None:
+    # A keyframe every two seconds, so fast mode has cuts to snap to.
+    returncode, stderr = await run_ffmpeg(
+        ffmpeg,
+        "-y",
+        "-f", "lavfi", "-i", f"testsrc=size={size}:rate=25",
+        "-f", "lavfi", "-i", "sine=frequency=440",
+        "-t", str(duration),
+        "-c:v", "libx264", "-preset", "veryfast", "-g", "50",
+        "-c:a", "aac",
+        "-loglevel", "error",
+        str(path),
+    )
+    if returncode != 0:
+        raise RuntimeError(stderr.decode())
+
+
+def _rusage() -> tuple[float, int]:
+    """(CPU seconds, bytes written) of this process and its reaped children."""
+    cpu = 0.0
+    blocks = 0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        cpu += usage.ru_utime + usage.ru_stime
+        blocks += usage.ru_oublock
+    return cpu, blocks * 512
+
+
+class _PeakRss:
+    """Sample the RSS of this process and its children in a thread."""
+
+    def __init__(self):
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        me = psutil.Process()
+        while not self._stop.is_set():
+            rss = 0
+            for process in [me, *me.children(recursive=True)]:
+                try:
+                    rss += process.memory_info().rss
+                except psutil.Error:
+                    pass
+            self.peak = max(self.peak, rss)
+            self._stop.wait(RSS_SAMPLE_INTERVAL)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+async def _measure(run) -> dict:
+    cpu_before, written_before = _rusage()
+    with _PeakRss() as rss:
+        started = time.perf_counter()
+        await run()
+        wall = time.perf_counter() - started
+    cpu_after, written_after = _rusage()
+    return {
+        "wall_seconds": round(wall, 3),
+        "cpu_seconds": round(cpu_after - cpu_before, 3),
+        "peak_rss": rss.peak,
+        "bytes_written": written_after - written_before,
+    }
+
+
+async def _split(ffmpeg, source, duration, segments, mode, profile, out_dir) -> list:
+    specs = await plan_segments(
+        str(source), out_dir, "bench", equal_cut_points(duration, segments), mode
+    )
+    async with aclosing(
+        encode_segments(ffmpeg, str(source), specs, mode, profile=profile)
+    ) as parts:
+        async for _ in parts:
+            pass
+    return specs
+
+
+async def _thumbnails(parts: list[Path], covers: list[bytes]) -> None:
+    for path, cover in zip(parts, covers):
+        await asyncio.to_thread(attach_cover, path, cover)
+
+
+async def _zip(parts: list[Path]) -> int:
+    entries = [(path, segment_filename("bench", i + 1)) for i, path in enumerate(parts)]
+    size = 0
+    async for chunk in stream_zip(entries):
+        size += len(chunk)
+    return size
+
+
+async def _run_case(ffmpeg, source, duration, size, mode, args, work: Path) -> list:
+    profile = get_encode_profile(args.profile)
+    case = {"size": size, "duration": duration, "mode": mode}
+    results = []
+    for _ in range(args.repeat):
+        shutil.rmtree(work, ignore_errors=True)
+        work.mkdir()
+        os.sync()
+        specs = []
+
+        async def split():
+            specs[:] = await _split(
+                ffmpeg, source, duration, args.segments, mode, profile, work
+            )
+
+        runs = {"split": await _measure(split)}
+        parts = [spec.path for spec in specs]
+
+        # Onto copies, so every repeat starts from the encoder's output.
+        covers = []
+        copies = []
+        for path in parts:
+            cover = await asyncio.to_thread(read_cover, path)
+            if cover is None:
+                continue
+            copy = path.with_suffix(".thumb.mp4")
+            await asyncio.to_thread(shutil.copyfile, path, copy)
+            covers.append(cover)
+            copies.append(copy)
+        if copies:
+            runs["thumbnail"] = await _measure(lambda: _thumbnails(copies, covers))
+
+        zip_size = 0
+
+        async def zip_parts():
+            nonlocal zip_size
+            zip_size = await _zip(parts)
+
+        runs["zip"] = await _measure(zip_parts)
+        runs["split"]["output_bytes"] = sum(path.stat().st_size for path in parts)
+        runs["zip"]["output_bytes"] = zip_size
+        for stage, measured in runs.items():
+            results.append({"stage": stage, **case, **measured})
+    return _medians(results)
+
+
+def _medians(results: list[dict]) -> list[dict]:
+    """One result per stage and case, with the median of every figure."""
+    grouped: dict[str, list[dict]] = {}
+    for result in results:
+        grouped.setdefault(_key(result), []).append(result)
+    merged = []
+    for runs in grouped.values():
+        merged.append(
+            {
+                key: (
+                    statistics.median(run[key] for run in runs)
+                    if isinstance(value, (int, float)) and key != "duration"
+                    else value
+                )
+                for key, value in runs[0].items()
+            }
+        )
+    return merged
+
+
+def _key(result: dict) -> str:
+    return f"{result['stage']}/{result['mode']}/{result['size']}/{result['duration']}s"
+
+
+def compare(results: list[dict], baseline: list[dict], tolerance: float) -> list[str]:
+    """Regressions of results against baseline, one line each."""
+    before = {_key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        old = before.get(_key(result))
+        if old is None:
+            continue
+        for name, least in COMPARED.items():
+            new_value, old_value = result.get(name, 0), old.get(name, 0)
+            if new_value - old_value > max(least, old_value * tolerance):
+                regressions.append(
+                    f"{_key(result)}: {name} {old_value} -> {new_value}"
+                    f" (+{(new_value / old_value - 1) * 100 if old_value else 100:.0f}%)"
+                )
+    return regressions
+
+
+def _environment(ffmpeg: str) -> dict:
+    return {
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "ffmpeg": ffmpeg,
+    }
+
+
+def _split_list(value: str) -> list[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="640x360,1280x720,1920x1080")
+    parser.add_argument("--durations", default="20,60", help="seconds")
+    parser.add_argument(
+        "--modes",
+        default="precise,single_pass,fast" if shutil.which("ffprobe") else "precise,single_pass",
+        help="fast mode needs ffprobe",
+    )
+    parser.add_argument("--segments", type=int, default=6)
+    parser.add_argument("--profile", default="preview")
+    parser.add_argument("--repeat", type=int, default=1, help="report the median of N runs")
+    parser.add_argument("--workdir", default=None, help="must not be tmpfs")
+    parser.add_argument("--save-baseline", type=Path)
+    parser.add_argument("--baseline", type=Path)
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="allowed slowdown, 0.2 = 20%%"
+    )
+    args = parser.parse_args()
+
+    ffmpeg = get_ffmpeg_path()
+    results = []
+    with tempfile.TemporaryDirectory(dir=args.workdir or Path.cwd()) as tmp:
+        for size in _split_list(args.sizes):
+            for duration in map(int, _split_list(args.durations)):
+                # The source is generated with an exact -t, so its duration
+                # is known without probing.
+                source = Path(tmp) / f"source_{size}_{duration}.mp4"
+                await _make_source(ffmpeg, source, duration, size)
+                for mode in _split_list(args.modes):
+                    print(f"{mode} {size} {duration}s", file=sys.stderr)
+                    results += await _run_case(
+                        ffmpeg, source, duration, size, mode, args, Path(tmp) / "parts"
+                    )
+                source.unlink()
+
+    report = {
+        "environment": _environment(ffmpeg),
+        "settings": {
+            "segments": args.segments,
+            "profile": args.profile,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.save_baseline:
+        args.save_baseline.write_text(json.dumps(report, indent=2))
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        if baseline.get("settings") != report["settings"]:
+            print("Baseline was made with other settings", file=sys.stderr)
+        regressions = compare(results, baseline["results"], args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            return 1
+        print("No regressions against the baseline", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
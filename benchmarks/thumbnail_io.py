@@ -0,0 +1,156 @@
+"""Compare bytes written per split with and without the thumbnail rewrite.
+
+"before" reproduces the old pipeline: encode each part, then extract a PNG
+and remux the whole part into a new file to attach it. "after" runs the
+current split engine, which writes the attached_pic during the encode.
+
+Bytes written are the storage writes of all ffmpeg child processes as
+reported by getrusage (Linux, block-backed filesystem; tmpfs reports 0).
+
+    poetry run python benchmarks/thumbnail_io.py --duration 30 --segments 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from contextlib import aclosing
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from video_segment_splitter.services.splitter import (  # noqa: E402
+    encode_segments,
+    equal_cut_points,
+    get_ffmpeg_path,
+    plan_segments,
+    run_ffmpeg,
+)
+
+
+def _children_bytes_written() -> int:
+    return resource.getrusage(resource.RUSAGE_CHILDREN).ru_oublock * 512
+
+
+async def _make_source(ffmpeg: str, path: Path, duration: int, size: str) -> None:
+    returncode, stderr = await run_ffmpeg(
+        ffmpeg,
+        "-y",
+        "-f", "lavfi", "-i", f"testsrc=size={size}:rate=25",
+        "-f", "lavfi", "-i", "sine=frequency=440",
+        "-t", str(duration),
+        "-c:v", "libx264", "-preset", "veryfast",
+        "-c:a", "aac",
+        "-loglevel", "error",
+        str(path),
+    )
+    if returncode != 0:
+        raise RuntimeError(stderr.decode())
+
+
+async def _legacy_embed_thumbnail(ffmpeg: str, segment_path: Path) -> None:
+    thumb_path = segment_path.with_suffix(".thumb.png")
+    muxed_path = segment_path.with_suffix(".muxed.mp4")
+    await run_ffmpeg(
+        ffmpeg, "-y", "-i", str(segment_path), "-vframes", "1", "-an",
+        "-loglevel", "error", str(thumb_path),
+    )
+    await run_ffmpeg(
+        ffmpeg, "-y", "-i", str(segment_path), "-i", str(thumb_path),
+        "-map", "0", "-map", "1", "-c", "copy", "-c:v:1", "png",
+        "-disposition:v:1", "attached_pic", "-loglevel", "error", str(muxed_path),
+    )
+    os.replace(muxed_path, segment_path)
+    thumb_path.unlink()
+
+
+async def _split_before(
+    ffmpeg: str, source: Path, duration: float, out_dir: Path, segments: int
+) -> None:
+    cuts = equal_cut_points(duration, segments)
+    for i in range(segments):
+        part = out_dir / f"before_part_{i + 1:03d}.mp4"
+        await run_ffmpeg(
+            ffmpeg, "-y", "-ss", str(cuts[i]), "-i", str(source),
+            "-t", str(cuts[i + 1] - cuts[i]), "-c:v", "libx264", "-c:a", "aac",
+            "-vf", "setpts=PTS-STARTPTS", "-af", "asetpts=PTS-STARTPTS",
+            "-loglevel", "error", str(part),
+        )
+        await _legacy_embed_thumbnail(ffmpeg, part)
+
+
+async def _split_after(
+    ffmpeg: str, source: Path, duration: float, out_dir: Path, segments: int, mode: str
+) -> None:
+    cuts = equal_cut_points(duration, segments)
+    specs = await plan_segments(str(source), out_dir, f"after_{mode}", cuts, mode)
+    async with aclosing(encode_segments(ffmpeg, str(source), specs, mode)) as parts:
+        async for _ in parts:
+            pass
+
+
+async def _measure(label: str, out_dir: Path, run) -> dict:
+    for f in out_dir.glob("*.mp4"):
+        f.unlink()
+    os.sync()
+    written_before = _children_bytes_written()
+    started = time.perf_counter()
+    await run()
+    wall = time.perf_counter() - started
+    output_bytes = sum(f.stat().st_size for f in out_dir.glob("*.mp4"))
+    return {
+        "pipeline": label,
+        "wall_seconds": round(wall, 3),
+        "bytes_written": _children_bytes_written() - written_before,
+        "output_bytes": output_bytes,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=int, default=30)
+    parser.add_argument("--segments", type=int, default=5)
+    parser.add_argument("--size", default="1280x720")
+    parser.add_argument("--workdir", default=None, help="must not be tmpfs")
+    args = parser.parse_args()
+
+    ffmpeg = get_ffmpeg_path()
+    with tempfile.TemporaryDirectory(dir=args.workdir or Path.cwd()) as tmp:
+        source = Path(tmp) / "source.mp4"
+        work = Path(tmp) / "parts"
+        work.mkdir()
+        # The source is generated with an exact -t, so its duration is known
+        # without probing (ffprobe may not be installed).
+        await _make_source(ffmpeg, source, args.duration, args.size)
+
+        results = [
+            await _measure(
+                "before", work,
+                lambda: _split_before(
+                    ffmpeg, source, args.duration, work, args.segments
+                ),
+            )
+        ]
+        for mode in ("precise", "single_pass"):
+            results.append(
+                await _measure(
+                    f"after:{mode}", work,
+                    lambda mode=mode: _split_after(
+                        ffmpeg, source, args.duration, work, args.segments, mode
+                    ),
+                )
+            )
+
+    for result in results:
+        result["bytes_written_per_output_byte"] = round(
+            result["bytes_written"] / max(1, result["output_bytes"]), 2
+        )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,116 @@
+import asyncio
+import itertools
+import time
+
+import pytest
+
+from video_segment_splitter.services import jobs
+from video_segment_splitter.services.jobs import JobStore
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    # One second per call, so jobs are created in a well-defined order.
+    clock = itertools.count(1_000_000)
+    monkeypatch.setattr(jobs.time, "time", lambda: float(next(clock)))
+    return JobStore(tmp_path / "jobs.db")
+
+
+def test_claim_next_takes_the_oldest_job(store):
+    first = store.add("alice", "split", {})
+    store.add("alice", "split", {})
+
+    job = store.claim_next("worker", limit=2)
+
+    assert job.id == first
+    assert store.get(first).status == "running"
+
+
+def test_claim_next_respects_the_limit(store):
+    store.add("alice", "split", {})
+    waiting = store.add("bob", "split", {})
+    store.claim_next("worker", limit=1)
+
+    assert store.claim_next("worker", limit=1) is None
+    assert store.get(waiting).status == "queued"
+
+
+def test_claim_next_counts_cancelling_jobs_against_the_limit(store):
+    running = store.add("alice", "split", {})
+    store.add("bob", "split", {})
+    store.claim_next("worker", limit=1)
+    assert store.cancel(running) == "cancelling"
+
+    assert store.claim_next("worker", limit=1) is None
+
+
+def test_claim_next_serves_owners_with_fewer_running_jobs_first(store):
+    store.add("alice", "split", {})
+    alice_second = store.add("alice", "split", {})
+    bob = store.add("bob", "split", {})
+    store.claim_next("worker", limit=3)
+
+    assert store.claim_next("worker", limit=3).id == bob
+    assert store.claim_next("worker", limit=3).id == alice_second
+
+
+def test_queue_positions_follow_claim_order(store):
+    store.add("alice", "split", {})
+    queued = [
+        store.add("alice", "split", {}),
+        store.add("alice", "split", {}),
+        store.add("bob", "split", {}),
+    ]
+    store.claim_next("worker", limit=4)
+
+    positions = [store.get(job_id).position for job_id in queued]
+
+    assert positions == [1, 2, 0]
+    claimed = [store.claim_next("worker", limit=4).id for _ in queued]
+    assert claimed == [queued[2], queued[0], queued[1]]
+
+
+def test_heartbeat_leaves_a_finished_job_alone(store):
+    job_id = store.add("alice", "split", {})
+    store.claim_next("worker", limit=1)
+    store.finish(job_id, "done", {"ok": True}, usage={"cpu_seconds": 5})
+
+    status = store.heartbeat(job_id, 0.5, None, [{"part": 1}], {"cpu_seconds": 1})
+
+    job = store.get(job_id)
+    assert status == "done"
+    assert (job.progress, job.usage) == (1, {"cpu_seconds": 5})
+    assert store.outputs(job_id) == []
+
+
+def test_run_waits_for_a_heartbeat_in_flight_and_survives_failures(store, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_POLL_INTERVAL", 0.01)
+    beats = []
+    heartbeat = store.heartbeat
+
+    def flaky_heartbeat(job_id, progress, detail, outputs, usage):
+        beats.append(list(outputs))
+        if len(beats) == 1:
+            raise RuntimeError("database is locked")
+        # Still saving while the runner returns.
+        time.sleep(0.05)
+        return heartbeat(job_id, progress, detail, outputs, usage)
+
+    monkeypatch.setattr(store, "heartbeat", flaky_heartbeat)
+
+    async def runner(params, report):
+        report(0.5, outputs=[{"part": 1}])
+        await asyncio.sleep(0.1)
+        return {"ok": True}
+
+    queue = jobs.JobQueue(store)
+    queue.register("split", runner)
+    job_id = store.add("alice", "split", {})
+    asyncio.run(queue._run(store.claim_next("worker", limit=1)))
+
+    job = store.get(job_id)
+    assert job.status == "done"
+    assert job.progress == 1
+    # The outputs of the failed beat went with the next one.
+    assert beats[0] == beats[1] == [{"part": 1}]
+    assert store.outputs(job_id) == []
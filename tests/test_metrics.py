@@ -0,0 +1,80 @@
+import pytest
+
+from video_segment_splitter.services import metrics
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    # Metrics created by a test stay out of the app's registry.
+    monkeypatch.setattr(metrics, "_registry", [])
+
+
+def test_counter_exposition():
+    counter = metrics.Counter("test_bytes_total", "Bytes seen.", ["method"])
+    counter.inc("form", amount=1024)
+    counter.inc("form", amount=0.5)
+    counter.inc("chunk")
+
+    assert counter.render() == [
+        "# HELP test_bytes_total Bytes seen.",
+        "# TYPE test_bytes_total counter",
+        'test_bytes_total{method="form"} 1024.5',
+        'test_bytes_total{method="chunk"} 1',
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = metrics.Histogram("test_seconds", "Time taken.", ["kind"], buckets=(1, 0.5))
+    for value in (0.2, 0.7, 0.9, 3):
+        histogram.observe(value, "split")
+
+    assert histogram.render() == [
+        "# HELP test_seconds Time taken.",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{kind="split",le="0.5"} 1',
+        'test_seconds_bucket{kind="split",le="1"} 3',
+        'test_seconds_bucket{kind="split",le="+Inf"} 4',
+        'test_seconds_sum{kind="split"} 4.8',
+        'test_seconds_count{kind="split"} 4',
+    ]
+
+
+def test_histogram_time_observes_a_raising_block():
+    histogram = metrics.Histogram("test_block_seconds", "Time taken.")
+
+    with pytest.raises(RuntimeError):
+        with histogram.time():
+            raise RuntimeError
+
+    assert "test_block_seconds_count 1" in histogram.render()
+
+
+def test_gauge_is_collected_at_render():
+    values = {("queued",): 2}
+    gauge = metrics.Gauge("test_jobs", "Jobs.", lambda: values, ["status"])
+    values = {("queued",): 3, ("running",): 1}
+
+    assert gauge.render()[2:] == [
+        'test_jobs{status="queued"} 3',
+        'test_jobs{status="running"} 1',
+    ]
+
+
+def test_label_values_are_escaped():
+    counter = metrics.Counter("test_total", "Escaping.", ["name"])
+    counter.inc('a "quoted"\\path\nnext')
+
+    assert counter.render()[2] == 'test_total{name="a \\"quoted\\"\\\\path\\nnext"} 1'
+
+
+def test_render_metrics_joins_every_metric():
+    metrics.Counter("test_a_total", "A.").inc()
+    metrics.Counter("test_b_total", "B.")
+
+    assert metrics.render_metrics() == (
+        "# HELP test_a_total A.\n"
+        "# TYPE test_a_total counter\n"
+        "test_a_total 1\n"
+        "# HELP test_b_total B.\n"
+        "# TYPE test_b_total counter\n"
+    )
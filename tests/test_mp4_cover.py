@@ -0,0 +1,67 @@
+import struct
+
+import pytest
+
+from video_segment_splitter.services.mp4_cover import attach_cover, read_cover
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"png pixels"
+JPEG = b"\xff\xd8\xff\xe0" + b"jpeg pixels"
+
+
+def box(kind: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+
+# ffmpeg's layout: ftyp, mdat, then moov at the end.
+FTYP = box(b"ftyp", b"isom\0\0\2\0isomiso2avc1mp41")
+MDAT = box(b"mdat", b"\1" * 64)
+MVHD = box(b"mvhd", b"\0" * 100)
+
+
+@pytest.fixture
+def mp4(tmp_path):
+    path = tmp_path / "part.mp4"
+    path.write_bytes(FTYP + MDAT + box(b"moov", MVHD))
+    return path
+
+
+def test_read_cover_of_a_file_without_cover(mp4):
+    assert read_cover(mp4) is None
+
+
+def test_attach_cover_round_trips_and_keeps_media_data(mp4):
+    attach_cover(mp4, PNG)
+
+    assert read_cover(mp4) == PNG
+    data = mp4.read_bytes()
+    assert data.startswith(FTYP + MDAT)
+    moov = data[len(FTYP + MDAT):]
+    assert struct.unpack_from(">I4s", moov) == (len(moov), b"moov")
+    assert MVHD in moov
+
+
+def test_attach_cover_tags_the_image_type(mp4):
+    attach_cover(mp4, JPEG)
+
+    data = mp4.read_bytes()
+    covr = data.index(b"covr")
+    # covr, then its data atom: size, "data", type, locale.
+    assert struct.unpack_from(">4sI", data, covr + 8) == (b"data", 13)
+
+
+def test_attach_cover_replaces_an_existing_cover(mp4):
+    attach_cover(mp4, PNG)
+    attach_cover(mp4, JPEG)
+
+    assert read_cover(mp4) == JPEG
+    assert mp4.read_bytes().count(b"covr") == 1
+
+
+def test_attach_cover_refuses_moov_before_media_data(tmp_path):
+    path = tmp_path / "faststart.mp4"
+    original = FTYP + box(b"moov", MVHD) + MDAT
+    path.write_bytes(original)
+
+    with pytest.raises(ValueError):
+        attach_cover(path, PNG)
+    assert path.read_bytes() == original
@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from video_segment_splitter.services import probe
+
+# ffprobe -of json output for a phone clip stored sideways.
+HEADERS = """{
+    "programs": [],
+    "streams": [
+        {
+            "codec_name": "h264",
+            "width": 1920,
+            "height": 1080,
+            "r_frame_rate": "30/1",
+            "avg_frame_rate": "30000/1001",
+            "duration": "12.012000",
+            "side_data_list": [{"side_data_type": "Display Matrix", "rotation": -90}]
+        }
+    ],
+    "format": {"duration": "12.045000", "bit_rate": "8123456"}
+}
+"""
+
+# ffprobe -show_entries packet=pts_time,flags -of csv=p=0 output: keyframes
+# flagged K_, delta frames __, and a packet without a timestamp.
+PACKETS = """0.000000,K_
+0.033367,__
+2.002000,K_
+N/A,K_
+1.001000,__
+4.004000,K_D
+"""
+
+
+@pytest.fixture
+def ffprobe(monkeypatch):
+    calls = []
+
+    async def run_ffprobe(*args):
+        calls.append(args)
+        return HEADERS if "json" in args else PACKETS
+
+    monkeypatch.setattr(probe, "_run_ffprobe", run_ffprobe)
+    return calls
+
+
+def test_probe_media_parses_headers_and_keyframes(ffprobe):
+    info = asyncio.run(probe.probe_media("clip.mp4"))
+
+    assert info.duration == 12.045
+    # Rotated by 90 degrees, so width and height are swapped.
+    assert (info.width, info.height) == (1080, 1920)
+    assert info.video_codec == "h264"
+    assert info.bitrate == 8123456
+    assert info.fps == pytest.approx(29.97, abs=0.001)
+    assert info.keyframe_interval == pytest.approx(2.002)
+
+
+def test_probe_media_samples_only_the_start_for_keyframes(ffprobe):
+    asyncio.run(probe.probe_media("clip.mp4"))
+
+    packet_args = next(args for args in ffprobe if "csv=p=0" in args)
+    assert "-read_intervals" in packet_args
+    assert f"%+{probe.KEYFRAME_SAMPLE_SECONDS}" in packet_args
+
+
+def test_probe_media_falls_back_for_missing_fields(monkeypatch):
+    async def run_ffprobe(*args):
+        if "json" in args:
+            return '{"streams": [{"r_frame_rate": "25/1", "duration": "3.5"}], "format": {}}'
+        return ""
+
+    monkeypatch.setattr(probe, "_run_ffprobe", run_ffprobe)
+    info = asyncio.run(probe.probe_media("clip.mp4"))
+
+    assert info.duration == 3.5
+    assert (info.width, info.height) == (0, 0)
+    assert info.bitrate == 0
+    assert info.fps == 25.0
+    assert info.keyframe_interval == 0.0
+
+
+def test_probe_keyframes_keeps_sorted_keyframe_times(ffprobe):
+    keyframes = asyncio.run(probe.probe_keyframes("clip.mp4"))
+
+    assert keyframes == [0.0, 2.002, 4.004]
+    assert "-read_intervals" not in ffprobe[0]
+
+
+def test_snap_to_keyframes_moves_cuts_to_the_nearest_keyframe():
+    keyframes = [0.0, 2.0, 4.0, 6.0]
+
+    assert probe.snap_to_keyframes([0.9, 1.1, 4.9, 7.5], keyframes) == [0.0, 2.0, 4.0, 6.0]
+
+
+def test_snap_to_keyframes_may_put_two_cuts_on_one_keyframe():
+    assert probe.snap_to_keyframes([3.9, 4.2], [0.0, 4.0, 8.0]) == [4.0, 4.0]
+
+
+def test_snap_to_keyframes_without_keyframes_keeps_the_cuts():
+    assert probe.snap_to_keyframes([1.5, 3.0], []) == [1.5, 3.0]
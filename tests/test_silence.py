@@ -0,0 +1,80 @@
+import io
+
+import numpy as np
+import pytest
+
+from video_segment_splitter.services import silence
+from video_segment_splitter.services.silence import (
+    SILENCE_EDGE_MARGIN,
+    SILENCE_SAMPLE_RATE,
+    find_silences,
+    silence_cut_points,
+)
+
+
+def pcm(*sections: tuple[str, float]) -> io.BytesIO:
+    """Mono s16le audio of ("tone" | "quiet", seconds) sections."""
+    parts = []
+    for kind, seconds in sections:
+        n = round(seconds * SILENCE_SAMPLE_RATE)
+        if kind == "tone":
+            t = np.arange(n) / SILENCE_SAMPLE_RATE
+            parts.append(np.sin(2 * np.pi * 440 * t) * 16000)
+        else:
+            parts.append(np.zeros(n))
+    return io.BytesIO(np.concatenate(parts).astype("<i2").tobytes())
+
+
+def test_find_silences_finds_pauses_between_speech():
+    audio = pcm(("tone", 1.0), ("quiet", 0.5), ("tone", 1.0), ("quiet", 1.0))
+
+    silences = find_silences(audio)
+
+    assert silences == [pytest.approx([1.0, 1.5]), pytest.approx([2.5, 3.5])]
+
+
+def test_find_silences_ignores_gaps_shorter_than_the_minimum():
+    audio = pcm(("tone", 1.0), ("quiet", 0.1), ("tone", 1.0))
+
+    assert find_silences(audio) == []
+
+
+def test_find_silences_joins_a_silence_across_chunks(monkeypatch):
+    monkeypatch.setattr(silence, "_CHUNK_SECONDS", 1)
+    audio = pcm(("tone", 0.5), ("quiet", 2.0), ("tone", 0.5))
+    positions = []
+
+    silences = find_silences(audio, positions.append)
+
+    assert silences == [pytest.approx([0.5, 2.5])]
+    assert positions == pytest.approx([1.0, 2.0, 3.0])
+
+
+def test_silence_cut_points_moves_cuts_into_silences():
+    # Equal cuts at 20 and 40; silences near both.
+    silences = [[17.0, 18.0], [41.0, 45.0]]
+
+    cuts = silence_cut_points(60.0, 3, silences)
+
+    assert cuts == pytest.approx(
+        [0.0, 18.0 - SILENCE_EDGE_MARGIN, 41.0 + SILENCE_EDGE_MARGIN, 60.0]
+    )
+
+
+def test_silence_cut_points_keeps_a_cut_inside_a_silence():
+    cuts = silence_cut_points(60.0, 2, [[28.0, 33.0]])
+
+    assert cuts == [0.0, 30.0, 60.0]
+
+
+def test_silence_cut_points_keeps_cuts_without_a_silence_in_reach():
+    # The reach is SILENCE_SNAP_WINDOW of a 10 s part: 4 s.
+    cuts = silence_cut_points(20.0, 2, [[2.0, 3.0], [15.0, 16.0]])
+
+    assert cuts == [0.0, 10.0, 20.0]
+
+
+def test_silence_cut_points_stays_in_the_middle_of_short_silences():
+    cuts = silence_cut_points(20.0, 2, [[11.0, 11.2]])
+
+    assert cuts == pytest.approx([0.0, 11.1, 20.0])
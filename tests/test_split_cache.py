@@ -0,0 +1,72 @@
+import os
+
+from video_segment_splitter.services.split_cache import SplitCache
+from video_segment_splitter.services.splitter import SegmentSpec
+
+
+def store(cache: SplitCache, key: str, size: int = 0, link=None):
+    staging = cache.staging_dir(key)
+    part = staging / "part_001.mp4"
+    if link is not None:
+        os.link(link, part)
+    else:
+        part.write_bytes(b"\0" * size)
+    return cache.store(key, "family", staging, [SegmentSpec(0, part, 0, 1, 0, 1)])
+
+
+def test_sets_stored_by_another_process_are_found(tmp_path):
+    first, second = SplitCache(tmp_path, 10_000), SplitCache(tmp_path, 10_000)
+    first.stats()
+
+    store(second, "a", 100)
+
+    assert first.lookup("a") is not None
+    assert [spec.path.name for spec in first.family_parts("family")] == ["part_001.mp4"]
+
+
+def test_storing_a_set_twice_keeps_the_first(tmp_path):
+    first, second = SplitCache(tmp_path, 10_000), SplitCache(tmp_path, 10_000)
+    stored = store(first, "a", 100)
+    second.stats()
+
+    again = store(second, "a", 200)
+
+    assert again[0].path == stored[0].path
+    assert stored[0].path.stat().st_size == 100
+    assert [entry.name for entry in tmp_path.iterdir()] == ["a"]
+
+
+def test_hard_linked_parts_count_once(tmp_path):
+    cache = SplitCache(tmp_path, 10_000)
+    stored = store(cache, "a", 4000)
+    with_manifest = cache.stats()["bytes"]
+
+    store(cache, "b", link=stored[0].path)
+
+    assert cache.stats()["bytes"] < with_manifest + 1000
+
+
+def test_sets_pinned_by_another_process_are_not_evicted(tmp_path):
+    first, second = SplitCache(tmp_path, 10_000), SplitCache(tmp_path, 10_000)
+    store(first, "a", 4000)
+    assert second.pin("a")
+    second.lease("tab", "a")
+
+    store(first, "b", 4000)
+    store(first, "c", 4000)
+
+    # Over budget: the oldest unpinned set goes instead.
+    assert sorted(entry.name for entry in tmp_path.iterdir()) == ["a", "c"]
+    second.unpin("a")
+    second.release_leases({"tab"})
+    store(first, "d", 4000)
+    assert sorted(entry.name for entry in tmp_path.iterdir()) == ["c", "d"]
+
+
+def test_staging_of_running_processes_survives_a_restart(tmp_path):
+    (tmp_path / ".a.999999999.tmp").mkdir()
+    (tmp_path / f".b.{os.getppid()}.tmp").mkdir()
+
+    SplitCache(tmp_path, 10_000).stats()
+
+    assert [entry.name for entry in tmp_path.iterdir()] == [f".b.{os.getppid()}.tmp"]
@@ -0,0 +1,60 @@
+from pathlib import Path
+
+import pytest
+
+from video_segment_splitter.services.split_job import (
+    SIZE_TARGET_MARGIN,
+    oversized_cut_points,
+)
+from video_segment_splitter.services.splitter import SegmentSpec
+
+
+def spec(tmp_path: Path, index: int, requested: tuple, written: tuple, size: int):
+    path = tmp_path / f"part_{index}.mp4"
+    path.write_bytes(b"\0" * size)
+    return SegmentSpec(
+        index=index,
+        path=path,
+        requested_start=requested[0],
+        requested_end=requested[1],
+        start=written[0],
+        end=written[1],
+    )
+
+
+def test_oversized_cut_points_is_none_when_every_part_fits(tmp_path):
+    specs = [
+        spec(tmp_path, 0, (0.0, 10.0), (0.0, 10.0), 1000),
+        spec(tmp_path, 1, (10.0, 20.0), (8.0, 20.0), 1000),
+    ]
+
+    assert oversized_cut_points(specs, 1000) is None
+
+
+def test_oversized_cut_points_splits_only_the_parts_too_big(tmp_path):
+    limit = 1000
+    # Needs three pieces of at most limit * SIZE_TARGET_MARGIN bytes.
+    size = int(2.5 * limit * SIZE_TARGET_MARGIN)
+    specs = [
+        spec(tmp_path, 0, (0.0, 10.0), (0.0, 10.0), 500),
+        spec(tmp_path, 1, (10.0, 40.0), (10.0, 40.0), size),
+        spec(tmp_path, 2, (40.0, 50.0), (40.0, 50.0), 500),
+    ]
+
+    cuts = oversized_cut_points(specs, limit)
+
+    assert cuts == pytest.approx([0.0, 10.0, 20.0, 30.0, 40.0, 50.0])
+
+
+def test_oversized_cut_points_splits_the_requested_range(tmp_path):
+    # In fast mode the part was written from an earlier keyframe; the new
+    # cuts must still lie after the previous requested cut.
+    specs = [
+        spec(tmp_path, 0, (0.0, 10.0), (0.0, 10.0), 500),
+        spec(tmp_path, 1, (10.0, 20.0), (4.0, 20.0), 1500),
+    ]
+
+    cuts = oversized_cut_points(specs, 1000)
+
+    assert cuts == pytest.approx([0.0, 10.0, 15.0, 20.0])
+    assert cuts == sorted(cuts)
@@ -0,0 +1,79 @@
+from pathlib import Path
+
+import pytest
+
+from video_segment_splitter.services.splitter import (
+    SegmentSpec,
+    limit_part_length,
+    plan_reuse,
+)
+
+
+def spec(index: int, start: float, end: float) -> SegmentSpec:
+    return SegmentSpec(
+        index=index,
+        path=Path(f"part_{index}.mp4"),
+        requested_start=start,
+        requested_end=end,
+        start=start,
+        end=end,
+    )
+
+
+def test_limit_part_length_splits_long_parts_into_equal_pieces():
+    cuts = limit_part_length([0.0, 10.0, 35.0], 10.0)
+
+    assert cuts == pytest.approx([0.0, 10.0, 18.333333, 26.666667, 35.0])
+
+
+def test_limit_part_length_keeps_parts_of_exactly_the_limit():
+    assert limit_part_length([0.0, 10.0, 20.0], 10.0) == [0.0, 10.0, 20.0]
+
+
+def test_limit_part_length_without_limit_returns_a_copy():
+    cuts = [0.0, 50.0]
+
+    limited = limit_part_length(cuts, 0)
+
+    assert limited == cuts
+    assert limited is not cuts
+
+
+def test_plan_reuse_matches_a_single_part():
+    pool = [spec(0, 0.0, 10.0), spec(1, 10.0, 20.0)]
+
+    runs = plan_reuse([spec(0, 10.0, 20.0)], pool)
+
+    assert runs == {0: [pool[1]]}
+
+
+def test_plan_reuse_joins_consecutive_parts():
+    pool = [spec(0, 0.0, 5.0), spec(1, 5.0, 10.0), spec(2, 10.0, 15.0)]
+
+    runs = plan_reuse([spec(0, 0.0, 15.0)], pool)
+
+    assert runs == {0: pool}
+
+
+def test_plan_reuse_prefers_the_run_with_fewest_parts():
+    pool = [spec(0, 0.0, 5.0), spec(1, 5.0, 10.0), spec(2, 0.0, 10.0)]
+
+    runs = plan_reuse([spec(0, 0.0, 10.0)], pool)
+
+    assert runs == {0: [pool[2]]}
+
+
+def test_plan_reuse_tolerates_float_noise_in_cut_points():
+    pool = [spec(0, 0.0, 3.3000000001), spec(1, 3.2999999999, 6.6)]
+
+    runs = plan_reuse([spec(0, 0.0, 6.6)], pool)
+
+    assert runs == {0: pool}
+
+
+def test_plan_reuse_skips_specs_the_pool_does_not_cover():
+    pool = [spec(0, 0.0, 5.0), spec(1, 6.0, 10.0), spec(2, 10.0, 20.0)]
+
+    runs = plan_reuse([spec(0, 0.0, 10.0), spec(1, 0.0, 7.0)], pool)
+
+    assert runs == {}
@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+from video_segment_splitter.api import upload
+from video_segment_splitter.api.upload import (
+    _MultipartToDisk,
+    collect_content_hashes,
+    upload_content_hash,
+)
+from video_segment_splitter.services.content_hash import ContentHasher
+
+BOUNDARY = b"----clipshift"
+
+
+def multipart(*parts: tuple[str, str, bytes]) -> bytes:
+    """A multipart/form-data body of (name, filename, data) parts; an
+    empty filename makes a plain form field."""
+    body = b""
+    for name, filename, data in parts:
+        disposition = f'form-data; name="{name}"'
+        if filename:
+            disposition += f'; filename="{filename}"'
+        body += (
+            b"--" + BOUNDARY + b"\r\n"
+            + f"Content-Disposition: {disposition}\r\n".encode()
+            + b"Content-Type: video/mp4\r\n\r\n"
+            + data + b"\r\n"
+        )
+    return body + b"--" + BOUNDARY + b"--\r\n"
+
+
+def content_hash(data: bytes) -> str:
+    hasher = ContentHasher()
+    hasher.update(data)
+    return hasher.hexdigest()
+
+
+def parse(tmp_path, body: bytes, chunk_size: int):
+    async def run():
+        collect_content_hashes()
+        parser = _MultipartToDisk(BOUNDARY, tmp_path)
+        for i in range(0, len(body), chunk_size):
+            await parser.feed(body[i:i + chunk_size])
+        hashes = [await upload_content_hash(path) for path in parser.paths]
+        return parser, hashes
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("chunk_size", [7, 64 * 1024])
+def test_parser_writes_file_parts_to_disk(tmp_path, chunk_size):
+    first = bytes(range(256)) * 40
+    second = b"\r\n--" + b"x" * 5000
+    body = multipart(
+        ("files", "a.mp4", first),
+        ("note", "", b"not a file"),
+        ("files", "dir/b.mp4", second),
+    )
+
+    parser, hashes = parse(tmp_path, body, chunk_size)
+
+    assert [str(file.path) for file in parser.files] == ["a.mp4", "dir/b.mp4"]
+    assert [file.size for file in parser.files] == [len(first), len(second)]
+    assert [path.read_bytes() for path in parser.paths] == [first, second]
+    assert [file.file.read() for file in parser.files] == [first, second]
+    assert hashes == [content_hash(first), content_hash(second)]
+    assert parser.files[0].headers["content-type"] == "video/mp4"
+    for file in parser.files:
+        file.file.close()
+
+
+def test_parser_flushes_large_parts_while_they_stream(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload, "UPLOAD_CHUNK_SIZE", 1024)
+    data = b"v" * 20_000
+    body = multipart(("files", "big.mp4", data))
+    written = []
+
+    async def run():
+        parser = _MultipartToDisk(BOUNDARY, tmp_path)
+        for i in range(0, len(body), 2048):
+            await parser.feed(body[i:i + 2048])
+            if parser.paths:
+                written.append(parser.paths[0].stat().st_size)
+        return parser
+
+    parser = asyncio.run(run())
+
+    # Data reaches the file before the part ends, past the file buffer.
+    assert any(0 < size < len(data) for size in written)
+    assert parser.paths[0].read_bytes() == data
+    parser.files[0].file.close()
+
+
+def test_discard_removes_written_files(tmp_path):
+    body = multipart(("files", "a.mp4", b"abc"), ("files", "b.mp4", b"def"))
+
+    parser, _ = parse(tmp_path, body, 5)
+    parser.discard()
+
+    assert not any(path.exists() for path in parser.paths)
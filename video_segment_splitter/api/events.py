@@ -0,0 +1,69 @@
+"""Run state event handlers from HTTP endpoints.
+
+Endpoints that work on behalf of a browser tab (uploads, downloads) are
+given its Reflex client token and the full name of an event handler, the
+same way the stock upload endpoint is. State updates from the handler are
+pushed to that tab over its websocket.
+"""
+
+import inspect
+
+import reflex as rx
+from reflex.event import Event, EventHandler
+from reflex.state import _substate_key
+from starlette.exceptions import HTTPException
+
+
+async def dispatch_event(token: str, handler: str, payload: dict) -> None:
+    """Run a state event handler for the client and push its updates."""
+    # Imported here because the app module registers the endpoints.
+    from video_segment_splitter.video_segment_splitter import app
+
+    event = Event(token=token, name=handler, payload=payload)
+    async with app.state_manager.modify_state_with_links(
+        event.substate_token
+    ) as state:
+        async for update in state._process(event):
+            update = await app._postprocess(state, event, update)
+            await app.event_namespace.emit_update(update, token)
+
+
+async def handler_state(token: str, handler: str) -> rx.State:
+    """The client's instance of the state class that defines handler."""
+    from video_segment_splitter.video_segment_splitter import app
+
+    state = await app.state_manager.get_state(
+        _substate_key(token, handler.rpartition(".")[0])
+    )
+    return state.get_substate(handler.split(".")[:-1])
+
+
+def _first_param(state: rx.State, handler: str) -> str:
+    func = getattr(type(state), handler.split(".")[-1])
+    if isinstance(func, EventHandler):
+        func = func.fn
+    params = list(inspect.signature(func).parameters)
+    if len(params) < 2:
+        raise HTTPException(
+            status_code=400, detail=f"`{handler}` does not take a progress argument."
+        )
+    return params[1]
+
+
+async def report_progress(token: str, handler: str, progress: dict) -> None:
+    """Call a progress handler, which takes the progress dict as its only
+    argument (like on_upload_progress)."""
+    state = await handler_state(token, handler)
+    await dispatch_event(token, handler, {_first_param(state, handler): progress})
+
+
+async def connected_tokens() -> set[str]:
+    """Client tokens with an open websocket, on every backend process when
+    Reflex shares its sockets through Redis."""
+    from video_segment_splitter.video_segment_splitter import app
+
+    if app.event_namespace is None:
+        return set()
+    return {
+        token async for token in app.event_namespace._token_manager.enumerate_tokens()
+    }
@@ -0,0 +1,88 @@
+"""GET /metrics: the split pipeline's metrics for Prometheus.
+
+Counters and histograms are kept in services/metrics.py where the work
+happens. The gauges here are read at scrape time: the job queue's depth,
+this backend's live ffmpeg processes, the CPU governor's budget, and the
+host figures of the latest system sample (services/system_sampler.py), so
+a scrape never samples the host itself.
+"""
+
+import asyncio
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from video_segment_splitter.services.cpu_governor import get_cpu_governor
+from video_segment_splitter.services.jobs import ACTIVE_STATUSES, get_job_queue
+from video_segment_splitter.services.metrics import Gauge, render_metrics
+from video_segment_splitter.services.process_usage import ffmpeg_children
+from video_segment_splitter.services.system_sampler import get_system_sampler
+
+# Host figures of a system sample, by the metric they are exported as.
+_SYSTEM_FIGURES = {
+    "cpu_percent": ("cpu_percent_total", "Host CPU usage in percent."),
+    "memory_percent": ("mem_percent", "Host memory usage in percent."),
+    "swap_percent": ("swap_percent", "Host swap usage in percent."),
+    "load1": ("load_avg_1", "Host load average over 1 minute."),
+    "load5": ("load_avg_5", "Host load average over 5 minutes."),
+    "load15": ("load_avg_15", "Host load average over 15 minutes."),
+    "tasks": ("task_count", "Processes on the host."),
+}
+
+# State of the CPU governor (services/cpu_governor.py).
+_GOVERNOR_FIGURES = {
+    "encode_cores": ("encode_cores", "Cores the governor currently allows encodes."),
+    "encoder_nice": ("nice", "Niceness given to ffmpeg processes."),
+    "event_loop_lag_seconds": (
+        "latency",
+        "95th percentile of the event loop's lag in the last sample interval.",
+    ),
+}
+
+
+def _job_counts() -> dict[tuple, float]:
+    counts = get_job_queue().store.counts()
+    return {(status,): counts.get(status, 0) for status in ACTIVE_STATUSES}
+
+
+def _ffmpeg_processes() -> dict[tuple, float]:
+    return {(): len(ffmpeg_children())}
+
+
+def _governor_figure(key: str):
+    def collect() -> dict[tuple, float]:
+        return {(): float(get_cpu_governor().status()[key])}
+
+    return collect
+
+
+def _system_figure(key: str):
+    def collect() -> dict[tuple, float]:
+        sample = get_system_sampler().latest
+        if sample is None:
+            return {}
+        return {(): float(sample[key])}
+
+    return collect
+
+
+Gauge(
+    "clipshift_jobs",
+    "Jobs waiting or running on this server, by status.",
+    _job_counts,
+    ["status"],
+)
+Gauge(
+    "clipshift_ffmpeg_processes",
+    "ffmpeg and ffprobe processes started by this backend process.",
+    _ffmpeg_processes,
+)
+for _name, (_key, _help) in _SYSTEM_FIGURES.items():
+    Gauge(f"clipshift_system_{_name}", _help, _system_figure(_key))
+for _name, (_key, _help) in _GOVERNOR_FIGURES.items():
+    Gauge(f"clipshift_governor_{_name}", _help, _governor_figure(_key))
+
+
+async def metrics(request: Request) -> Response:
+    body = await asyncio.to_thread(render_metrics)
+    return Response(body, media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,369 @@
+"""Resumable chunked uploads.
+
+A dropped connection during a multi-GB POST /_upload means starting over.
+Here the client opens an upload session, sends the file as numbered
+chunks, and can ask which chunks the server already has after an
+interruption, so only the missing ones are sent again:
+
+    POST /_upload/sessions                      {"filename", "size"}
+    GET  /_upload/sessions/{upload_id}          -> received/missing chunks
+    PUT  /_upload/sessions/{upload_id}/chunks/{index}   raw chunk bytes
+    POST /_upload/complete                      {"upload_ids": [...]}
+
+The upload ID is the random prefix of the stored file name (see
+unique_upload_name), so the target file is known from the ID alone. It is
+allocated at full size when the session opens and every chunk is written
+at its own offset, so the file is assembled in place and never copied.
+The received chunks and their digests are kept in a small JSON ledger next
+to it and survive a server restart.
+
+Every request carries the Reflex-Client-Token header. A session belongs
+to the client that opened it, and requests of any other client get a 404.
+Files above MAX_UPLOAD_SIZE are refused with 413 when the session opens.
+
+/_upload/complete takes the same Reflex-Event-Handler header as /_upload
+and calls the handler with the finished files. After each stored chunk
+the owner's VideoState.set_upload_progress is called with
+{"loaded", "total", "progress"}. State updates from both are pushed to
+the browser over the websocket.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import reflex as rx
+from reflex.utils.format import format_event_handler
+from starlette.exceptions import HTTPException
+from starlette.requests import ClientDisconnect, Request
+from starlette.responses import JSONResponse, Response
+
+from video_segment_splitter.api.events import (
+    dispatch_event,
+    handler_state,
+    report_progress,
+)
+from video_segment_splitter.api.upload import (
+    MAX_UPLOAD_SIZE,
+    UPLOAD_CHUNK_SIZE,
+    UPLOAD_ID_LENGTH,
+    _upload_param,
+    collect_content_hashes,
+    new_upload_id,
+    record_content_hash,
+    unique_upload_name,
+)
+from video_segment_splitter.services import metrics
+from video_segment_splitter.services.content_hash import (
+    HASH_BLOCK_SIZE,
+    ContentHasher,
+    combine_block_digests,
+)
+
+# One chunk per content-hash block, so the per-chunk digests taken while
+# chunks arrive combine into the file's content hash.
+RESUMABLE_CHUNK_SIZE = HASH_BLOCK_SIZE
+
+# Unfinished uploads are deleted after a day without a new chunk.
+RESUMABLE_UPLOAD_TTL = 24 * 3600
+
+_UPLOAD_ID = re.compile(rf"[A-Za-z0-9]{{{UPLOAD_ID_LENGTH}}}")
+
+
+@dataclass
+class UploadSession:
+    upload_id: str
+    filename: str
+    size: int
+    chunk_size: int
+    # SHA-256 (hex) of the client token that opened the session.
+    owner: str
+    # SHA-256 (hex) of each received chunk, by chunk index.
+    digests: dict[int, str] = field(default_factory=dict)
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock, repr=False)
+
+    @property
+    def received(self) -> set[int]:
+        return set(self.digests)
+
+    @property
+    def chunk_count(self) -> int:
+        return math.ceil(self.size / self.chunk_size)
+
+    @property
+    def missing(self) -> list[int]:
+        return [i for i in range(self.chunk_count) if i not in self.digests]
+
+    def chunk_length(self, index: int) -> int:
+        return min(self.chunk_size, self.size - index * self.chunk_size)
+
+    def path(self, upload_dir: Path) -> Path:
+        return upload_dir / unique_upload_name(self.filename, self.upload_id)
+
+    def ledger_path(self, upload_dir: Path) -> Path:
+        return upload_dir / f"{self.upload_id}.upload.json"
+
+    def content_hash(self) -> str:
+        if not self.chunk_count:
+            return ContentHasher().hexdigest()
+        return combine_block_digests(
+            [bytes.fromhex(self.digests[i]) for i in range(self.chunk_count)]
+        )
+
+    def summary(self) -> dict:
+        return {
+            "upload_id": self.upload_id,
+            "filename": self.filename,
+            "size": self.size,
+            "chunk_size": self.chunk_size,
+            "chunk_count": self.chunk_count,
+            "received": sorted(self.received),
+            "missing": self.missing,
+        }
+
+    def save_ledger(self, upload_dir: Path) -> None:
+        ledger = self.ledger_path(upload_dir)
+        tmp = ledger.with_suffix(".tmp")
+        tmp.write_text(
+            json.dumps(
+                {
+                    "filename": self.filename,
+                    "size": self.size,
+                    "chunk_size": self.chunk_size,
+                    "owner": self.owner,
+                    "digests": {str(i): d for i, d in self.digests.items()},
+                }
+            )
+        )
+        os.replace(tmp, ledger)
+
+
+_sessions: dict[str, UploadSession] = {}
+
+
+def _owner(token: str) -> str:
+    """What a session keeps of its client's token: not the token itself,
+    which is the client's session credential."""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _client_token(request: Request) -> str:
+    token = request.headers.get("reflex-client-token")
+    if not token:
+        raise HTTPException(status_code=400, detail="Missing reflex-client-token header.")
+    return token
+
+
+def _progress_handler() -> str:
+    # Imported here because the app module registers these endpoints.
+    from video_segment_splitter.states.video_state import VideoState
+
+    return format_event_handler(VideoState.set_upload_progress)
+
+
+def _upload_dir() -> Path:
+    upload_dir = rx.get_upload_dir()
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    return upload_dir
+
+
+def _get_session(upload_id: str) -> UploadSession:
+    if not _UPLOAD_ID.fullmatch(upload_id):
+        raise HTTPException(status_code=404, detail="Unknown upload ID.")
+    session = _sessions.get(upload_id)
+    if session is not None:
+        return session
+    # Not seen since the server started: reload it from its ledger.
+    try:
+        ledger = json.loads((_upload_dir() / f"{upload_id}.upload.json").read_text())
+    except (OSError, ValueError):
+        raise HTTPException(status_code=404, detail="Unknown upload ID.")
+    session = UploadSession(
+        upload_id=upload_id,
+        filename=ledger["filename"],
+        size=ledger["size"],
+        chunk_size=ledger["chunk_size"],
+        # Ledgers written before sessions had owners belong to nobody.
+        owner=ledger.get("owner", ""),
+        digests={int(i): d for i, d in ledger["digests"].items()},
+    )
+    return _sessions.setdefault(upload_id, session)
+
+
+def _owned_session(request: Request, upload_id: str) -> UploadSession:
+    """The session, if it belongs to the requesting client."""
+    session = _get_session(upload_id)
+    if session.owner != _owner(_client_token(request)):
+        raise HTTPException(status_code=404, detail="Unknown upload ID.")
+    return session
+
+
+def _drop_expired_sessions(upload_dir: Path) -> None:
+    cutoff = time.time() - RESUMABLE_UPLOAD_TTL
+    for ledger in upload_dir.glob("*.upload.json"):
+        try:
+            if ledger.stat().st_mtime >= cutoff:
+                continue
+            upload_id = ledger.name.split(".")[0]
+            session = _get_session(upload_id)
+            session.path(upload_dir).unlink(missing_ok=True)
+            ledger.unlink(missing_ok=True)
+            _sessions.pop(upload_id, None)
+        except (OSError, HTTPException):
+            logging.exception(f"Could not remove expired upload {ledger.name}")
+
+
+async def create_upload_session(request: Request) -> Response:
+    token = _client_token(request)
+    try:
+        body = await request.json()
+        filename = Path(str(body["filename"])).name
+        size = int(body["size"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Expected {filename, size}.")
+    if not filename or size < 0:
+        raise HTTPException(status_code=400, detail="Invalid filename or size.")
+    if size > MAX_UPLOAD_SIZE:
+        raise HTTPException(
+            status_code=413, detail=f"Uploads are limited to {MAX_UPLOAD_SIZE} bytes."
+        )
+
+    upload_dir = _upload_dir()
+    await asyncio.to_thread(_drop_expired_sessions, upload_dir)
+    session = UploadSession(
+        upload_id=new_upload_id(),
+        filename=filename,
+        size=size,
+        chunk_size=RESUMABLE_CHUNK_SIZE,
+        owner=_owner(token),
+    )
+
+    def allocate():
+        # Sparse on most filesystems; chunks fill it in place.
+        with session.path(upload_dir).open("wb") as f:
+            f.truncate(size)
+        session.save_ledger(upload_dir)
+
+    await asyncio.to_thread(allocate)
+    _sessions[session.upload_id] = session
+    return JSONResponse(session.summary())
+
+
+async def get_upload_session(request: Request, upload_id: str) -> Response:
+    return JSONResponse(_owned_session(request, upload_id).summary())
+
+
+async def put_upload_chunk(request: Request, upload_id: str, index: int) -> Response:
+    session = _owned_session(request, upload_id)
+    if not 0 <= index < session.chunk_count:
+        raise HTTPException(status_code=400, detail=f"Chunk {index} is out of range.")
+    upload_dir = _upload_dir()
+    expected = session.chunk_length(index)
+    offset = index * session.chunk_size
+    written = 0
+    pending = bytearray()
+    digest = hashlib.sha256()
+
+    def write(data: bytes, at: int):
+        os.pwrite(fd, data, at)
+        digest.update(data)
+
+    fd = await asyncio.to_thread(os.open, session.path(upload_dir), os.O_WRONLY)
+    started = time.monotonic()
+    try:
+        async for data in request.stream():
+            pending += data
+            if written + len(pending) > expected:
+                raise HTTPException(
+                    status_code=400, detail=f"Chunk {index} is larger than {expected} bytes."
+                )
+            if len(pending) >= UPLOAD_CHUNK_SIZE:
+                await asyncio.to_thread(write, bytes(pending), offset + written)
+                written += len(pending)
+                pending.clear()
+        if pending:
+            await asyncio.to_thread(write, bytes(pending), offset + written)
+            written += len(pending)
+    except ClientDisconnect:
+        # The chunk stays missing; the client sends it again on resume.
+        return Response()
+    finally:
+        await asyncio.to_thread(os.close, fd)
+        metrics.upload_seconds.observe(time.monotonic() - started, "chunk")
+        metrics.upload_bytes.inc("chunk", amount=written)
+    if written != expected:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Chunk {index} has {written} bytes, expected {expected}.",
+        )
+
+    async with session.lock:
+        session.digests[index] = digest.hexdigest()
+        await asyncio.to_thread(session.save_ledger, upload_dir)
+
+    loaded = sum(session.chunk_length(i) for i in session.received)
+    await report_progress(
+        _client_token(request),
+        _progress_handler(),
+        {
+            "loaded": loaded,
+            "total": session.size,
+            "progress": loaded / max(1, session.size),
+        },
+    )
+    return JSONResponse(
+        {"received": len(session.received), "chunk_count": session.chunk_count}
+    )
+
+
+async def complete_uploads(request: Request) -> Response:
+    token = request.headers.get("reflex-client-token")
+    handler = request.headers.get("reflex-event-handler")
+    if not token or not handler:
+        raise HTTPException(
+            status_code=400,
+            detail="Missing reflex-client-token or reflex-event-handler header.",
+        )
+    try:
+        upload_ids = [str(upload_id) for upload_id in (await request.json())["upload_ids"]]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Expected {upload_ids: [...]}.")
+    if not upload_ids:
+        raise HTTPException(status_code=400, detail="No files were uploaded.")
+
+    sessions = [_owned_session(request, upload_id) for upload_id in upload_ids]
+    for session in sessions:
+        if session.missing:
+            return JSONResponse(session.summary(), status_code=409)
+    param = _upload_param(await handler_state(token, handler), handler)
+
+    upload_dir = _upload_dir()
+    collect_content_hashes()
+    files = []
+    for session in sessions:
+        record_content_hash(session.path(upload_dir), session.content_hash())
+        files.append(
+            rx.UploadFile(
+                file=open(session.path(upload_dir), "rb"),
+                path=Path(session.filename),
+                size=session.size,
+            )
+        )
+    try:
+        await dispatch_event(token, handler, {param: files})
+    finally:
+        for file in files:
+            file.file.close()
+    # Only now: if the handler failed, the sessions stay complete, so the
+    # client can finish them again and the expiry sweep still finds them.
+    for session in sessions:
+        session.ledger_path(upload_dir).unlink(missing_ok=True)
+        _sessions.pop(session.upload_id, None)
+    return JSONResponse({"upload_ids": upload_ids})
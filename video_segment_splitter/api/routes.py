@@ -0,0 +1,26 @@
+from fastapi import FastAPI
+
+from video_segment_splitter.api.metrics import metrics
+from video_segment_splitter.api.resumable import (
+    complete_uploads,
+    create_upload_session,
+    get_upload_session,
+    put_upload_chunk,
+)
+from video_segment_splitter.api.upload import streaming_upload
+from video_segment_splitter.api.zip_stream import download_zip
+
+# Passed to rx.App(api_transformer=...). Reflex mounts its own backend
+# below this app, so routes registered here take precedence over the
+# built-in ones with the same path.
+api = FastAPI()
+
+api.add_api_route("/_upload", streaming_upload, methods=["POST"])
+api.add_api_route("/_upload/sessions", create_upload_session, methods=["POST"])
+api.add_api_route("/_upload/sessions/{upload_id}", get_upload_session, methods=["GET"])
+api.add_api_route(
+    "/_upload/sessions/{upload_id}/chunks/{index}", put_upload_chunk, methods=["PUT"]
+)
+api.add_api_route("/_upload/complete", complete_uploads, methods=["POST"])
+api.add_api_route("/_zip/{download_id}", download_zip, methods=["GET"])
+api.add_api_route("/metrics", metrics, methods=["GET"])
@@ -0,0 +1,297 @@
+"""Streaming replacement for Reflex's POST /_upload endpoint.
+
+Reflex 0.8 copies every uploaded file into an in-memory BytesIO before the
+upload handler runs. This endpoint speaks the same protocol as the stock
+one (multipart body, Reflex-Client-Token / Reflex-Event-Handler headers,
+ndjson state updates in the response), but parses the multipart body as it
+arrives and writes file parts straight into the upload directory. Memory
+held per upload is bounded by UPLOAD_CHUNK_SIZE.
+
+The handler receives rx.UploadFile objects backed by the file on disk; use
+store_upload() to get its final path.
+"""
+
+import asyncio
+import contextvars
+import os
+import random
+import shutil
+import string
+from pathlib import Path
+from typing import BinaryIO, Optional, get_args, get_type_hints
+
+import reflex as rx
+from python_multipart.multipart import MultipartParser, parse_options_header
+from reflex.event import Event, EventHandler
+from reflex.state import _substate_key
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.requests import ClientDisconnect, Request
+from starlette.responses import Response, StreamingResponse
+
+from video_segment_splitter.services import metrics
+from video_segment_splitter.services.content_hash import ContentHasher, hash_file
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Larger uploads are refused with 413, on every upload endpoint.
+MAX_UPLOAD_SIZE = int(os.environ.get("MAX_UPLOAD_SIZE", 20 * 1024 ** 3))
+
+
+UPLOAD_ID_LENGTH = 10
+
+
+def new_upload_id() -> str:
+    return "".join(random.choices(string.ascii_letters + string.digits, k=UPLOAD_ID_LENGTH))
+
+
+def unique_upload_name(filename: str, upload_id: Optional[str] = None) -> str:
+    """Random-prefixed name so concurrent uploads of the same file never clash.
+
+    The prefix doubles as the upload ID of a resumable upload."""
+    return f"{upload_id or new_upload_id()}_{Path(filename).name}"
+
+
+# Content hashes computed while the current request's uploads streamed in,
+# by stored path. A new dict per request (see collect_content_hashes), so
+# nothing is left behind however the request ends.
+_content_hashes: contextvars.ContextVar[Optional[dict[Path, str]]] = (
+    contextvars.ContextVar("upload_content_hashes", default=None)
+)
+
+
+def collect_content_hashes() -> None:
+    """Keep the content hashes recorded in the rest of this request (and
+    the tasks and threads it starts) for its upload handler."""
+    _content_hashes.set({})
+
+
+def record_content_hash(path: Path, content_hash: str) -> None:
+    hashes = _content_hashes.get()
+    if hashes is not None:
+        hashes[path] = content_hash
+
+
+async def upload_content_hash(path: Path) -> str:
+    """Content hash of a stored upload (see services/content_hash.py).
+
+    Uploads that came through the streaming endpoints were hashed on the
+    way in and are known during their request; anything else is hashed
+    from disk off the event loop."""
+    content_hash = (_content_hashes.get() or {}).get(path)
+    if content_hash is None:
+        content_hash = await asyncio.to_thread(hash_file, path)
+    return content_hash
+
+
+async def store_upload(file: rx.UploadFile, upload_dir: Path) -> Path:
+    """Return the on-disk path of an uploaded file inside upload_dir.
+
+    Files that came through streaming_upload are already there. Anything
+    else (e.g. the stock Reflex endpoint) is copied in fixed-size chunks
+    rather than read into memory at once."""
+    stored = Path(getattr(file.file, "name", "") or "")
+    if stored.parent == upload_dir and stored.exists():
+        return stored
+    file_path = upload_dir / unique_upload_name(file.name or "upload")
+
+    def copy():
+        with file_path.open("wb") as f:
+            shutil.copyfileobj(file.file, f, UPLOAD_CHUNK_SIZE)
+
+    await asyncio.to_thread(copy)
+    return file_path
+
+
+class _MultipartToDisk:
+    """Feed the raw request body in; file parts come out as files on disk."""
+
+    def __init__(self, boundary: bytes, upload_dir: Path):
+        self.upload_dir = upload_dir
+        self.files: list[rx.UploadFile] = []
+        self.paths: list[Path] = []
+        self._header_field = b""
+        self._header_value = b""
+        self._headers: dict[str, str] = {}
+        self._filename: Optional[str] = None
+        self._out: Optional[BinaryIO] = None
+        self._hasher: Optional[ContentHasher] = None
+        self._size = 0
+        self._pending = bytearray()
+        self._finished: list[tuple[BinaryIO, ContentHasher, bytes, Path]] = []
+        self._parser = MultipartParser(
+            boundary,
+            callbacks={
+                "on_part_begin": self._on_part_begin,
+                "on_header_field": self._on_header_field,
+                "on_header_value": self._on_header_value,
+                "on_header_end": self._on_header_end,
+                "on_headers_finished": self._on_headers_finished,
+                "on_part_data": self._on_part_data,
+                "on_part_end": self._on_part_end,
+            },
+        )
+
+    def _on_part_begin(self):
+        self._headers = {}
+        self._filename = None
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.decode("latin-1").lower()] = (
+            self._header_value.decode("latin-1")
+        )
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get("content-disposition"))
+        if options.get(b"name") != b"files" or b"filename" not in options:
+            return
+        self._filename = options[b"filename"].decode("utf-8").lstrip("/")
+        path = self.upload_dir / unique_upload_name(self._filename)
+        self.paths.append(path)
+        self._out = path.open("wb")
+        self._hasher = ContentHasher()
+        self._size = 0
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._out is not None:
+            self._pending += data[start:end]
+            self._size += end - start
+
+    def _on_part_end(self):
+        if self._out is None:
+            return
+        self._finished.append(
+            (self._out, self._hasher, bytes(self._pending), self.paths[-1])
+        )
+        self._pending.clear()
+        self.files.append(
+            rx.UploadFile(
+                file=open(self.paths[-1], "rb"),
+                path=Path(self._filename),
+                size=self._size,
+                headers=Headers(self._headers),
+            )
+        )
+        self._out = None
+
+    def _drain(self, out, hasher, data: bytes, finished):
+        # Written and hashed in a worker thread; both release the GIL.
+        if out is not None and data:
+            out.write(data)
+            hasher.update(data)
+        for f, part_hasher, rest, path in finished:
+            f.write(rest)
+            f.close()
+            part_hasher.update(rest)
+            record_content_hash(path, part_hasher.hexdigest())
+
+    async def feed(self, chunk: bytes):
+        self._parser.write(chunk)
+        if len(self._pending) >= UPLOAD_CHUNK_SIZE or self._finished:
+            data, finished = bytes(self._pending), self._finished
+            self._pending.clear()
+            self._finished = []
+            await asyncio.to_thread(self._drain, self._out, self._hasher, data, finished)
+
+    def discard(self):
+        if self._out is not None:
+            self._out.close()
+        for f, *_ in self._finished:
+            f.close()
+        for file in self.files:
+            file.file.close()
+        for path in self.paths:
+            path.unlink(missing_ok=True)
+
+
+def _upload_param(state: rx.State, handler: str) -> str:
+    """Name of the handler argument annotated as list[rx.UploadFile]."""
+    func = getattr(type(state), handler.split(".")[-1])
+    if isinstance(func, EventHandler):
+        if func.is_background:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Background handler `{handler}` cannot receive uploads.",
+            )
+        func = func.fn
+    for name, hint in get_type_hints(func).items():
+        args = get_args(hint)
+        if args and isinstance(args[0], type) and issubclass(args[0], rx.UploadFile):
+            return name
+    raise HTTPException(
+        status_code=400,
+        detail=f"`{handler}` handler should have a parameter annotated as "
+        "list[rx.UploadFile]",
+    )
+
+
+async def streaming_upload(request: Request) -> Response:
+    # Imported here because the app module registers this endpoint.
+    from video_segment_splitter.video_segment_splitter import app
+
+    token = request.headers.get("reflex-client-token")
+    handler = request.headers.get("reflex-event-handler")
+    if not token or not handler:
+        raise HTTPException(
+            status_code=400,
+            detail="Missing reflex-client-token or reflex-event-handler header.",
+        )
+    content_type, options = parse_options_header(request.headers.get("content-type"))
+    if content_type != b"multipart/form-data" or b"boundary" not in options:
+        raise HTTPException(status_code=400, detail="Expected multipart/form-data.")
+
+    state = await app.state_manager.get_state(
+        _substate_key(token, handler.rpartition(".")[0])
+    )
+    param = _upload_param(state.get_substate(handler.split(".")[:-1]), handler)
+
+    upload_dir = rx.get_upload_dir()
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    collect_content_hashes()
+    body = _MultipartToDisk(options[b"boundary"], upload_dir)
+    received = 0
+    try:
+        with metrics.upload_seconds.time("form"):
+            async for chunk in request.stream():
+                received += len(chunk)
+                if received > MAX_UPLOAD_SIZE:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"Uploads are limited to {MAX_UPLOAD_SIZE} bytes.",
+                    )
+                await body.feed(chunk)
+    except ClientDisconnect:
+        body.discard()
+        return Response()  # user cancelled
+    except BaseException:
+        body.discard()
+        raise
+    finally:
+        metrics.upload_bytes.inc("form", amount=received)
+    if not body.files:
+        body.discard()
+        raise HTTPException(status_code=400, detail="No files were uploaded.")
+
+    event = Event(token=token, name=handler, payload={param: body.files})
+
+    async def _ndjson_updates():
+        try:
+            async with app.state_manager.modify_state_with_links(
+                event.substate_token
+            ) as state:
+                async for update in state._process(event):
+                    update = await app._postprocess(state, event, update)
+                    yield update.json() + "\n"
+        finally:
+            for file in body.files:
+                file.file.close()
+
+    return StreamingResponse(_ndjson_updates(), media_type="application/x-ndjson")
@@ -0,0 +1,296 @@
+"""GET /_zip/{download_id}: the parts of a finished split as one ZIP download.
+
+The archive is built while it is sent. Parts are stored uncompressed
+(video does not compress further) and read in UPLOAD_CHUNK_SIZE pieces,
+so the first bytes go out immediately, memory use stays constant, and
+no archive is ever written to disk.
+
+File reads and CRCs run on a small dedicated thread pool, so the event
+loop never blocks on disk I/O and several concurrent downloads cannot
+exhaust the default executor other handlers use.
+
+A download ID comes from issue_zip_download(), which a tab's event handler
+calls right before it starts the download. The ID maps to the tab's client
+token, the split and the progress handler on the server, so none of them
+travel in the URL. It is good for one request within ZIP_DOWNLOAD_TTL.
+The progress handler is called with per-file and per-byte progress (see
+api/events.py), and cancel_zip_stream() with the ID stops the download.
+"""
+
+import asyncio
+import logging
+import re
+import secrets
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, Optional
+from urllib.parse import quote
+
+from starlette.exceptions import HTTPException
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+
+from video_segment_splitter.api.events import report_progress
+from video_segment_splitter.api.upload import UPLOAD_CHUNK_SIZE
+from video_segment_splitter.services import metrics
+from video_segment_splitter.services.split_cache import get_split_cache
+from video_segment_splitter.services.splitter import SegmentSpec, segment_filename
+
+_CACHE_KEY = re.compile(r"[0-9a-f]{32}")
+
+# Disk reads for all ZIP downloads share these threads.
+ZIP_IO_WORKERS = 4
+_zip_executor = ThreadPoolExecutor(ZIP_IO_WORKERS, thread_name_prefix="zip-io")
+
+# Byte progress is reported at most this often; file boundaries always are.
+ZIP_PROGRESS_INTERVAL = 0.5
+
+# Seconds an issued download ID stays valid if it is not used.
+ZIP_DOWNLOAD_TTL = 60.0
+
+
+@dataclass
+class _ZipDownload:
+    token: str
+    cache_key: str
+    stem: str
+    progress_handler: str
+    expires: float
+
+
+# Issued download IDs that have not been used yet.
+_downloads: dict[str, _ZipDownload] = {}
+
+# Set to stop the running download of a download ID.
+_cancel_events: dict[str, asyncio.Event] = {}
+_background_tasks: set[asyncio.Task] = set()
+
+
+class ZipCancelled(Exception):
+    """Raised inside the stream so the connection is aborted and the
+    browser marks the download as failed rather than complete."""
+
+
+def issue_zip_download(
+    token: str, cache_key: str, stem: str, progress_handler: str
+) -> str:
+    """A single-use ID for downloading the parts of cache_key as a ZIP
+    named after stem, reporting progress to the client's handler."""
+    now = time.monotonic()
+    for expired in [key for key, d in _downloads.items() if d.expires < now]:
+        del _downloads[expired]
+    download_id = secrets.token_urlsafe(24)
+    _downloads[download_id] = _ZipDownload(
+        token, cache_key, stem, progress_handler, now + ZIP_DOWNLOAD_TTL
+    )
+    return download_id
+
+
+def cancel_zip_stream(download_id: str) -> bool:
+    """Stop the ZIP download running for download_id; False if there is none."""
+    cancelled = _cancel_events.get(download_id)
+    if cancelled is None:
+        return False
+    cancelled.set()
+    return True
+
+
+def zip_filename(stem: str) -> str:
+    return f"{stem}_all_parts.zip"
+
+
+class _ChunkSink:
+    """Write-only file object that collects what zipfile writes. It has no
+    tell()/seek(), so zipfile writes sizes in data descriptors instead of
+    going back to patch local headers."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+async def stream_zip(
+    entries: list[tuple[Path, str]],
+    on_progress: Optional[Callable[[dict], Awaitable[None]]] = None,
+    cancelled: Optional[asyncio.Event] = None,
+) -> AsyncIterator[bytes]:
+    """Yield a stored-mode ZIP of (path, arcname) entries piece by piece.
+
+    File reads and CRC computation run on the ZIP thread pool, one chunk
+    at a time. Raises ZipCancelled once `cancelled` is set."""
+    loop = asyncio.get_running_loop()
+    infos = [
+        await loop.run_in_executor(_zip_executor, zipfile.ZipInfo.from_file, path, arcname)
+        for path, arcname in entries
+    ]
+    progress = {
+        "file": "",
+        "files_done": 0,
+        "files_total": len(entries),
+        "bytes_done": 0,
+        "bytes_total": sum(info.file_size for info in infos),
+        "progress": 0.0,
+        "done": False,
+    }
+    last_report = 0.0
+
+    async def report(force: bool = False):
+        nonlocal last_report
+        now = time.monotonic()
+        if on_progress is None or (not force and now - last_report < ZIP_PROGRESS_INTERVAL):
+            return
+        last_report = now
+        progress["progress"] = progress["bytes_done"] / max(1, progress["bytes_total"])
+        await on_progress(dict(progress))
+
+    sink = _ChunkSink()
+    archive = zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED)
+    for (path, _), info in zip(entries, infos):
+        info.compress_type = zipfile.ZIP_STORED
+        progress["file"] = info.filename
+        await report(force=True)
+        source = await loop.run_in_executor(_zip_executor, open, path, "rb")
+        try:
+            # file_size is known up front, so zipfile switches to ZIP64 by itself.
+            with archive.open(info, "w") as dest:
+
+                def copy_chunk() -> int:
+                    data = source.read(UPLOAD_CHUNK_SIZE)
+                    dest.write(data)
+                    return len(data)
+
+                while copied := await loop.run_in_executor(_zip_executor, copy_chunk):
+                    if cancelled is not None and cancelled.is_set():
+                        raise ZipCancelled(info.filename)
+                    progress["bytes_done"] += copied
+                    yield sink.drain()
+                    await report()
+        finally:
+            source.close()
+        progress["files_done"] += 1
+        yield sink.drain()
+    archive.close()
+    yield sink.drain()
+
+
+def _parts(cache_key: str) -> list[SegmentSpec]:
+    if not _CACHE_KEY.fullmatch(cache_key):
+        raise HTTPException(status_code=404, detail="Unknown split.")
+    parts = get_split_cache().entry_parts(cache_key)
+    if parts is None:
+        raise HTTPException(status_code=404, detail="Unknown split.")
+    return parts
+
+
+async def _pinned(cache_key: str, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Keep the split's parts from being evicted while they are sent."""
+    cache = get_split_cache()
+    if not await asyncio.to_thread(cache.pin, cache_key):
+        raise FileNotFoundError(f"Split {cache_key} was evicted")
+    try:
+        async for chunk in chunks:
+            yield chunk
+    finally:
+        cache.unpin(cache_key)
+
+
+async def _measured(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Count the bytes sent and time the whole download for /metrics."""
+    started = time.monotonic()
+    outcome = "cancelled"
+    sent = 0
+    try:
+        async for chunk in chunks:
+            sent += len(chunk)
+            yield chunk
+        outcome = "done"
+    except ZipCancelled:
+        # Stopped from the page; the outcome stays "cancelled".
+        raise
+    except Exception:
+        outcome = "failed"
+        raise
+    finally:
+        metrics.zip_seconds.observe(time.monotonic() - started, outcome)
+        metrics.zip_bytes.inc(amount=sent)
+
+
+async def _tracked(
+    chunks: AsyncIterator[bytes],
+    download_id: str,
+    download: _ZipDownload,
+    cancelled: asyncio.Event,
+) -> AsyncIterator[bytes]:
+    """Register the download for cancel_zip_stream() and report the end of
+    it, however it ends."""
+    _cancel_events[download_id] = cancelled
+    outcome = "cancelled"
+    try:
+        async for chunk in chunks:
+            yield chunk
+        outcome = "done"
+    finally:
+        del _cancel_events[download_id]
+        # The response task may itself be cancelled (client gone), so the
+        # last update is sent from a task of its own.
+        task = asyncio.create_task(
+            _report_end(download.token, download.progress_handler, outcome)
+        )
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+
+async def _report_end(token: str, progress_handler: str, outcome: str):
+    try:
+        await report_progress(
+            token, progress_handler, {"done": True, "outcome": outcome}
+        )
+    except Exception:
+        logging.exception("Could not report the end of a ZIP download")
+
+
+async def download_zip(request: Request, download_id: str) -> Response:
+    download = _downloads.pop(download_id, None)
+    if download is None or download.expires < time.monotonic():
+        raise HTTPException(status_code=404, detail="Unknown or expired download.")
+    parts = await asyncio.to_thread(_parts, download.cache_key)
+    stem = Path(download.stem or "video").name
+    entries = [(part.path, segment_filename(stem, part.index + 1)) for part in parts]
+    cancelled = asyncio.Event()
+
+    async def on_progress(progress: dict):
+        try:
+            await report_progress(download.token, download.progress_handler, progress)
+        except Exception:
+            # A failed progress update must not break the download.
+            logging.exception("Could not report ZIP progress")
+
+    chunks = _tracked(
+        _pinned(download.cache_key, stream_zip(entries, on_progress, cancelled)),
+        download_id,
+        download,
+        cancelled,
+    )
+    return StreamingResponse(
+        _measured(chunks),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": (
+                f"attachment; filename*=UTF-8''{quote(zip_filename(stem))}"
+            )
+        },
+    )
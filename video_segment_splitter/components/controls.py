@@ -1,7 +1,83 @@
 import reflex as rx
+from video_segment_splitter.services.encode_profiles import ENCODE_PROFILES
+from video_segment_splitter.services.split_job import MAX_SEGMENTS
 from video_segment_splitter.states.video_state import VideoState
 
 
+def _mode_option(value: str, label: str, hint: str) -> rx.Component:
+    return rx.el.button(
+        rx.el.span(label, class_name="text-sm font-bold"),
+        rx.el.span(hint, class_name="text-xs font-medium opacity-70"),
+        on_click=VideoState.set_split_mode(value),
+        disabled=VideoState.is_processing,
+        class_name=rx.cond(
+            VideoState.split_mode == value,
+            "flex flex-col items-start flex-1 px-4 py-3 rounded-xl border-2 border-blue-500 bg-blue-50 text-blue-700 transition-all",
+            "flex flex-col items-start flex-1 px-4 py-3 rounded-xl border-2 border-gray-100 bg-white text-gray-600 hover:border-blue-200 transition-all",
+        ),
+    )
+
+
+def _cut_option(value: str, label: str, hint: str) -> rx.Component:
+    return rx.el.button(
+        rx.el.span(label, class_name="text-sm font-bold"),
+        rx.el.span(hint, class_name="text-xs font-medium opacity-70"),
+        on_click=VideoState.set_cut_mode(value),
+        disabled=VideoState.is_processing,
+        class_name=rx.cond(
+            VideoState.cut_mode == value,
+            "flex flex-col items-start flex-1 px-4 py-3 rounded-xl border-2 border-blue-500 bg-blue-50 text-blue-700 transition-all",
+            "flex flex-col items-start flex-1 px-4 py-3 rounded-xl border-2 border-gray-100 bg-white text-gray-600 hover:border-blue-200 transition-all",
+        ),
+    )
+
+
+def _split_by_option(value: str, label: str, hint: str) -> rx.Component:
+    return rx.el.button(
+        rx.el.span(label, class_name="text-sm font-bold"),
+        rx.el.span(hint, class_name="text-xs font-medium opacity-70"),
+        on_click=VideoState.set_split_by(value),
+        disabled=VideoState.is_processing,
+        class_name=rx.cond(
+            VideoState.split_by == value,
+            "flex flex-col items-start flex-1 px-4 py-3 rounded-xl border-2 border-blue-500 bg-blue-50 text-blue-700 transition-all",
+            "flex flex-col items-start flex-1 px-4 py-3 rounded-xl border-2 border-gray-100 bg-white text-gray-600 hover:border-blue-200 transition-all",
+        ),
+    )
+
+
+def _target_input(label: str, value: rx.Var, on_change: rx.EventHandler) -> rx.Component:
+    return rx.el.div(
+        rx.el.label(label, class_name="text-sm font-semibold text-gray-700"),
+        rx.el.input(
+            type="number",
+            min=1,
+            on_change=on_change.debounce(300),
+            class_name="w-24 px-3 py-2 border border-gray-200 rounded-lg text-center font-bold text-blue-600 focus:ring-2 focus:ring-blue-500 outline-none",
+            default_value=value.to_string(),
+        ),
+        class_name="flex justify-between items-center mb-8",
+    )
+
+
+def _profile_option(name: str, label: str, hint: str) -> rx.Component:
+    return rx.el.button(
+        rx.el.span(label, class_name="text-sm font-bold"),
+        rx.el.span(hint, class_name="text-xs font-medium opacity-70"),
+        rx.el.span(
+            VideoState.encode_speed_labels[name],
+            class_name="text-[11px] font-mono opacity-60 mt-1",
+        ),
+        on_click=VideoState.set_encode_profile(name),
+        disabled=VideoState.is_processing | (VideoState.split_mode == "fast"),
+        class_name=rx.cond(
+            VideoState.encode_profile == name,
+            "flex flex-col items-start flex-1 px-4 py-3 rounded-xl border-2 border-indigo-500 bg-indigo-50 text-indigo-700 transition-all disabled:opacity-50",
+            "flex flex-col items-start flex-1 px-4 py-3 rounded-xl border-2 border-gray-100 bg-white text-gray-600 hover:border-indigo-200 transition-all disabled:opacity-50",
+        ),
+    )
+
+
 def controls() -> rx.Component:
     return rx.el.div(
         rx.el.div(
@@ -18,31 +94,97 @@ def controls() -> rx.Component:
                     class_name="mb-4",
                 ),
                 rx.el.div(
-                    rx.el.div(
-                        rx.el.label(
-                            "Number of Segments",
-                            class_name="text-sm font-semibold text-gray-700",
+                    _mode_option("precise", "Precise", "Re-encode, exact cut times"),
+                    _mode_option("fast", "Fast (lossless)", "Stream copy, cuts on keyframes"),
+                    _mode_option("single_pass", "Single pass", "One decode, best for many parts"),
+                    class_name="flex gap-3 mb-6",
+                ),
+                rx.el.label(
+                    "Cut Points",
+                    class_name="block text-sm font-semibold text-gray-700 mb-2",
+                ),
+                rx.el.div(
+                    _cut_option("equal", "Equal length", "Same length for every part"),
+                    _cut_option("scenes", "Scene changes", "Cut between shots, near equal length"),
+                    _cut_option("silence", "Pauses", "Cut where nobody speaks, for talks"),
+                    class_name="flex gap-3 mb-6",
+                ),
+                rx.el.div(
+                    rx.el.label(
+                        "Encoding Profile",
+                        class_name="text-sm font-semibold text-gray-700",
+                    ),
+                    rx.cond(
+                        VideoState.split_mode == "fast",
+                        rx.el.span(
+                            "Fast mode copies streams; the profile does not apply.",
+                            class_name="text-xs text-gray-400",
                         ),
-                        rx.el.div(
+                    ),
+                    class_name="flex justify-between items-center mb-2",
+                ),
+                rx.el.div(
+                    *[
+                        _profile_option(profile.name, profile.label, profile.hint)
+                        for profile in ENCODE_PROFILES.values()
+                    ],
+                    class_name="flex gap-3 mb-6",
+                ),
+                rx.el.div(
+                    _split_by_option("count", "Count", "A number of parts"),
+                    _split_by_option("duration", "Max length", "Parts up to a length"),
+                    _split_by_option("size", "Max size", "Parts up to a file size"),
+                    class_name="flex gap-3 mb-6",
+                ),
+                rx.el.div(
+                    rx.match(
+                        VideoState.split_by,
+                        (
+                            "duration",
+                            _target_input(
+                                "Max Part Length (seconds)",
+                                VideoState.target_seconds,
+                                VideoState.set_target_seconds,
+                            ),
+                        ),
+                        (
+                            "size",
+                            _target_input(
+                                "Max Part Size (MB)",
+                                VideoState.target_mb,
+                                VideoState.set_target_mb,
+                            ),
+                        ),
+                        rx.fragment(
+                            rx.el.div(
+                                rx.el.label(
+                                    "Number of Segments",
+                                    class_name="text-sm font-semibold text-gray-700",
+                                ),
+                                rx.el.div(
+                                    rx.el.input(
+                                        type="number",
+                                        min=1,
+                                        max=MAX_SEGMENTS,
+                                        on_change=VideoState.set_segment_count,
+                                        class_name="w-20 px-3 py-2 border border-gray-200 rounded-lg text-center font-bold text-blue-600 focus:ring-2 focus:ring-blue-500 outline-none",
+                                        default_value=VideoState.segment_count.to_string(),
+                                    ),
+                                    class_name="flex items-center",
+                                ),
+                                class_name="flex justify-between items-center mb-4",
+                            ),
                             rx.el.input(
-                                type="number",
-                                on_change=VideoState.set_segment_count,
-                                class_name="w-20 px-3 py-2 border border-gray-200 rounded-lg text-center font-bold text-blue-600 focus:ring-2 focus:ring-blue-500 outline-none",
+                                type="range",
+                                min=1,
+                                max=100,
+                                step=1,
+                                key=VideoState.segment_count.to_string(),
                                 default_value=VideoState.segment_count.to_string(),
+                                on_change=VideoState.set_segment_count.throttle(200),
+                                class_name="w-full h-2 bg-gray-200 rounded-lg appearance-none cursor-pointer accent-blue-600 mb-8",
                             ),
-                            class_name="flex items-center",
                         ),
-                        class_name="flex justify-between items-center mb-4",
-                    ),
-                    rx.el.input(
-                        type="range",
-                        min=1,
-                        max=20,
-                        step=1,
-                        key=VideoState.segment_count.to_string(),
-                        default_value=VideoState.segment_count.to_string(),
-                        on_change=VideoState.set_segment_count.throttle(200),
-                        class_name="w-full h-2 bg-gray-200 rounded-lg appearance-none cursor-pointer accent-blue-600 mb-8",
                     ),
                     rx.el.div(
                         rx.el.div(
@@ -54,6 +196,10 @@ def controls() -> rx.Component:
                                 VideoState.segment_duration_formatted,
                                 class_name="text-2xl font-black text-blue-600",
                             ),
+                            rx.el.p(
+                                f"{VideoState.planned_segment_count} parts",
+                                class_name="text-xs font-bold text-blue-400 mt-1",
+                            ),
                             class_name="text-center p-6 bg-blue-50 rounded-2xl border border-blue-100",
                         ),
                         class_name="w-full",
@@ -66,7 +212,7 @@ def controls() -> rx.Component:
                 rx.cond(
                     VideoState.is_processing,
                     rx.fragment(
-                        rx.el.span("Processing...", class_name="mr-2"),
+                        rx.el.span(VideoState.processing_label, class_name="mr-2"),
                         rx.icon("squirrel", class_name="h-5 w-5 animate-spin"),
                     ),
                     rx.fragment(
@@ -94,5 +240,23 @@ def controls() -> rx.Component:
                 class_name="w-full h-2 bg-gray-100 rounded-full mt-4 overflow-hidden",
             ),
         ),
+        rx.cond(
+            VideoState.processing_stats != "",
+            rx.el.p(
+                VideoState.processing_stats,
+                class_name="text-xs font-mono text-gray-500 text-center mt-2",
+            ),
+        ),
+        rx.cond(
+            VideoState.is_processing & (VideoState.job_id != ""),
+            rx.el.div(
+                rx.el.button(
+                    "Cancel split",
+                    on_click=VideoState.cancel_split,
+                    class_name="text-xs text-red-600 hover:text-red-800 underline",
+                ),
+                class_name="flex justify-center mt-2",
+            ),
+        ),
         class_name=rx.cond(VideoState.has_video, "block", "hidden"),
     )
\ No newline at end of file
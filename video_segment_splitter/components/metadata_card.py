@@ -40,6 +40,18 @@ def metadata_card() -> rx.Component:
                         "File Size",
                         f"{VideoState.video_metadata.file_size_mb} MB",
                     ),
+                    info_item("film", "Codec", VideoState.video_metadata.video_codec),
+                    info_item(
+                        "gauge",
+                        "Bitrate",
+                        f"{VideoState.video_metadata.bitrate_kbps} kb/s",
+                    ),
+                    info_item(
+                        "key-round",
+                        "Frame Rate / Keyframes",
+                        f"{VideoState.video_metadata.fps} fps / "
+                        f"{VideoState.video_metadata.keyframe_interval} s",
+                    ),
                     class_name="grid grid-cols-1 md:grid-cols-3 gap-4",
                 ),
                 class_name="mt-8 animate-in fade-in slide-in-from-bottom-4 duration-500",
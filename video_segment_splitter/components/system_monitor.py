@@ -1,5 +1,5 @@
 import reflex as rx
-from video_segment_splitter.states.system_state import SystemState
+from video_segment_splitter.states.system_state import JobUsage, SystemState
 from video_segment_splitter.states.video_state import VideoState
 
 
@@ -32,6 +32,20 @@ def _cpu_bar(percent: rx.Var[float], index: rx.Var[int]) -> rx.Component:
     )
 
 
+def _sparkline(values: rx.Var[list[float]], color: str) -> rx.Component:
+    """Recent history of a percentage, oldest on the left."""
+    return rx.el.div(
+        rx.foreach(
+            values,
+            lambda value: rx.el.div(
+                class_name=f"flex-1 {color} rounded-t-sm",
+                style={"height": value.to(str) + "%"},
+            ),
+        ),
+        class_name="flex items-end gap-px h-8 bg-gray-900 rounded-sm overflow-hidden mb-1",
+    )
+
+
 def _stat_row(label: str, value: rx.Var, color: str = "text-cyan-400") -> rx.Component:
     return rx.el.div(
         rx.el.span(label, class_name="text-gray-500 font-mono text-xs"),
@@ -40,6 +54,23 @@ def _stat_row(label: str, value: rx.Var, color: str = "text-cyan-400") -> rx.Com
     )
 
 
+def _job_usage(job: JobUsage) -> rx.Component:
+    return rx.el.div(
+        rx.el.span(
+            job.label,
+            class_name=rx.cond(
+                job.mine,
+                "text-green-400 font-mono text-xs font-bold truncate block",
+                "text-gray-300 font-mono text-xs truncate block",
+            ),
+        ),
+        _stat_row("CPU", job.cpu_percent + " · " + job.cpu_time, "text-white"),
+        _stat_row("Memory", job.memory, "text-cyan-400"),
+        _stat_row("I/O", job.io, "text-cyan-400"),
+        _stat_row("ffmpeg", job.processes, "text-white"),
+    )
+
+
 def system_busy_button() -> rx.Component:
     """Floating 'System Busy' button + inline panel shown during processing."""
     return rx.cond(
@@ -89,6 +120,7 @@ def system_busy_button() -> rx.Component:
                                 ),
                                 class_name="flex justify-between items-center mb-1",
                             ),
+                            _sparkline(SystemState.cpu_history, "bg-green-500/70"),
                             rx.el.div(
                                 rx.foreach(
                                     SystemState.cpu_percents,
@@ -104,6 +136,7 @@ def system_busy_button() -> rx.Component:
                                 "MEMORY",
                                 class_name="text-yellow-400 font-mono text-[10px] font-bold tracking-wider mb-1 block",
                             ),
+                            _sparkline(SystemState.mem_history, "bg-cyan-500/70"),
                             _stat_row(
                                 "Used / Total",
                                 SystemState.mem_used_gb + "G / " + SystemState.mem_total_gb + "G",
@@ -134,6 +167,25 @@ def system_busy_button() -> rx.Component:
                             ),
                             class_name="mb-3",
                         ),
+                        # Running jobs
+                        rx.el.div(
+                            rx.el.span(
+                                "JOBS",
+                                class_name="text-yellow-400 font-mono text-[10px] font-bold tracking-wider mb-1 block",
+                            ),
+                            rx.cond(
+                                SystemState.jobs.length() > 0,
+                                rx.el.div(
+                                    rx.foreach(SystemState.jobs, _job_usage),
+                                    class_name="flex flex-col gap-2",
+                                ),
+                                rx.el.span(
+                                    "No job is running",
+                                    class_name="text-gray-500 font-mono text-xs",
+                                ),
+                            ),
+                            class_name="mb-3",
+                        ),
                         # System info
                         rx.el.div(
                             rx.el.span(
@@ -159,6 +211,11 @@ def system_busy_button() -> rx.Component:
                                 SystemState.uptime_str,
                                 "text-white",
                             ),
+                            _stat_row(
+                                "Encoders",
+                                SystemState.encode_budget,
+                                "text-white",
+                            ),
                         ),
                         class_name="px-3 py-2 overflow-y-auto max-h-[60vh]",
                     ),
@@ -1,7 +1,33 @@
 import reflex as rx
+from reflex.components.core.upload import _on_drop_spec
+from reflex.event import EventChain, call_event_fn
+from reflex.utils.format import format_event_handler
+from reflex.vars.base import Var
+from reflex.vars.function import ArgsFunctionOperation, FunctionStringVar
 from video_segment_splitter.states.video_state import VideoState
 
 
+def _error_spec(message: Var[str]) -> tuple[Var[str]]:
+    return (message,)
+
+
+def _resumable_upload(files: rx.Var) -> rx.event.EventSpec:
+    """Hand the dropped files to assets/resumable_upload.js, which sends
+    them in numbered chunks and calls handle_upload once all arrived, or
+    upload_failed if it gives up."""
+    upload = FunctionStringVar.create("window.clipshiftResumableUpload").call(
+        files,
+        {
+            "apiUrl": str(rx.config.get_config().api_url or "http://localhost:8000"),
+            "handler": format_event_handler(VideoState.handle_upload),
+            "onError": Var.create(
+                EventChain.create(value=VideoState.upload_failed, args_spec=_error_spec)
+            ),
+        },
+    )
+    return rx.call_function(ArgsFunctionOperation.create((), upload))
+
+
 def upload_zone() -> rx.Component:
     return rx.el.div(
         rx.upload.root(
@@ -17,6 +43,17 @@ def upload_zone() -> rx.Component:
                             "Uploading & Processing...",
                             class_name="text-lg font-semibold text-gray-700",
                         ),
+                        rx.el.div(
+                            rx.el.div(
+                                class_name="h-2 bg-blue-600 rounded-full transition-all duration-300 ease-out",
+                                style={"width": f"{VideoState.upload_progress}%"},
+                            ),
+                            class_name="w-64 h-2 bg-gray-100 rounded-full mt-4 overflow-hidden",
+                        ),
+                        rx.el.p(
+                            f"{VideoState.upload_progress}%",
+                            class_name="text-sm font-bold text-blue-600 mt-2",
+                        ),
                         class_name="flex flex-col items-center",
                     ),
                     rx.cond(
@@ -68,7 +105,7 @@ def upload_zone() -> rx.Component:
             id="video_upload",
             multiple=False,
             accept={"video/*": [".mp4", ".mov", ".avi"]},
-            on_drop=VideoState.handle_upload(rx.upload_files(upload_id="video_upload")),
+            on_drop=call_event_fn(_resumable_upload, _on_drop_spec)[0],
             on_mouse_enter=VideoState.toggle_drag,
             on_mouse_leave=VideoState.toggle_drag,
         ),
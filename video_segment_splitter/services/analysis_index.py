@@ -0,0 +1,36 @@
+"""Per-file results of analysis passes over an upload (scene changes,
+silences), kept across restarts as one JSON file per content hash.
+
+A result is only used if it was computed with the current settings of
+its analysis, so changing a threshold invalidates old results.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Optional
+
+
+class AnalysisIndex:
+    def __init__(self, root: Path, settings: dict):
+        self.root = root
+        self.settings = settings
+
+    def _path(self, content_hash: str) -> Path:
+        return self.root / f"{content_hash}.json"
+
+    def get(self, content_hash: str) -> Optional[Any]:
+        try:
+            data = json.loads(self._path(content_hash).read_text())
+        except (OSError, ValueError):
+            return None
+        if data.get("settings") != self.settings:
+            return None
+        return data.get("result")
+
+    def put(self, content_hash: str, result: Any) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self._path(content_hash)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps({"settings": self.settings, "result": result}))
+        os.replace(tmp, path)
@@ -0,0 +1,46 @@
+import hashlib
+from pathlib import Path
+
+# Content hashes are SHA-256 over the SHA-256 digests of consecutive
+# fixed-size blocks. That way a file streamed in order and a file received
+# as out-of-order resumable chunks (one chunk per block) hash the same.
+HASH_BLOCK_SIZE = 8 * 1024 * 1024
+
+
+def combine_block_digests(digests: list[bytes]) -> str:
+    return hashlib.sha256(b"".join(digests)).hexdigest()
+
+
+class ContentHasher:
+    """Incremental content hash; feed the file in order, in any slicing."""
+
+    def __init__(self):
+        self._digests: list[bytes] = []
+        self._block = hashlib.sha256()
+        self._block_len = 0
+
+    def update(self, data: bytes) -> None:
+        view = memoryview(data)
+        while view:
+            take = min(len(view), HASH_BLOCK_SIZE - self._block_len)
+            self._block.update(view[:take])
+            self._block_len += take
+            view = view[take:]
+            if self._block_len == HASH_BLOCK_SIZE:
+                self._digests.append(self._block.digest())
+                self._block = hashlib.sha256()
+                self._block_len = 0
+
+    def hexdigest(self) -> str:
+        digests = list(self._digests)
+        if self._block_len or not digests:
+            digests.append(self._block.digest())
+        return combine_block_digests(digests)
+
+
+def hash_file(path: Path) -> str:
+    hasher = ContentHasher()
+    with open(path, "rb") as f:
+        while block := f.read(HASH_BLOCK_SIZE):
+            hasher.update(block)
+    return hasher.hexdigest()
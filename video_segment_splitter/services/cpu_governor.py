@@ -0,0 +1,156 @@
+"""Feedback-driven CPU budget for encodes, so the web tier stays responsive.
+
+Websocket events are handled on the backend's event loop, so how late the
+loop wakes up is the delay every event waits before it is processed. The
+governor measures that lag all the time and, with every system sample
+(see system_sampler.py), compares its 95th percentile with
+GOVERNOR_TARGET_LATENCY:
+
+- above the target, the cores encodes may use shrink by a quarter and
+  running ffmpeg processes are reniced one step further down;
+- well below it, and with a core to spare according to the sample's
+  per-core usage and load, encodes get one core more.
+
+The budget (encode_cores) decides how many parts of a pool encode run at
+once and how many threads each new ffmpeg process gets (see
+plan_encode_workers), so a running split follows it part by part. A
+single-pass split is one long process, which only the renice reaches.
+Raising the niceness works for any user; lowering it again needs
+CAP_SYS_NICE, so without it processes keep their level and only new ones
+start at the lower one.
+
+A process without a running governor (e.g. an encode worker, the
+benchmark, or with GOVERNOR_TARGET_LATENCY_MS=0) keeps the static budget
+of half the cores and leaves the niceness of its ffmpeg processes alone.
+"""
+
+import asyncio
+import functools
+import logging
+import os
+import time
+from typing import Optional
+
+import psutil
+
+from video_segment_splitter.services.process_usage import ffmpeg_children
+from video_segment_splitter.services.system_sampler import SystemSampler
+
+# Event-loop lag (seconds) the governor steers toward; set
+# GOVERNOR_TARGET_LATENCY_MS=0 to keep the static budget.
+GOVERNOR_TARGET_LATENCY = float(os.environ.get("GOVERNOR_TARGET_LATENCY_MS", "50")) / 1000
+
+# How often the loop lag is measured.
+GOVERNOR_PROBE_INTERVAL = 0.1
+
+# Niceness steps of ffmpeg processes, from relaxed to most pressure. New
+# processes start at the current step.
+ENCODER_NICE_LEVELS = (5, 10, 15, 19)
+
+# Only grow the budget while some core is below this usage (percent).
+GOVERNOR_SPARE_CORE_PERCENT = 80.0
+
+
+class CpuGovernor:
+    def __init__(
+        self,
+        cores: Optional[int] = None,
+        target_latency: float = GOVERNOR_TARGET_LATENCY,
+    ):
+        self.cores = cores or os.cpu_count() or 4
+        self.target_latency = target_latency
+        # At least one core always stays with the web tier.
+        self.max_encode_cores = max(1, self.cores - 1)
+        # Starts out as the static split: half of the cores.
+        self.encode_cores = max(1, self.cores // 2)
+        self._nice_step = 0
+        # Whether run_forever is steering; only then are processes reniced.
+        self.active = False
+        # 95th percentile of the last measuring window, in seconds.
+        self.latency = 0.0
+        self._lags: list[float] = []
+
+    @property
+    def nice(self) -> int:
+        return ENCODER_NICE_LEVELS[self._nice_step]
+
+    def adjust(self, latency: float, stats: dict) -> None:
+        """Update the budget from one window's loop lag and the system
+        sample taken at its end."""
+        self.latency = latency
+        if latency > self.target_latency:
+            self.encode_cores = max(1, self.encode_cores - max(1, self.encode_cores // 4))
+            self._nice_step = min(self._nice_step + 1, len(ENCODER_NICE_LEVELS) - 1)
+            return
+        if latency > self.target_latency / 2:
+            return
+        self._nice_step = max(self._nice_step - 1, 0)
+        percents = stats.get("cpu_percents") or [0.0]
+        spare = min(percents) < GOVERNOR_SPARE_CORE_PERCENT
+        overloaded = float(stats.get("load_avg_1", 0)) > self.cores * 1.5
+        if spare and not overloaded:
+            self.encode_cores = min(self.encode_cores + 1, self.max_encode_cores)
+
+    def adopt(self, pid: int) -> None:
+        """Start a new encoder process at the current niceness."""
+        if not self.active:
+            return
+        try:
+            psutil.Process(pid).nice(self.nice)
+        except psutil.Error:
+            pass
+
+    def _renice(self) -> None:
+        for process in ffmpeg_children():
+            try:
+                if process.nice() != self.nice:
+                    process.nice(self.nice)
+            except psutil.Error:
+                # Gone, or lowering the niceness is not allowed.
+                pass
+
+    async def _probe(self) -> None:
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(GOVERNOR_PROBE_INTERVAL)
+            self._lags.append(
+                max(0.0, time.monotonic() - started - GOVERNOR_PROBE_INTERVAL)
+            )
+
+    async def run_forever(self, sampler: SystemSampler) -> None:
+        if self.target_latency <= 0:
+            return
+        probe = asyncio.create_task(self._probe())
+        self.active = True
+        try:
+            async for stats in sampler.subscribe():
+                lags, self._lags = sorted(self._lags), []
+                if not lags:
+                    continue
+                before = (self.encode_cores, self.nice)
+                self.adjust(lags[int(0.95 * (len(lags) - 1))], stats)
+                if (self.encode_cores, self.nice) != before:
+                    logging.info(
+                        f"Encode budget {self.encode_cores} cores at nice {self.nice}"
+                        f" (loop lag {self.latency * 1000:.0f} ms)"
+                    )
+                try:
+                    await asyncio.to_thread(self._renice)
+                except Exception:
+                    logging.exception("Could not renice encoder processes")
+        finally:
+            self.active = False
+            probe.cancel()
+
+    def status(self) -> dict:
+        return {
+            "encode_cores": self.encode_cores,
+            "nice": self.nice,
+            "latency": self.latency,
+            "target_latency": self.target_latency,
+        }
+
+
+@functools.cache
+def get_cpu_governor() -> CpuGovernor:
+    return CpuGovernor()
@@ -0,0 +1,156 @@
+"""Named encoder settings for re-encoding splits (precise and single_pass).
+
+Profiles only use software encoders that every ffmpeg build ships, so a
+split encodes the same way on any host, including remote encode workers.
+Fast mode copies streams and ignores the profile.
+"""
+
+import asyncio
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import aclosing
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+from reflex.utils.prerequisites import get_states_dir
+
+from video_segment_splitter.services import metrics
+
+
+@dataclass(frozen=True)
+class EncodeProfile:
+    name: str
+    label: str
+    hint: str
+    video_codec: str
+    preset: str
+    crf: int
+    audio_bitrate: str
+    tune: Optional[str] = None
+    # Scale down to at most this height, keeping the aspect ratio.
+    max_height: Optional[int] = None
+
+    def scale_filter(self) -> str:
+        """Filter-graph step for the downscale, or "" if there is none."""
+        if self.max_height is None:
+            return ""
+        # -2 keeps the width even, which yuv420p needs.
+        return f"scale=-2:min(ih\\,{self.max_height}),"
+
+    def codec_args(self, video_stream: str = "-c:v") -> list[str]:
+        args = [
+            video_stream, self.video_codec,
+            "-preset", self.preset,
+            "-crf", str(self.crf),
+        ]
+        if self.tune:
+            args += ["-tune", self.tune]
+        return args + ["-c:a", "aac", "-b:a", self.audio_bitrate]
+
+
+ENCODE_PROFILES = {
+    profile.name: profile
+    for profile in (
+        EncodeProfile(
+            name="preview",
+            label="Ultrafast preview",
+            hint="480p, quick to encode",
+            video_codec="libx264",
+            preset="ultrafast",
+            crf=30,
+            tune="fastdecode",
+            audio_bitrate="96k",
+            max_height=480,
+        ),
+        # libx264's and ffmpeg's own defaults.
+        EncodeProfile(
+            name="balanced",
+            label="Balanced",
+            hint="Full size, default quality",
+            video_codec="libx264",
+            preset="medium",
+            crf=23,
+            audio_bitrate="128k",
+        ),
+        EncodeProfile(
+            name="archival",
+            label="Archival",
+            hint="Near-lossless, slow",
+            video_codec="libx264",
+            preset="slow",
+            crf=16,
+            audio_bitrate="256k",
+        ),
+    )
+}
+
+DEFAULT_ENCODE_PROFILE = "balanced"
+
+# Weight of the newest measurement in a profile's throughput average.
+THROUGHPUT_SMOOTHING = 0.3
+
+
+def get_encode_profile(name: str) -> EncodeProfile:
+    return ENCODE_PROFILES.get(name) or ENCODE_PROFILES[DEFAULT_ENCODE_PROFILE]
+
+
+class ThroughputLog:
+    """Measured encode speed per profile and split mode, in seconds of
+    video per second of wall time, kept across restarts in a JSON file."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def speeds(self) -> dict[str, float]:
+        try:
+            return json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def record(self, key: str, media_seconds: float, wall_seconds: float) -> None:
+        if media_seconds <= 0 or wall_seconds <= 0:
+            return
+        speed = media_seconds / wall_seconds
+        with self._lock:
+            speeds = self.speeds()
+            previous = speeds.get(key)
+            speeds[key] = (
+                speed
+                if previous is None
+                else previous + THROUGHPUT_SMOOTHING * (speed - previous)
+            )
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(speeds))
+            os.replace(tmp, self.path)
+
+
+def throughput_key(profile: str, split_mode: str) -> str:
+    return f"{profile}/{split_mode}"
+
+
+async def measure_throughput(
+    parts: AsyncIterator, media_seconds: float, key: str
+) -> AsyncIterator:
+    """Pass parts through and record the encode speed once all are done."""
+    started = time.monotonic()
+    async with aclosing(parts):
+        async for part in parts:
+            yield part
+    wall_seconds = time.monotonic() - started
+    if media_seconds > 0 and wall_seconds > 0:
+        # key is throughput_key(profile, split_mode).
+        metrics.encode_speed.observe(media_seconds / wall_seconds, *key.split("/"))
+    await asyncio.to_thread(
+        get_throughput_log().record, key, media_seconds, wall_seconds
+    )
+
+
+@functools.cache
+def get_throughput_log() -> ThroughputLog:
+    return ThroughputLog(get_states_dir() / "encode_throughput.json")
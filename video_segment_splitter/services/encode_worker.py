@@ -0,0 +1,256 @@
+"""Standalone encode worker for distributed splits (see remote_encode.py).
+
+Run one or more next to (or away from) the app:
+
+    ENCODE_WORKER_TOKEN=<secret> python -m video_segment_splitter.services.encode_worker \
+        --host 0.0.0.0 --port 8101 --coordinator http://app-host:8000
+
+and list them in ENCODE_WORKERS on the app server. A worker encodes one
+part per request, reading the source over HTTP with range requests and
+sending the finished part back as the response body:
+
+    GET  /health    -> {"worker", "slots", "busy"}
+    POST /encode    {"input_url", "start", "duration", "copy", "profile"}
+                    -> video/mp4
+
+Set ENCODE_WORKER_TOKEN on both sides to require a shared bearer token;
+a worker refuses to listen on anything but a loopback address without
+one. input_url must point at the upload endpoint of the coordinator (the
+app's api_url), so a worker cannot be made to fetch other URLs.
+"""
+
+import argparse
+import asyncio
+import ipaddress
+import os
+import socket
+import tempfile
+import uuid
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from granian import Granian
+from granian.constants import Interfaces
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from video_segment_splitter.services.encode_profiles import (
+    DEFAULT_ENCODE_PROFILE,
+    ENCODE_PROFILES,
+)
+from video_segment_splitter.services.splitter import (
+    get_ffmpeg_path,
+    plan_encode_workers,
+    run_ffmpeg,
+    segment_encode_args,
+)
+
+# How often a running encode checks whether the coordinator hung up.
+DISCONNECT_POLL_INTERVAL = 1.0
+
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# The app's default api_url.
+DEFAULT_COORDINATOR = "http://localhost:8000"
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def _origin(url: str) -> tuple[str, str, int]:
+    """(scheme, host, port) of url. Raises ValueError for a bad port."""
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    return scheme, (parts.hostname or "").lower(), parts.port or _DEFAULT_PORTS.get(scheme, 0)
+
+
+def _is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class EncodeWorker:
+    def __init__(
+        self,
+        slots: int,
+        threads: int,
+        token: str = "",
+        coordinator: str = DEFAULT_COORDINATOR,
+    ):
+        self.slots = slots
+        self.threads = threads
+        self.token = token
+        self.coordinator = _origin(coordinator)
+        # Where the coordinator serves uploads (see remote_encoder).
+        self._uploads = urlsplit(coordinator).path.rstrip("/") + "/_upload/"
+        self.busy = 0
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._slots = asyncio.Semaphore(slots)
+        self._scratch = Path(tempfile.gettempdir())
+        self._ffmpeg = get_ffmpeg_path()
+
+    def _authorized(self, request: Request) -> bool:
+        return not self.token or (
+            request.headers.get("authorization") == f"Bearer {self.token}"
+        )
+
+    def _from_coordinator(self, input_url: str) -> bool:
+        try:
+            origin = _origin(input_url)
+        except ValueError:
+            return False
+        return origin == self.coordinator and urlsplit(input_url).path.startswith(
+            self._uploads
+        )
+
+    async def health(self, request: Request) -> Response:
+        return JSONResponse(
+            {"worker": self.worker_id, "slots": self.slots, "busy": self.busy}
+        )
+
+    async def encode(self, request: Request) -> Response:
+        if not self._authorized(request):
+            return JSONResponse({"detail": "Bad worker token."}, status_code=401)
+        try:
+            body = await request.json()
+            input_url = str(body["input_url"])
+            start = float(body["start"])
+            duration = float(body["duration"])
+            copy = bool(body["copy"])
+            profile = ENCODE_PROFILES[body.get("profile", DEFAULT_ENCODE_PROFILE)]
+        except (ValueError, KeyError, TypeError):
+            return JSONResponse(
+                {"detail": "Expected {input_url, start, duration, copy, profile}."},
+                status_code=400,
+            )
+        if not self._from_coordinator(input_url):
+            return JSONResponse(
+                {"detail": "input_url must be an upload of the coordinator."},
+                status_code=400,
+            )
+
+        output = self._scratch / f"encode-worker-{uuid.uuid4().hex}.mp4"
+        async with self._slots:
+            self.busy += 1
+            try:
+                encode = asyncio.create_task(
+                    run_ffmpeg(
+                        *segment_encode_args(
+                            self._ffmpeg,
+                            input_url,
+                            start,
+                            duration,
+                            output,
+                            copy,
+                            self.threads,
+                            profile,
+                        )
+                    )
+                )
+                # Nobody will collect a part whose coordinator is gone, so
+                # stop its ffmpeg instead of finishing it.
+                while not encode.done():
+                    await asyncio.wait({encode}, timeout=DISCONNECT_POLL_INTERVAL)
+                    if not encode.done() and await request.is_disconnected():
+                        encode.cancel()
+                        await asyncio.gather(encode, return_exceptions=True)
+                        output.unlink(missing_ok=True)
+                        return Response(status_code=499)
+                returncode, stderr = encode.result()
+            finally:
+                self.busy -= 1
+        if returncode != 0:
+            output.unlink(missing_ok=True)
+            # Reported as a failure of the part, not of the worker.
+            return JSONResponse({"detail": stderr.decode()}, status_code=422)
+        # Sent from an open handle of the already deleted file: a
+        # FileResponse may be sent by the server after its background
+        # task has run, so the part could be gone before it is read.
+        part = await asyncio.to_thread(output.open, "rb")
+        output.unlink()
+        size = os.fstat(part.fileno()).st_size
+
+        async def chunks():
+            try:
+                while data := await asyncio.to_thread(part.read, STREAM_CHUNK_SIZE):
+                    yield data
+            finally:
+                part.close()
+
+        return StreamingResponse(
+            chunks(),
+            media_type="video/mp4",
+            headers={"Content-Length": str(size)},
+        )
+
+
+def create_app(
+    slots: int,
+    threads: int,
+    token: str = "",
+    coordinator: str = DEFAULT_COORDINATOR,
+) -> Starlette:
+    worker = EncodeWorker(slots, threads, token, coordinator)
+    return Starlette(
+        routes=[
+            Route("/health", worker.health, methods=["GET"]),
+            Route("/encode", worker.encode, methods=["POST"]),
+        ]
+    )
+
+
+def _app_from_env() -> Starlette:
+    """App factory for the ASGI server; settings come from main()."""
+    return create_app(
+        int(os.environ["ENCODE_WORKER_SLOTS"]),
+        int(os.environ["ENCODE_WORKER_THREADS"]),
+        os.environ.get("ENCODE_WORKER_TOKEN", ""),
+        os.environ["ENCODE_WORKER_COORDINATOR"],
+    )
+
+
+def main() -> None:
+    # By default a worker takes the same share of its host as a local
+    # split does (half of the cores).
+    default_slots, default_threads = plan_encode_workers(os.cpu_count() or 4)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8101)
+    parser.add_argument("--slots", type=int, default=default_slots,
+                        help="parts encoded at the same time")
+    parser.add_argument("--threads", type=int, default=default_threads,
+                        help="ffmpeg threads per part")
+    parser.add_argument(
+        "--coordinator",
+        default=os.environ.get("ENCODE_WORKER_COORDINATOR", DEFAULT_COORDINATOR),
+        help="api_url of the app whose uploads this worker encodes",
+    )
+    args = parser.parse_args()
+    if not _is_loopback(args.host) and not os.environ.get("ENCODE_WORKER_TOKEN"):
+        parser.error(
+            f"set ENCODE_WORKER_TOKEN to listen on {args.host}; without it"
+            " anyone who can reach the worker can make it encode"
+        )
+    try:
+        _origin(args.coordinator)
+    except ValueError:
+        parser.error(f"invalid --coordinator {args.coordinator}")
+    os.environ["ENCODE_WORKER_COORDINATOR"] = args.coordinator
+    os.environ["ENCODE_WORKER_SLOTS"] = str(args.slots)
+    os.environ["ENCODE_WORKER_THREADS"] = str(args.threads)
+    Granian(
+        "video_segment_splitter.services.encode_worker:_app_from_env",
+        address=args.host,
+        port=args.port,
+        interface=Interfaces.ASGI,
+        factory=True,
+    ).serve()
+
+
+if __name__ == "__main__":
+    main()
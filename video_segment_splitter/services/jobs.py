@@ -0,0 +1,679 @@
+"""Persistent queue for CPU-heavy jobs (currently only splits).
+
+Jobs are rows in a SQLite database, so they survive a server restart and
+every backend process on the machine sees the same queue. Each process
+runs a scheduler (JobQueue.run_forever, started as a Reflex lifespan task)
+that claims queued jobs with a single UPDATE ... WHERE status = 'queued',
+never letting more than MAX_RUNNING_JOBS run machine-wide.
+
+Scheduling is fair-share: the next job is the oldest one of the owner
+(browser tab) with the fewest running jobs, which is FIFO while every
+owner has at most one job waiting.
+
+A running job writes a heartbeat; if its process dies, the heartbeat goes
+stale and the job is queued again. Sessions follow their jobs by polling
+the store (JobQueue.watch), which also works across processes.
+
+Cancelling a queued job finishes it at once. A running one is marked
+"cancelling"; the process running it sees that with its next heartbeat
+and stops the runner, whose cleanup kills its ffmpeg processes and drops
+its partial output, and the job ends up "cancelled". Jobs of owners
+whose browser tab has been gone for IDLE_SESSION_TIMEOUT are cancelled
+the same way (see JobQueue.watch_sessions).
+
+Runners can also publish outputs while they run, e.g. each finished
+part of a split. They are rows of their own (job_outputs), so followers
+read only the ones they have not seen yet however many there are. They
+are dropped once the job has finished; its result supersedes them.
+
+The CPU time, memory and I/O of the subprocesses a job starts are sampled
+with its heartbeat (see process_usage.py), kept with the job and written
+to a job log when it ends.
+"""
+
+import asyncio
+import functools
+import json
+import logging
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, Optional, Sequence
+
+from reflex.utils.prerequisites import get_states_dir
+
+from video_segment_splitter.services import metrics
+from video_segment_splitter.services.process_usage import ProcessUsage, usage_scope
+
+# Every split already spreads ffmpeg over the encode budget (see
+# plan_encode_workers); running more jobs at once only slows each down.
+# Two let one job read and mux while the other encodes.
+MAX_RUNNING_JOBS = 2
+
+# How often followers poll the store and running jobs save progress.
+JOB_POLL_INTERVAL = 0.5
+
+# A running job without a heartbeat for this long is considered dead.
+JOB_HEARTBEAT_TIMEOUT = 30
+
+# Finished jobs are deleted after a week.
+JOB_RETENTION = 7 * 24 * 3600
+
+# Jobs of a tab that has been disconnected this long are cancelled. Long
+# enough to survive a reload or a short network drop.
+IDLE_SESSION_TIMEOUT = 120
+
+ACTIVE_STATUSES = ("queued", "running", "cancelling")
+FINISHED_STATUSES = ("done", "failed", "cancelled")
+
+# The order claim_next picks queued jobs (aliased j) in: owners with the
+# fewest jobs holding a slot first, a cancelling one included, then the
+# oldest job.
+_CLAIM_ORDER = (
+    "(SELECT COUNT(*) FROM jobs AS r"
+    " WHERE r.status IN ('running', 'cancelling') AND r.owner = j.owner),"
+    " j.created_at, j.id"
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL,
+    result TEXT,
+    error TEXT NOT NULL DEFAULT '',
+    progress REAL NOT NULL DEFAULT 0,
+    detail TEXT,
+    usage TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat REAL,
+    worker TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS jobs_by_owner ON jobs (owner, created_at);
+CREATE TABLE IF NOT EXISTS job_outputs (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    record TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+);
+"""
+
+
+@dataclass
+class Job:
+    id: str
+    owner: str
+    kind: str
+    status: str
+    params: dict
+    result: Optional[dict]
+    error: str
+    progress: float
+    # Runner-defined live details next to progress, e.g. speed and ETA.
+    detail: Optional[dict]
+    # Resources of the job's subprocesses (see ProcessUsage.sample).
+    usage: Optional[dict]
+    created_at: float
+    # Queued jobs ahead of this one; 0 unless queued.
+    position: int = 0
+    # Outputs published so far (see JobStore.outputs).
+    outputs: int = 0
+
+
+def _job(row: sqlite3.Row, position: int = 0, outputs: int = 0) -> Job:
+    return Job(
+        id=row["id"],
+        owner=row["owner"],
+        kind=row["kind"],
+        status=row["status"],
+        params=json.loads(row["params"]),
+        result=json.loads(row["result"]) if row["result"] else None,
+        error=row["error"],
+        progress=row["progress"],
+        detail=json.loads(row["detail"]) if row["detail"] else None,
+        usage=json.loads(row["usage"]) if row["usage"] else None,
+        created_at=row["created_at"],
+        position=position,
+        outputs=outputs,
+    )
+
+
+class JobStore:
+    """Blocking SQLite access; call it from a worker thread."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(_SCHEMA)
+            columns = {row["name"] for row in db.execute("PRAGMA table_info(jobs)")}
+            if "detail" not in columns:
+                # Store created before jobs reported details.
+                db.execute("ALTER TABLE jobs ADD COLUMN detail TEXT")
+            if "usage" not in columns:
+                db.execute("ALTER TABLE jobs ADD COLUMN usage TEXT")
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        return db
+
+    def add(self, owner: str, kind: str, params: dict) -> str:
+        job_id = uuid.uuid4().hex
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO jobs (id, owner, kind, status, params, created_at)"
+                " VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, owner, kind, json.dumps(params), time.time()),
+            )
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            position = 0
+            if row["status"] == "queued":
+                # Jobs claim_next would pick first as things stand.
+                position = db.execute(
+                    "SELECT position FROM (SELECT id, ROW_NUMBER() OVER"
+                    f" (ORDER BY {_CLAIM_ORDER}) - 1 AS position"
+                    " FROM jobs AS j WHERE status = 'queued') WHERE id = ?",
+                    (job_id,),
+                ).fetchone()[0]
+            outputs = db.execute(
+                "SELECT COUNT(*) FROM job_outputs WHERE job_id = ?", (job_id,)
+            ).fetchone()[0]
+            return _job(row, position, outputs)
+
+    def active_job(self, owner: str) -> Optional[Job]:
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT id FROM jobs WHERE owner = ?"
+                " AND status IN ('queued', 'running', 'cancelling')"
+                " ORDER BY created_at DESC LIMIT 1",
+                (owner,),
+            ).fetchone()
+        return self.get(row["id"]) if row else None
+
+    def claim_next(self, worker: str, limit: int) -> Optional[Job]:
+        """Mark the next job running for worker, unless limit jobs already run."""
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                stale = db.execute(
+                    "UPDATE jobs SET status = 'queued', worker = NULL, progress = 0,"
+                    " detail = NULL, usage = NULL"
+                    " WHERE status = 'running' AND heartbeat < ?",
+                    (now - JOB_HEARTBEAT_TIMEOUT,),
+                ).rowcount
+                if stale:
+                    logging.warning(f"Re-queued {stale} job(s) of a dead worker")
+                    db.execute(
+                        "DELETE FROM job_outputs WHERE job_id IN"
+                        " (SELECT id FROM jobs WHERE status = 'queued')"
+                    )
+                # Their worker died before it could stop them; nothing is
+                # left to clean up but the row.
+                db.execute(
+                    "UPDATE jobs SET status = 'cancelled', finished_at = ?"
+                    " WHERE status = 'cancelling' AND heartbeat < ?",
+                    (now, now - JOB_HEARTBEAT_TIMEOUT),
+                )
+                # A cancelling job holds its slot until its ffmpeg is gone.
+                running = db.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status IN ('running', 'cancelling')"
+                ).fetchone()[0]
+                row = None
+                if running < limit:
+                    row = db.execute(
+                        "SELECT * FROM jobs AS j WHERE status = 'queued'"
+                        f" ORDER BY {_CLAIM_ORDER} LIMIT 1"
+                    ).fetchone()
+                if row is not None:
+                    db.execute(
+                        "UPDATE jobs SET status = 'running', worker = ?,"
+                        " started_at = ?, heartbeat = ? WHERE id = ?",
+                        (worker, now, now, row["id"]),
+                    )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return _job(row) if row is not None else None
+
+    def heartbeat(
+        self,
+        job_id: str,
+        progress: float,
+        detail: Optional[dict] = None,
+        outputs: Sequence[dict] = (),
+        usage: Optional[dict] = None,
+    ) -> str:
+        """Save the job's progress, new outputs and resource usage and
+        return its status, which is "cancelling" once someone asked to stop
+        it."""
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                if outputs:
+                    first = db.execute(
+                        "SELECT COALESCE(MAX(seq) + 1, 0) FROM job_outputs"
+                        " WHERE job_id = ?",
+                        (job_id,),
+                    ).fetchone()[0]
+                    # Not once the job has finished and its outputs are gone.
+                    db.executemany(
+                        "INSERT INTO job_outputs (job_id, seq, record)"
+                        " SELECT id, ?, ? FROM jobs"
+                        " WHERE id = ? AND status IN ('running', 'cancelling')",
+                        [
+                            (first + i, json.dumps(record), job_id)
+                            for i, record in enumerate(outputs)
+                        ],
+                    )
+                # Nor over the final progress and usage of a finished job.
+                db.execute(
+                    "UPDATE jobs SET heartbeat = ?, progress = ?, detail = ?, usage = ?"
+                    " WHERE id = ? AND status IN ('running', 'cancelling')",
+                    (
+                        time.time(),
+                        progress,
+                        json.dumps(detail) if detail is not None else None,
+                        json.dumps(usage) if usage is not None else None,
+                        job_id,
+                    ),
+                )
+                row = db.execute(
+                    "SELECT status FROM jobs WHERE id = ?", (job_id,)
+                ).fetchone()
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return row["status"] if row else ""
+
+    def outputs(self, job_id: str, since: int = 0) -> list[dict]:
+        """Outputs of a running job, from the since-th on."""
+        with self._connect() as db:
+            return [
+                json.loads(row["record"])
+                for row in db.execute(
+                    "SELECT record FROM job_outputs WHERE job_id = ? AND seq >= ?"
+                    " ORDER BY seq",
+                    (job_id, since),
+                )
+            ]
+
+    def cancel(self, job_id: str) -> str:
+        """Cancel a queued job, or ask the worker of a running one to stop
+        it. Returns the job's status afterwards ("" if there is no job)."""
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.execute(
+                    "UPDATE jobs SET status = 'cancelled', finished_at = ?"
+                    " WHERE id = ? AND status = 'queued'",
+                    (time.time(), job_id),
+                )
+                db.execute(
+                    "UPDATE jobs SET status = 'cancelling'"
+                    " WHERE id = ? AND status = 'running'",
+                    (job_id,),
+                )
+                row = db.execute(
+                    "SELECT status FROM jobs WHERE id = ?", (job_id,)
+                ).fetchone()
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return row["status"] if row else ""
+
+    def counts(self) -> dict[str, int]:
+        """Number of pending jobs by status, machine-wide."""
+        with self._connect() as db:
+            return {
+                row["status"]: row["n"]
+                for row in db.execute(
+                    "SELECT status, COUNT(*) AS n FROM jobs"
+                    " WHERE status IN ('queued', 'running', 'cancelling')"
+                    " GROUP BY status"
+                )
+            }
+
+    def running(self) -> list[Job]:
+        """Running jobs machine-wide, oldest first."""
+        with self._connect() as db:
+            return [
+                _job(row)
+                for row in db.execute(
+                    "SELECT * FROM jobs WHERE status IN ('running', 'cancelling')"
+                    " ORDER BY started_at"
+                )
+            ]
+
+    def active_owners(self) -> set[str]:
+        with self._connect() as db:
+            return {
+                row["owner"]
+                for row in db.execute(
+                    "SELECT DISTINCT owner FROM jobs"
+                    " WHERE status IN ('queued', 'running')"
+                )
+            }
+
+    def finish(
+        self,
+        job_id: str,
+        status: str,
+        result: Optional[dict] = None,
+        error: str = "",
+        usage: Optional[dict] = None,
+    ) -> None:
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?,"
+                " progress = CASE WHEN ? = 'done' THEN 1 ELSE progress END,"
+                " usage = COALESCE(?, usage)"
+                " WHERE id = ?",
+                (
+                    status,
+                    json.dumps(result) if result is not None else None,
+                    error,
+                    time.time(),
+                    status,
+                    json.dumps(usage) if usage is not None else None,
+                    job_id,
+                ),
+            )
+            db.execute("DELETE FROM job_outputs WHERE job_id = ?", (job_id,))
+
+    def requeue(self, job_id: str) -> None:
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL, progress = 0,"
+                " detail = NULL, usage = NULL WHERE id = ? AND status = 'running'",
+                (job_id,),
+            )
+            db.execute("DELETE FROM job_outputs WHERE job_id = ?", (job_id,))
+
+    def cancel_owner(self, owner: str) -> list[str]:
+        """Cancel every pending job of owner; returns their ids."""
+        with self._connect() as db:
+            ids = [
+                row["id"]
+                for row in db.execute(
+                    "SELECT id FROM jobs WHERE owner = ?"
+                    " AND status IN ('queued', 'running')",
+                    (owner,),
+                )
+            ]
+        for job_id in ids:
+            self.cancel(job_id)
+        return ids
+
+    def prune(self) -> None:
+        with self._connect() as db:
+            db.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed', 'cancelled')"
+                " AND finished_at < ?",
+                (time.time() - JOB_RETENTION,),
+            )
+
+
+# report(progress, detail=None, outputs=None): progress from 0 to 1 plus
+# optional JSON-safe details. Cheap to call often; only the latest values
+# are saved, every JOB_POLL_INTERVAL. outputs (JSON-safe records) are
+# appended to the job's outputs instead, all of them.
+ReportProgress = Callable[..., None]
+JobRunner = Callable[[dict, ReportProgress], Awaitable[dict]]
+
+
+class JobQueue:
+    def __init__(self, store: JobStore, log_path: Optional[Path] = None):
+        self.store = store
+        # Resource usage of every job that ends here (see _log).
+        self.log_path = log_path
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._runners: dict[str, JobRunner] = {}
+        self._wakeup = asyncio.Event()
+        self._running: dict[str, asyncio.Task] = {}
+        # Running jobs of this process that are being cancelled.
+        self._cancelled: set[str] = set()
+
+    def register(self, kind: str, runner: JobRunner) -> None:
+        """runner(params, report_progress) returns the job's JSON result."""
+        self._runners[kind] = runner
+
+    async def submit(self, owner: str, kind: str, params: dict) -> str:
+        job_id = await asyncio.to_thread(self.store.add, owner, kind, params)
+        self._wakeup.set()
+        return job_id
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    async def active_job(self, owner: str) -> Optional[Job]:
+        return await asyncio.to_thread(self.store.active_job, owner)
+
+    async def cancel(self, job_id: str) -> str:
+        """Cancel the job; returns its status afterwards.
+
+        A job running in this process is stopped right away, one running
+        elsewhere with that process's next heartbeat."""
+        status = await asyncio.to_thread(self.store.cancel, job_id)
+        if status == "cancelling":
+            self._stop(job_id)
+        return status
+
+    def _stop(self, job_id: str) -> None:
+        task = self._running.get(job_id)
+        if task is not None:
+            self._cancelled.add(job_id)
+            task.cancel()
+
+    async def watch_sessions(
+        self, connected_owners: Callable[[], Awaitable[set[str]]]
+    ) -> None:
+        """Cancel the jobs of owners that have been disconnected for
+        IDLE_SESSION_TIMEOUT. connected_owners() returns the owners with an
+        open connection, on every backend process."""
+        gone_since: dict[str, float] = {}
+        while True:
+            await asyncio.sleep(IDLE_SESSION_TIMEOUT / 4)
+            try:
+                owners = await asyncio.to_thread(self.store.active_owners)
+                connected = await connected_owners()
+            except Exception:
+                logging.exception("Could not check for idle sessions")
+                continue
+            now = time.monotonic()
+            gone_since = {
+                owner: gone_since.get(owner, now) for owner in owners - connected
+            }
+            for owner, since in gone_since.items():
+                if now - since < IDLE_SESSION_TIMEOUT:
+                    continue
+                for job_id in await asyncio.to_thread(self.store.cancel_owner, owner):
+                    logging.info(f"Cancelling job {job_id}: its session is gone")
+                    self._stop(job_id)
+
+    async def outputs(self, job_id: str, since: int = 0) -> list[dict]:
+        return await asyncio.to_thread(self.store.outputs, job_id, since)
+
+    async def watch(self, job_id: str) -> AsyncIterator[Job]:
+        """Yield the job whenever its status, queue position, progress or
+        number of outputs changes, until it has finished."""
+        last = None
+        while True:
+            job = await self.get(job_id)
+            if job is None:
+                return
+            seen = (
+                job.status,
+                job.position,
+                round(job.progress, 3),
+                job.detail,
+                job.outputs,
+            )
+            if seen != last:
+                last = seen
+                yield job
+            if job.status in FINISHED_STATUSES:
+                return
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+
+    async def run_forever(self) -> None:
+        await asyncio.to_thread(self.store.prune)
+        try:
+            while True:
+                self._wakeup.clear()
+                while job := await asyncio.to_thread(
+                    self.store.claim_next, self.worker_id, MAX_RUNNING_JOBS
+                ):
+                    self._running[job.id] = asyncio.create_task(self._run(job))
+                # Submissions in this process wake the loop at once; the
+                # timeout picks up other processes' jobs and stale ones.
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), JOB_HEARTBEAT_TIMEOUT / 3)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            # Shutting down: stop our jobs and hand them back to the queue
+            # so the next start (or another process) runs them again.
+            tasks = list(self._running.values())
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, job: Job) -> None:
+        progress = 0.0
+        detail: Optional[dict] = None
+        pending: list[dict] = []
+        usage = ProcessUsage()
+        started = time.monotonic()
+
+        def report(
+            value: float,
+            details: Optional[dict] = None,
+            outputs: Optional[list[dict]] = None,
+        ) -> None:
+            nonlocal progress, detail
+            progress = value
+            detail = details
+            if outputs:
+                pending.extend(outputs)
+
+        stopping = asyncio.Event()
+
+        async def keep_alive():
+            nonlocal pending
+            while True:
+                try:
+                    await asyncio.wait_for(stopping.wait(), JOB_POLL_INTERVAL)
+                    return
+                except asyncio.TimeoutError:
+                    pass
+                outputs, pending = pending, []
+                try:
+                    totals = await asyncio.to_thread(usage.sample)
+                    status = await asyncio.to_thread(
+                        self.store.heartbeat, job.id, progress, detail, outputs, totals
+                    )
+                except Exception:
+                    # A missed beat is fine, a dead task would get the job
+                    # re-run elsewhere; the outputs go with the next one.
+                    logging.exception(f"Could not save the heartbeat of job {job.id}")
+                    pending = outputs + pending
+                    continue
+                if status == "cancelling":
+                    # Cancelled from another process.
+                    self._stop(job.id)
+                    return
+
+        async def finish(status: str, result: Optional[dict] = None, error: str = ""):
+            # A heartbeat saved after this would overwrite the final state.
+            # Cancelling the task would not stop a heartbeat already in its
+            # thread, so it is asked to return and awaited.
+            stopping.set()
+            await heartbeat
+            if status == "queued":
+                # Put back on shutdown; it finishes when it runs again, and
+                # is counted and logged then.
+                await asyncio.to_thread(self.store.requeue, job.id)
+                return
+            totals = await asyncio.to_thread(usage.sample)
+            metrics.jobs_finished.inc(job.kind, status)
+            metrics.job_seconds.observe(time.monotonic() - started, job.kind)
+            await asyncio.to_thread(
+                self.store.finish, job.id, status, result, error, totals
+            )
+            await asyncio.to_thread(
+                self._log, job, status, time.monotonic() - started, totals
+            )
+
+        heartbeat = asyncio.create_task(keep_alive())
+        try:
+            runner = self._runners[job.kind]
+            with usage_scope(usage):
+                result = await runner(job.params, report)
+        except asyncio.CancelledError:
+            # The runner's cleanup has killed its subprocesses and removed
+            # its partial output by now.
+            await finish("cancelled" if job.id in self._cancelled else "queued")
+            raise
+        except Exception as e:
+            logging.exception(f"Job {job.id} ({job.kind}) failed")
+            await finish("failed", error=str(e))
+        else:
+            await finish("done", result)
+        finally:
+            heartbeat.cancel()
+            self._running.pop(job.id, None)
+            self._cancelled.discard(job.id)
+            self._wakeup.set()
+
+    def _log(self, job: Job, status: str, seconds: float, usage: dict) -> None:
+        """Append the job's resource usage to the job log, one JSON object
+        per line. Its scalar params tell the jobs apart, e.g. the split
+        mode, profile and duration of a split."""
+        if self.log_path is None:
+            return
+        entry = {
+            "job": job.id,
+            "kind": job.kind,
+            "status": status,
+            "worker": self.worker_id,
+            "finished_at": time.time(),
+            "wall_seconds": round(seconds, 2),
+            **usage,
+            "params": {
+                key: value
+                for key, value in job.params.items()
+                if isinstance(value, (str, int, float, bool))
+            },
+        }
+        try:
+            with open(self.log_path, "a") as log:
+                log.write(json.dumps(entry) + "\n")
+        except OSError:
+            logging.exception(f"Could not write the log of job {job.id}")
+
+
+@functools.cache
+def get_job_queue() -> JobQueue:
+    states = get_states_dir()
+    return JobQueue(JobStore(states / "jobs.sqlite3"), states / "job_log.jsonl")
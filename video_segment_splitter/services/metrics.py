@@ -0,0 +1,217 @@
+"""Counters and histograms of the split pipeline, served at /metrics in
+the Prometheus text format (see api/metrics.py).
+
+A small registry of its own rather than prometheus_client: the pipeline
+needs three metric types and a text renderer. Values are per backend
+process; with several workers, every process reports its own series and
+Prometheus adds them up. Gauges are read when the endpoint is scraped,
+so they cost nothing in between.
+"""
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Sequence
+
+# Seconds, from a quick ffprobe to a long encode.
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+# Seconds of video encoded per second.
+SPEED_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)
+
+_registry: list["_Metric"] = []
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [
+        f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = dict(self._values)
+        return super().render() + [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+            for key, value in values.items()
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DURATION_BUCKETS,
+    ):
+        super().__init__(name, help, labels)
+        self.buckets = (*sorted(buckets), math.inf)
+        # Per label values: (count per bucket, sum).
+        self._values: dict[tuple, tuple[list[int], float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self._lock:
+            counts, total = self._values.get(labels, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[labels] = (counts, total + value)
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        """Observe how long the block takes, also if it raises."""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - started, *labels)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = {
+                key: (list(counts), total) for key, (counts, total) in self._values.items()
+            }
+        lines = super().render()
+        for key, (counts, total) in values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}"
+                )
+            labels = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Read from collect() at every scrape. collect returns the value for
+    each tuple of label values and may block."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        collect: Callable[[], dict[tuple, float]],
+        labels: Sequence[str] = (),
+    ):
+        super().__init__(name, help, labels)
+        self.collect = collect
+
+    def render(self) -> list[str]:
+        values = self.collect()
+        return super().render() + [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+            for key, value in values.items()
+        ]
+
+
+def render_metrics() -> str:
+    """Every metric in the text exposition format. Blocking; gauges may
+    query the job store."""
+    lines = []
+    for metric in _registry:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+upload_bytes = Counter(
+    "clipshift_upload_bytes_total",
+    "Bytes of uploaded video received.",
+    ["method"],
+)
+upload_seconds = Histogram(
+    "clipshift_upload_seconds",
+    "Time to receive an upload request: a whole form upload or one chunk.",
+    ["method"],
+)
+probe_seconds = Histogram(
+    "clipshift_probe_seconds",
+    "Time to read an upload's metadata with ffprobe.",
+)
+split_requests = Counter(
+    "clipshift_split_requests_total",
+    "Splits requested, by whether the split cache already had the clips.",
+    ["cache"],
+)
+jobs_finished = Counter(
+    "clipshift_jobs_finished_total",
+    "Jobs that ended in this process, by kind and final status.",
+    ["kind", "status"],
+)
+job_seconds = Histogram(
+    "clipshift_job_seconds",
+    "Wall time of a job from start to end, by kind.",
+    ["kind"],
+)
+segment_encode_seconds = Histogram(
+    "clipshift_segment_encode_seconds",
+    "Time to write one part of a split, by split mode.",
+    ["split_mode"],
+)
+encode_speed = Histogram(
+    "clipshift_encode_speed",
+    "Encode speed of a split in seconds of video per second, by profile and mode.",
+    ["profile", "split_mode"],
+    buckets=SPEED_BUCKETS,
+)
+thumbnail_seconds = Histogram(
+    "clipshift_thumbnail_seconds",
+    "Time to embed a thumbnail into a finished part.",
+)
+zip_seconds = Histogram(
+    "clipshift_zip_seconds",
+    "Time to stream a ZIP of a split's clips, by outcome.",
+    ["outcome"],
+)
+zip_bytes = Counter(
+    "clipshift_zip_bytes_total",
+    "Bytes of clips sent in ZIP downloads.",
+)
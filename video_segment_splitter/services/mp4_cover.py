@@ -0,0 +1,125 @@
+import struct
+from pathlib import Path
+from typing import Optional
+
+# ffmpeg stores an MP4 attached_pic as an iTunes-style cover atom:
+# moov/udta/meta/ilst/covr/data.
+_COVER_PATH = [b"udta", b"meta", b"ilst"]
+_DATA_TYPE_JPEG = 13
+_DATA_TYPE_PNG = 14
+
+
+def _box(kind: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+
+def _children(buf: bytes, start: int, end: int):
+    """Yield (kind, offset, size, header_size) for each atom in buf[start:end]."""
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", buf, pos)
+        header = 8
+        if size == 1:
+            (size,) = struct.unpack_from(">Q", buf, pos + 8)
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            raise ValueError(f"corrupt atom {kind!r} at offset {pos}")
+        yield kind, pos, size, header
+        pos += size
+
+
+def _new_container_prefix(kind: bytes) -> bytes:
+    if kind != b"meta":
+        return b""
+    # meta is a full box and needs an mdir handler before ilst.
+    hdlr = _box(b"hdlr", b"\0" * 8 + b"mdirappl" + b"\0" * 9)
+    return b"\0" * 4 + hdlr
+
+
+def _insert(payload: bytes, path: list[bytes], atom: bytes) -> bytes:
+    """Return payload with atom placed under the nested containers in path,
+    creating missing containers and replacing an atom of the same kind."""
+    if not path:
+        kind = atom[4:8]
+        kept = [
+            payload[pos:pos + size]
+            for k, pos, size, _ in _children(payload, 0, len(payload))
+            if k != kind
+        ]
+        return b"".join(kept) + atom
+
+    name, rest = path[0], path[1:]
+    skip = 4 if name == b"meta" else 0
+    for kind, pos, size, header in _children(payload, 0, len(payload)):
+        if kind == name:
+            prefix = payload[pos + header:pos + header + skip]
+            child = payload[pos + header + skip:pos + size]
+            new_child = _box(name, prefix + _insert(child, rest, atom))
+            return payload[:pos] + new_child + payload[pos + size:]
+    return payload + _box(name, _new_container_prefix(name) + _insert(b"", rest, atom))
+
+
+def _find_moov(f) -> tuple[int, int, int]:
+    """Return (offset, size, header_size) of moov, which must be the last
+    top-level atom."""
+    f.seek(0, 2)
+    file_size = f.tell()
+    moov = None
+    pos = 0
+    while pos + 8 <= file_size:
+        f.seek(pos)
+        head = f.read(16)
+        size, kind = struct.unpack_from(">I4s", head)
+        header = 8
+        if size == 1:
+            (size,) = struct.unpack_from(">Q", head, 8)
+            header = 16
+        elif size == 0:
+            size = file_size - pos
+        if size < header:
+            raise ValueError(f"corrupt atom {kind!r} at offset {pos}")
+        moov = (pos, size, header) if kind == b"moov" else None
+        pos += size
+    if moov is None:
+        raise ValueError(f"{Path(f.name).name}: moov is not the last atom")
+    return moov
+
+
+def read_cover(mp4_path: Path) -> Optional[bytes]:
+    """Return the attached_pic image of an MP4, or None if it has none."""
+    with open(mp4_path, "rb") as f:
+        moov_pos, moov_size, header = _find_moov(f)
+        f.seek(moov_pos + header)
+        payload = f.read(moov_size - header)
+    for name in [*_COVER_PATH, b"covr", b"data"]:
+        skip = 4 if name == b"meta" else 0
+        for kind, pos, size, head in _children(payload, 0, len(payload)):
+            if kind == name:
+                payload = payload[pos + head + skip:pos + size]
+                break
+        else:
+            return None
+    # data atom payload: type and locale, then the image.
+    return payload[8:]
+
+
+def attach_cover(mp4_path: Path, image: bytes) -> None:
+    """Embed image (PNG or JPEG) as the attached_pic of an MP4 in place.
+
+    Only the moov atom is rewritten, which requires moov to be the last
+    atom in the file (ffmpeg's layout unless +faststart is used). The media
+    data is never copied."""
+    with open(mp4_path, "r+b") as f:
+        moov_pos, moov_size, header = _find_moov(f)
+        f.seek(moov_pos + header)
+        payload = f.read(moov_size - header)
+
+        data_type = _DATA_TYPE_PNG if image[:4] == b"\x89PNG" else _DATA_TYPE_JPEG
+        covr = _box(b"covr", _box(b"data", struct.pack(">II", data_type, 0) + image))
+        new_moov = _box(b"moov", _insert(payload, _COVER_PATH, covr))
+
+        f.seek(moov_pos)
+        f.write(new_moov)
+        f.truncate()
@@ -0,0 +1,149 @@
+import asyncio
+import bisect
+import json
+import shutil
+from dataclasses import dataclass
+from fractions import Fraction
+from typing import Optional
+
+from video_segment_splitter.services.process_usage import track_process
+
+# The keyframe interval is estimated from the start of the file only, so
+# probing a long upload does not demux all of it.
+KEYFRAME_SAMPLE_SECONDS = 60
+
+
+def get_ffprobe_path() -> str:
+    """Find ffprobe binary. imageio-ffmpeg does not ship one, so the system
+    ffmpeg package (see apt-packages.txt) is required for probing."""
+    return shutil.which("ffprobe") or "ffprobe"
+
+
+@dataclass
+class MediaInfo:
+    duration: float
+    width: int
+    height: int
+    video_codec: str
+    bitrate: int  # bits per second, whole container
+    fps: float
+    keyframe_interval: float  # seconds, 0.0 if unknown
+
+
+async def _run_ffprobe(*args: str) -> str:
+    proc = await asyncio.create_subprocess_exec(
+        get_ffprobe_path(),
+        "-v", "error",
+        *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    track_process(proc.pid)
+    stdout, stderr = await proc.communicate()
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffprobe failed: {stderr.decode()}")
+    return stdout.decode()
+
+
+def _frame_rate(value: Optional[str]) -> float:
+    try:
+        return float(Fraction(value))
+    except (TypeError, ValueError, ZeroDivisionError):
+        return 0.0
+
+
+async def probe_media(input_path: str) -> MediaInfo:
+    """Read container and video stream metadata without decoding any frames.
+
+    Header fields and the keyframe sample are probed concurrently, each by
+    its own short-lived ffprobe process."""
+    headers, keyframes = await asyncio.gather(
+        _run_ffprobe(
+            "-select_streams", "v:0",
+            "-show_entries",
+            "format=duration,bit_rate:stream=codec_name,width,height,"
+            "avg_frame_rate,r_frame_rate,duration:stream_side_data=rotation",
+            "-of", "json",
+            str(input_path),
+        ),
+        probe_keyframes(input_path, until=KEYFRAME_SAMPLE_SECONDS),
+    )
+    info = json.loads(headers)
+    fmt = info.get("format", {})
+    streams = info.get("streams") or [{}]
+    video = streams[0]
+
+    width, height = int(video.get("width", 0)), int(video.get("height", 0))
+    rotation = next(
+        (int(d["rotation"]) for d in video.get("side_data_list", []) if "rotation" in d),
+        0,
+    )
+    if rotation % 180:
+        # Phone footage is stored sideways with a display rotation.
+        width, height = height, width
+
+    gaps = [b - a for a, b in zip(keyframes, keyframes[1:])]
+    return MediaInfo(
+        duration=float(fmt.get("duration") or video.get("duration") or 0.0),
+        width=width,
+        height=height,
+        video_codec=video.get("codec_name", ""),
+        bitrate=int(fmt.get("bit_rate") or 0),
+        fps=_frame_rate(video.get("avg_frame_rate")) or _frame_rate(video.get("r_frame_rate")),
+        keyframe_interval=sum(gaps) / len(gaps) if gaps else 0.0,
+    )
+
+
+async def probe_frame_rate(input_path: str) -> float:
+    """Average frame rate of the first video stream, 0.0 if unknown."""
+    try:
+        stdout = await _run_ffprobe(
+            "-select_streams", "v:0",
+            "-show_entries", "stream=avg_frame_rate,r_frame_rate",
+            "-of", "json",
+            str(input_path),
+        )
+        video = (json.loads(stdout).get("streams") or [{}])[0]
+    except (OSError, RuntimeError, ValueError):
+        return 0.0
+    return _frame_rate(video.get("avg_frame_rate")) or _frame_rate(video.get("r_frame_rate"))
+
+
+async def probe_keyframes(input_path: str, until: Optional[float] = None) -> list[float]:
+    """Return the presentation times (seconds) of every video keyframe,
+    or only of those in the first `until` seconds.
+
+    Only packet headers are read (no decoding), so this is a single cheap
+    demux pass over the file."""
+    read_intervals = ("-read_intervals", f"%+{until}") if until else ()
+    stdout = await _run_ffprobe(
+        "-select_streams", "v:0",
+        *read_intervals,
+        "-show_entries", "packet=pts_time,flags",
+        "-of", "csv=p=0",
+        str(input_path),
+    )
+
+    keyframes = []
+    for line in stdout.splitlines():
+        pts_time, _, flags = line.partition(",")
+        if "K" not in flags or pts_time in ("", "N/A"):
+            continue
+        keyframes.append(float(pts_time))
+    keyframes.sort()
+    return keyframes
+
+
+def snap_to_keyframes(cut_points: list[float], keyframes: list[float]) -> list[float]:
+    """Move each cut point to the nearest keyframe.
+
+    Sorted input gives sorted output. Two cuts may land on the same
+    keyframe; the caller drops the resulting empty segment."""
+    if not keyframes:
+        return list(cut_points)
+    snapped = []
+    for cut in cut_points:
+        i = bisect.bisect_left(keyframes, cut)
+        candidates = keyframes[max(0, i - 1):i + 1]
+        snapped.append(min(candidates, key=lambda k: abs(k - cut)))
+    return snapped
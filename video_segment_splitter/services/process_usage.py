@@ -0,0 +1,140 @@
+"""CPU time, memory and I/O of the subprocesses a job starts.
+
+Code that starts ffmpeg or ffprobe calls track_process with the child's
+PID. The PID counts toward the ProcessUsage of the job whose task started
+it (a context variable, so it follows the job into its subtasks and worker
+threads). The job queue samples that usage with every heartbeat.
+
+psutil can only read a process while it lives, so every process counts
+with its last sample: a process that exits between two samples loses
+what it used after the first one, and one that lives shorter than the
+sampling interval is not seen at all. Encodes of remote workers (see
+remote_encode.py) are not counted either.
+"""
+
+import contextlib
+import contextvars
+import threading
+import time
+from typing import Iterator, Optional
+
+import psutil
+
+# Process names of the tools the pipeline runs.
+_FFMPEG_NAMES = ("ffmpeg", "ffprobe")
+
+_current_usage: contextvars.ContextVar[Optional["ProcessUsage"]] = (
+    contextvars.ContextVar("process_usage", default=None)
+)
+
+
+class ProcessUsage:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._processes: dict[int, psutil.Process] = {}
+        # Last reading per PID: (cpu seconds, bytes read, bytes written).
+        self._readings: dict[int, tuple[float, int, int]] = {}
+        self.peak_rss = 0
+        # Over the last sampling interval, in percent of one core.
+        self.cpu_percent = 0.0
+        self._sampled_at: Optional[float] = None
+        self._sampled_cpu = 0.0
+
+    def track(self, pid: int) -> None:
+        try:
+            process = psutil.Process(pid)
+        except psutil.Error:
+            return
+        with self._lock:
+            self._processes[pid] = process
+
+    def sample(self) -> dict:
+        """Read every live process and return the totals so far. Blocking;
+        run it in a worker thread."""
+        with self._lock:
+            processes = list(self._processes.items())
+        rss = 0
+        gone = []
+        for pid, process in processes:
+            try:
+                with process.oneshot():
+                    times = process.cpu_times()
+                    rss += process.memory_info().rss
+                    io = _io_counters(process)
+            except psutil.Error:
+                gone.append(pid)
+                continue
+            self._readings[pid] = (times.user + times.system, *io)
+        now = time.monotonic()
+        with self._lock:
+            for pid in gone:
+                self._processes.pop(pid, None)
+            self.peak_rss = max(self.peak_rss, rss)
+            totals = self._totals(len(processes) - len(gone), rss)
+            if self._sampled_at is not None and now > self._sampled_at:
+                self.cpu_percent = (
+                    100 * (totals["cpu_seconds"] - self._sampled_cpu)
+                    / (now - self._sampled_at)
+                )
+            self._sampled_at = now
+            self._sampled_cpu = totals["cpu_seconds"]
+            totals["cpu_percent"] = round(self.cpu_percent, 1)
+        return totals
+
+    def _totals(self, running: int, rss: int) -> dict:
+        readings = self._readings.values()
+        return {
+            # Processes sampled so far, and those of them still alive.
+            "processes": len(self._readings),
+            "running": running,
+            "cpu_seconds": round(sum(cpu for cpu, _, _ in readings), 2),
+            # Of the live processes together.
+            "rss": rss,
+            "peak_rss": self.peak_rss,
+            "read_bytes": sum(read for _, read, _ in readings),
+            "write_bytes": sum(written for _, _, written in readings),
+        }
+
+
+def _io_counters(process: psutil.Process) -> tuple[int, int]:
+    """Bytes read and written, including those served from the page cache
+    (read_chars on Linux). (0, 0) where psutil has no I/O counters."""
+    try:
+        io = process.io_counters()
+    except (AttributeError, NotImplementedError, psutil.AccessDenied):
+        return 0, 0
+    return (
+        getattr(io, "read_chars", io.read_bytes),
+        getattr(io, "write_chars", io.write_bytes),
+    )
+
+
+@contextlib.contextmanager
+def usage_scope(usage: ProcessUsage) -> Iterator[ProcessUsage]:
+    """Count the processes tracked inside the block (and in tasks and
+    threads started from it) toward usage."""
+    token = _current_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _current_usage.reset(token)
+
+
+def track_process(pid: int) -> None:
+    """Count a child process toward the current job, if there is one."""
+    usage = _current_usage.get()
+    if usage is not None:
+        usage.track(pid)
+
+
+def ffmpeg_children() -> list[psutil.Process]:
+    """ffmpeg and ffprobe processes started by this process. Blocking."""
+    children = []
+    for child in psutil.Process().children(recursive=True):
+        try:
+            name = child.name()
+        except psutil.Error:
+            continue
+        if name.startswith(_FFMPEG_NAMES):
+            children.append(child)
+    return children
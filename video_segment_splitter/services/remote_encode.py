@@ -0,0 +1,273 @@
+"""Coordinator side of distributed splits.
+
+With ENCODE_WORKERS set to a comma-separated list of encode worker URLs
+(see encode_worker.py), the parts of a precise or fast split are sent to
+those workers instead of local ffmpeg processes. Workers read the upload
+over HTTP from this server's /_upload route and return each finished part
+as the response body, so they need no shared filesystem.
+
+Each worker gets as many parts at a time as it has slots. A worker that
+drops a connection, answers with a server error or stops answering
+health checks is taken out for the rest of the split and its parts go
+back to the others; once no worker is left, the remaining parts are
+encoded locally. single_pass splits always run locally, since their
+point is decoding the source only once.
+"""
+
+import asyncio
+import logging
+import os
+from contextlib import aclosing
+from pathlib import Path
+from typing import AsyncIterator, Optional
+from urllib.parse import quote
+
+import httpx
+
+from video_segment_splitter.services.encode_profiles import EncodeProfile
+from video_segment_splitter.services.splitter import (
+    Encoder,
+    ProgressCallback,
+    SegmentEncodeError,
+    SegmentSpec,
+    encode_segments,
+)
+
+# Health checks of a worker with parts in flight.
+WORKER_HEALTH_INTERVAL = 5.0
+# Missed health checks in a row before a worker is given up.
+WORKER_HEALTH_MISSES = 3
+
+_CONNECT_TIMEOUT = 10.0
+
+
+def encode_worker_urls() -> list[str]:
+    return [
+        url.strip().rstrip("/")
+        for url in os.environ.get("ENCODE_WORKERS", "").split(",")
+        if url.strip()
+    ]
+
+
+class WorkerLost(Exception):
+    """The worker died or became unreachable; its part must be redone."""
+
+
+class RemoteWorker:
+    def __init__(self, client: httpx.AsyncClient, url: str, slots: int):
+        self.client = client
+        self.url = url
+        self.slots = slots
+        self.alive = True
+
+    @classmethod
+    async def connect(cls, client: httpx.AsyncClient, url: str) -> Optional["RemoteWorker"]:
+        try:
+            response = await client.get(f"{url}/health", timeout=_CONNECT_TIMEOUT)
+            response.raise_for_status()
+            slots = int(response.json()["slots"])
+        except (httpx.HTTPError, ValueError, KeyError, TypeError) as e:
+            logging.warning(f"Encode worker {url} is not available: {e}")
+            return None
+        return cls(client, url, max(1, slots))
+
+    async def _healthy(self) -> None:
+        """Return once the worker has missed WORKER_HEALTH_MISSES checks."""
+        misses = 0
+        while misses < WORKER_HEALTH_MISSES:
+            await asyncio.sleep(WORKER_HEALTH_INTERVAL)
+            try:
+                response = await self.client.get(
+                    f"{self.url}/health", timeout=WORKER_HEALTH_INTERVAL
+                )
+                response.raise_for_status()
+                misses = 0
+            except httpx.HTTPError:
+                misses += 1
+
+    async def _fetch(
+        self, input_url: str, spec: SegmentSpec, copy: bool, profile: EncodeProfile
+    ) -> None:
+        partial = spec.path.with_suffix(".remote")
+        try:
+            async with self.client.stream(
+                "POST",
+                f"{self.url}/encode",
+                json={
+                    "input_url": input_url,
+                    "start": spec.start,
+                    "duration": spec.duration,
+                    "copy": copy,
+                    "profile": profile.name,
+                },
+                # Encoding takes as long as it takes; _healthy notices a
+                # worker that is gone.
+                timeout=httpx.Timeout(_CONNECT_TIMEOUT, read=None),
+            ) as response:
+                if response.status_code == 422:
+                    detail = (await response.aread()).decode(errors="replace")
+                    raise SegmentEncodeError(spec.index, detail)
+                if response.status_code != 200:
+                    raise WorkerLost(f"HTTP {response.status_code}")
+                expected = int(response.headers.get("content-length", -1))
+                received = 0
+                with partial.open("wb") as f:
+                    async for data in response.aiter_bytes():
+                        await asyncio.to_thread(f.write, data)
+                        received += len(data)
+                if expected >= 0 and received != expected:
+                    raise WorkerLost(f"got {received} of {expected} bytes")
+            os.replace(partial, spec.path)
+        except httpx.HTTPError as e:
+            raise WorkerLost(repr(e)) from e
+        finally:
+            partial.unlink(missing_ok=True)
+
+    async def encode(
+        self, input_url: str, spec: SegmentSpec, copy: bool, profile: EncodeProfile
+    ) -> None:
+        fetch = asyncio.create_task(self._fetch(input_url, spec, copy, profile))
+        watchdog = asyncio.create_task(self._healthy())
+        try:
+            await asyncio.wait({fetch, watchdog}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            watchdog.cancel()
+            if not fetch.done():
+                fetch.cancel()
+                await asyncio.gather(fetch, return_exceptions=True)
+        if fetch.cancelled():
+            raise WorkerLost("stopped answering health checks")
+        fetch.result()
+
+
+async def encode_remotely(
+    ffmpeg: str,
+    input_path: str,
+    input_url: str,
+    specs: list[SegmentSpec],
+    copy: bool,
+    profile: EncodeProfile,
+    worker_urls: list[str],
+    token: str = "",
+    on_progress: Optional[ProgressCallback] = None,
+) -> AsyncIterator[SegmentSpec]:
+    """Encode specs on the workers and yield each part once it is written
+    to spec.path. Finished parts may arrive out of order. on_progress only
+    hears of parts encoded locally; workers do not report progress."""
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    async with httpx.AsyncClient(headers=headers) as client:
+        workers = [
+            worker
+            for worker in await asyncio.gather(
+                *(RemoteWorker.connect(client, url) for url in worker_urls)
+            )
+            if worker is not None
+        ]
+        todo: asyncio.Queue[SegmentSpec] = asyncio.Queue()
+        for spec in specs:
+            todo.put_nowait(spec)
+        # Finished specs, a SegmentEncodeError, or None once no worker is left.
+        results: asyncio.Queue = asyncio.Queue()
+        if not workers:
+            results.put_nowait(None)
+
+        async def lane(worker: RemoteWorker):
+            while worker.alive:
+                spec = await todo.get()
+                if not worker.alive:
+                    todo.put_nowait(spec)
+                    return
+                try:
+                    await worker.encode(input_url, spec, copy, profile)
+                except WorkerLost as e:
+                    logging.warning(
+                        f"Encode worker {worker.url} lost during {spec.path.name}: {e}"
+                    )
+                    todo.put_nowait(spec)
+                    if worker.alive:
+                        worker.alive = False
+                        if not any(w.alive for w in workers):
+                            results.put_nowait(None)
+                    return
+                except SegmentEncodeError as e:
+                    results.put_nowait(e)
+                    return
+                results.put_nowait(spec)
+
+        lanes = [
+            asyncio.create_task(lane(worker))
+            for worker in workers
+            for _ in range(worker.slots)
+        ]
+        finished: set[int] = set()
+        try:
+            while len(finished) < len(specs):
+                result = await results.get()
+                if result is None:
+                    break
+                if isinstance(result, SegmentEncodeError):
+                    raise result
+                finished.add(result.index)
+                yield result
+        finally:
+            for task in lanes:
+                task.cancel()
+            await asyncio.gather(*lanes, return_exceptions=True)
+
+    remaining = [spec for spec in specs if spec.index not in finished]
+    if remaining:
+        logging.warning(
+            f"No encode worker left; encoding {len(remaining)} part(s) locally"
+        )
+        async with aclosing(
+            encode_segments(
+                ffmpeg,
+                input_path,
+                remaining,
+                "fast" if copy else "precise",
+                profile,
+                on_progress,
+            )
+        ) as local:
+            async for spec in local:
+                yield spec
+
+
+def remote_encoder(
+    ffmpeg: str,
+    input_path: str,
+    upload_dir: Path,
+    api_url: str,
+    profile: EncodeProfile,
+    on_progress: Optional[ProgressCallback] = None,
+) -> Optional[Encoder]:
+    """An encoder for split_segments that uses ENCODE_WORKERS, or None if
+    none are configured or the input is not served under /_upload."""
+    worker_urls = encode_worker_urls()
+    if not worker_urls:
+        return None
+    try:
+        relative = Path(input_path).resolve().relative_to(upload_dir.resolve())
+    except ValueError:
+        return None
+    input_url = f"{api_url.rstrip('/')}/_upload/{quote(relative.as_posix())}"
+    token = os.environ.get("ENCODE_WORKER_TOKEN", "")
+
+    def encoder(specs: list[SegmentSpec], split_mode: str) -> AsyncIterator[SegmentSpec]:
+        if split_mode == "single_pass":
+            return encode_segments(
+                ffmpeg, input_path, specs, split_mode, profile, on_progress
+            )
+        return encode_remotely(
+            ffmpeg,
+            input_path,
+            input_url,
+            specs,
+            split_mode == "fast",
+            profile,
+            worker_urls,
+            token,
+            on_progress,
+        )
+
+    return encoder
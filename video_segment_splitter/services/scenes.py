@@ -0,0 +1,136 @@
+"""Scene-change detection for splits that cut between shots.
+
+One ffmpeg pass decodes the video stream and scores how much every frame
+differs from the one before it (the scene filter of select). To keep the
+pass cheap, frames are shrunk to SCENE_ANALYSIS_WIDTH before they are
+compared, the in-loop deblocking filter is skipped while decoding (the
+scores do not need clean pictures) and audio is not read at all; the pass
+is then bound by decoding, about 0.1x realtime for 1080p H.264 on one core.
+
+Scene boundaries only depend on the upload's content, so they are kept
+per content hash in the states directory and found once per file.
+"""
+
+import asyncio
+import bisect
+import functools
+from typing import Callable, Optional
+
+from reflex.utils.prerequisites import get_states_dir
+
+from video_segment_splitter.services.analysis_index import AnalysisIndex
+from video_segment_splitter.services.splitter import (
+    plan_encode_workers,
+    spawn_ffmpeg,
+)
+
+# Frames whose scene score is above this start a new shot. ffmpeg's docs
+# suggest 0.3-0.5; lower also catches fast pans.
+SCENE_THRESHOLD = 0.3
+
+SCENE_ANALYSIS_WIDTH = 192
+
+# A target cut moves to a scene boundary at most this fraction of the
+# average part length away, so parts stay between 0.2x and 1.8x of it.
+SCENE_SNAP_WINDOW = 0.4
+
+
+async def detect_scene_changes(
+    ffmpeg: str,
+    input_path: str,
+    on_progress: Optional[Callable[[float], None]] = None,
+) -> list[float]:
+    """Times (seconds) of the first frame of every new shot.
+
+    on_progress is called with the position of the pass in seconds."""
+    _, threads = plan_encode_workers(1)
+    args = [
+        ffmpeg,
+        "-nostdin",
+        "-threads", str(threads),
+        "-skip_loop_filter", "all",
+        "-i", str(input_path),
+        "-map", "0:v:0",
+        "-an", "-sn", "-dn",
+        # Every frame goes through (so -progress keeps moving), only
+        # boundaries are printed to stdout.
+        "-vf",
+        f"scale={SCENE_ANALYSIS_WIDTH}:-2:flags=fast_bilinear,"
+        "select='gte(scene,0)',"
+        "metadata=mode=print:key=lavfi.scene_score"
+        f":value={SCENE_THRESHOLD}:function=greater:file=-",
+        "-loglevel", "error",
+        "-f", "null", "-",
+    ]
+    proc, progress = await spawn_ffmpeg(
+        args,
+        asyncio.subprocess.PIPE,
+        None if on_progress is None else lambda seconds, *_: on_progress(seconds),
+    )
+    stderr_task = asyncio.create_task(proc.stderr.read())
+    scenes = []
+    try:
+        # "frame:N pts:P pts_time:T" followed by "lavfi.scene_score=S".
+        async for line in proc.stdout:
+            for field in line.decode(errors="replace").split():
+                name, _, value = field.partition(":")
+                if name == "pts_time":
+                    scenes.append(float(value))
+        await proc.wait()
+    finally:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        stderr = await stderr_task
+        if progress is not None:
+            progress.cancel()
+    if proc.returncode != 0:
+        raise RuntimeError(f"Scene detection failed: {stderr.decode()}")
+    return sorted(scene for scene in scenes if scene > 0)
+
+
+def scene_cut_points(
+    total_duration: float, segment_count: int, scenes: list[float]
+) -> list[float]:
+    """Boundaries of segment_count parts, including 0 and the end, cut on
+    scene changes where one is near the equal-length cut.
+
+    Every equal-length cut takes the closest scene boundary within
+    SCENE_SNAP_WINDOW of a part's length and keeps its own time if there
+    is none. The windows of neighbouring cuts do not overlap, so the cuts
+    stay in order and no part is empty."""
+    segment_duration = total_duration / segment_count
+    window = segment_duration * SCENE_SNAP_WINDOW
+    cuts = [0.0]
+    for i in range(1, segment_count):
+        target = i * segment_duration
+        lo = bisect.bisect_left(scenes, target - window)
+        hi = bisect.bisect_right(scenes, target + window)
+        nearby = scenes[lo:hi]
+        cuts.append(min(nearby, key=lambda s: abs(s - target)) if nearby else target)
+    cuts.append(total_duration)
+    return cuts
+
+
+async def scene_changes(
+    ffmpeg: str,
+    input_path: str,
+    content_hash: str,
+    on_progress: Optional[Callable[[float], None]] = None,
+) -> list[float]:
+    """detect_scene_changes, answered from the index if the file was
+    analysed before."""
+    index = get_scene_index()
+    scenes = await asyncio.to_thread(index.get, content_hash)
+    if scenes is None:
+        scenes = await detect_scene_changes(ffmpeg, input_path, on_progress)
+        await asyncio.to_thread(index.put, content_hash, scenes)
+    return scenes
+
+
+@functools.cache
+def get_scene_index() -> AnalysisIndex:
+    return AnalysisIndex(
+        get_states_dir() / "scenes",
+        {"threshold": SCENE_THRESHOLD, "width": SCENE_ANALYSIS_WIDTH},
+    )
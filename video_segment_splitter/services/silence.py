@@ -0,0 +1,200 @@
+"""Silence detection for splits of talks, podcasts and lectures.
+
+ffmpeg decodes only the audio track, downmixed to mono 16-bit PCM at a
+low rate, and pipes it to a worker thread. The thread reads it a chunk at
+a time and thresholds the energy of short windows with numpy, so memory
+stays flat however long the recording is. Runs of quiet windows long
+enough to be a pause between words or sentences are the silences.
+
+Like scene changes, silences are kept per content hash in the states
+directory.
+"""
+
+import asyncio
+import bisect
+import functools
+import os
+from typing import BinaryIO, Callable, Optional
+
+import numpy as np
+from reflex.utils.prerequisites import get_states_dir
+
+from video_segment_splitter.services.analysis_index import AnalysisIndex
+from video_segment_splitter.services.splitter import spawn_ffmpeg
+
+# Speech is well represented at 8 kHz, and decoding less is cheaper.
+SILENCE_SAMPLE_RATE = 8000
+
+# Length of the windows whose energy is measured, in seconds.
+SILENCE_WINDOW = 0.02
+
+# Windows quieter than this (RMS, relative to full scale) are silent.
+# Room tone of a typical recording sits around -50 to -60 dBFS, speech
+# around -20.
+SILENCE_THRESHOLD_DB = -40.0
+
+# Shorter quiet runs are gaps inside words, not pauses.
+SILENCE_MIN_DURATION = 0.3
+
+# A cut moves to a silence at most this far away, and never more than
+# SILENCE_SNAP_WINDOW of a part's length (as scene cuts, see scenes.py).
+SILENCE_SNAP_TOLERANCE = 15.0
+SILENCE_SNAP_WINDOW = 0.4
+
+# A cut inside a long silence stays this far from the speech around it.
+SILENCE_EDGE_MARGIN = 0.15
+
+# Audio read per numpy step, in seconds.
+_CHUNK_SECONDS = 10
+
+
+def find_silences(
+    pcm: BinaryIO, on_progress: Optional[Callable[[float], None]] = None
+) -> list[list[float]]:
+    """[start, end] (seconds) of every silence in a stream of mono s16le
+    samples at SILENCE_SAMPLE_RATE. Blocking; reads until EOF."""
+    window = int(SILENCE_SAMPLE_RATE * SILENCE_WINDOW)
+    window_bytes = window * 2
+    chunk_bytes = window_bytes * int(_CHUNK_SECONDS / SILENCE_WINDOW)
+    # Compared with each window's sum of squares, which saves the root.
+    threshold = window * (32768 * 10 ** (SILENCE_THRESHOLD_DB / 20)) ** 2
+    min_windows = round(SILENCE_MIN_DURATION / SILENCE_WINDOW)
+
+    silences = []
+    done = 0  # windows read so far
+    run_start: Optional[int] = None
+    carry = b""
+    while data := pcm.read(chunk_bytes):
+        data = carry + data
+        usable = len(data) - len(data) % window_bytes
+        carry = data[usable:]
+        samples = np.frombuffer(data, dtype="<i2", count=usable // 2)
+        samples = samples.astype(np.float32).reshape(-1, window)
+        quiet = np.einsum("ij,ij->i", samples, samples) < threshold
+        # Windows where quiet flips, relative to the end of the last chunk.
+        flips = np.flatnonzero(np.diff(quiet, prepend=run_start is not None))
+        for i in flips.tolist():
+            if quiet[i]:
+                run_start = done + i
+            else:
+                if done + i - run_start >= min_windows:
+                    silences.append(
+                        [run_start * SILENCE_WINDOW, (done + i) * SILENCE_WINDOW]
+                    )
+                run_start = None
+        done += len(quiet)
+        if on_progress is not None:
+            on_progress(done * SILENCE_WINDOW)
+    if run_start is not None and done - run_start >= min_windows:
+        silences.append([run_start * SILENCE_WINDOW, done * SILENCE_WINDOW])
+    return silences
+
+
+async def detect_silences(
+    ffmpeg: str,
+    input_path: str,
+    on_progress: Optional[Callable[[float], None]] = None,
+) -> list[list[float]]:
+    """Silences of the first audio track; on_progress is called with the
+    position of the pass in seconds, from the worker thread."""
+    # The samples go to a plain pipe that the worker thread reads with
+    # blocking calls; stderr is drained on the event loop meanwhile, so a
+    # stream of decode errors cannot stall ffmpeg.
+    read_fd, write_fd = os.pipe()
+    try:
+        proc, _ = await spawn_ffmpeg(
+            [
+                ffmpeg,
+                "-nostdin",
+                "-i", str(input_path),
+                "-map", "0:a:0",
+                "-vn", "-sn", "-dn",
+                "-ac", "1",
+                "-ar", str(SILENCE_SAMPLE_RATE),
+                "-f", "s16le",
+                "-loglevel", "error",
+                "-",
+            ],
+            write_fd,
+        )
+    except BaseException:
+        os.close(read_fd)
+        raise
+    finally:
+        os.close(write_fd)
+    pcm = os.fdopen(read_fd, "rb")
+    stderr_task = asyncio.create_task(proc.stderr.read())
+    analysis = asyncio.ensure_future(asyncio.to_thread(find_silences, pcm, on_progress))
+    try:
+        silences = await asyncio.shield(analysis)
+        await proc.wait()
+    except BaseException:
+        # Ends the thread's read with EOF.
+        if proc.returncode is None:
+            proc.kill()
+        await asyncio.wait({analysis})
+        raise
+    finally:
+        await proc.wait()
+        stderr = await stderr_task
+        pcm.close()
+    if proc.returncode != 0:
+        raise RuntimeError(f"Silence detection failed: {stderr.decode()}")
+    return silences
+
+
+def silence_cut_points(
+    total_duration: float, segment_count: int, silences: list[list[float]]
+) -> list[float]:
+    """Boundaries of segment_count parts, including 0 and the end, with
+    every equal-length cut moved into the nearest silence in reach.
+
+    A cut lands on the point of the silence closest to its equal-length
+    time, but at least SILENCE_EDGE_MARGIN (or half the silence) away
+    from speech. Cuts without a silence in reach keep their time."""
+    segment_duration = total_duration / segment_count
+    reach = min(SILENCE_SNAP_TOLERANCE, segment_duration * SILENCE_SNAP_WINDOW)
+    starts = [start for start, _ in silences]
+    ends = [end for _, end in silences]
+    cuts = [0.0]
+    for i in range(1, segment_count):
+        target = i * segment_duration
+        lo = bisect.bisect_left(ends, target - reach)
+        hi = bisect.bisect_right(starts, target + reach)
+        points = []
+        for start, end in silences[lo:hi]:
+            margin = min((end - start) / 2, SILENCE_EDGE_MARGIN)
+            points.append(min(max(target, start + margin), end - margin))
+        points = [point for point in points if abs(point - target) <= reach]
+        cuts.append(min(points, key=lambda p: abs(p - target)) if points else target)
+    cuts.append(total_duration)
+    return cuts
+
+
+async def silent_ranges(
+    ffmpeg: str,
+    input_path: str,
+    content_hash: str,
+    on_progress: Optional[Callable[[float], None]] = None,
+) -> list[list[float]]:
+    """detect_silences, answered from the index if the file was analysed
+    before."""
+    index = get_silence_index()
+    found = await asyncio.to_thread(index.get, content_hash)
+    if found is None:
+        found = await detect_silences(ffmpeg, input_path, on_progress)
+        await asyncio.to_thread(index.put, content_hash, found)
+    return found
+
+
+@functools.cache
+def get_silence_index() -> AnalysisIndex:
+    return AnalysisIndex(
+        get_states_dir() / "silence",
+        {
+            "rate": SILENCE_SAMPLE_RATE,
+            "window": SILENCE_WINDOW,
+            "threshold_db": SILENCE_THRESHOLD_DB,
+            "min_duration": SILENCE_MIN_DURATION,
+        },
+    )
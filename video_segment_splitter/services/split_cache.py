@@ -0,0 +1,381 @@
+import asyncio
+import errno
+import fcntl
+import functools
+import hashlib
+import json
+import logging
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import time
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable, Optional, Union
+
+import psutil
+import reflex as rx
+
+from video_segment_splitter.services.jobs import IDLE_SESSION_TIMEOUT
+from video_segment_splitter.services.splitter import SegmentSpec
+
+# Finished segment sets are kept until they take up more than this much
+# disk, then the least recently used sets are deleted.
+SPLIT_CACHE_BUDGET_BYTES = 10 * 1024 * 1024 * 1024
+
+_MANIFEST = "manifest.json"
+
+
+def _digest(payload: dict) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:32]
+
+
+def split_family_key(content_hash: str, **settings) -> str:
+    """Source content plus every setting that changes the encoded output.
+    Parts of the same family are interchangeable for equal cut times."""
+    return _digest({"content": content_hash, **settings})
+
+
+def split_cache_key(
+    family: str, segments: Union[int, str], cut_mode: str = "equal"
+) -> str:
+    """Key of one finished split result. segments is the segment count,
+    or the length or size limit the parts were cut to."""
+    payload = {"family": family, "segments": segments}
+    if cut_mode != "equal":
+        # Equal-length cuts keep the keys they had before cut modes.
+        payload["cuts"] = cut_mode
+    return _digest(payload)
+
+
+def _entry_inodes(path: Path) -> dict[tuple[int, int], int]:
+    """Size of every file of an entry, by inode. Sets built from earlier
+    parts share them as hard links, and each inode takes the disk once."""
+    inodes = {}
+    for f in path.iterdir():
+        st = f.stat()
+        if stat.S_ISREG(st.st_mode):
+            inodes[(st.st_dev, st.st_ino)] = st.st_size
+    return inodes
+
+
+def _total_bytes(entries: dict[str, dict[tuple[int, int], int]]) -> int:
+    sizes = {}
+    for inodes in entries.values():
+        sizes.update(inodes)
+    return sum(sizes.values())
+
+
+def _stale_staging(entry: Path) -> bool:
+    """Whether a staging directory (.<key>.<pid>.<random>) belongs to no
+    running process."""
+    try:
+        pid = int(entry.name.split(".")[2])
+    except (IndexError, ValueError):
+        return True
+    return pid == os.getpid() or not psutil.pid_exists(pid)
+
+
+class SplitCache:
+    """Content-addressed store of finished segment sets.
+
+    Each set lives in <root>/<key>/ next to a manifest of its family and
+    cut times. Jobs encode into a staging directory that is renamed into
+    place once every part is written, so a half-written set is never
+    served. The manifest's mtime records the last use for LRU eviction.
+    Parts reused by later splits are hard links, so a set can be evicted
+    without breaking the sets built from it, and shared parts count once
+    against the budget.
+
+    Every backend process stores into the same directory, so the index is
+    read from disk again on each use. Sets in use are pinned and never
+    evicted: those being streamed as a ZIP (pin/unpin) and those shown in
+    a client session (lease), until the session has been gone for
+    IDLE_SESSION_TIMEOUT. A pin is a shared flock on the set's manifest,
+    which eviction in any process needs exclusively."""
+
+    def __init__(self, root: Path, budget_bytes: int):
+        self.root = root
+        self.budget_bytes = budget_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # key -> file sizes by inode, least recently used first.
+        self._entries: Optional[OrderedDict[str, dict[tuple[int, int], int]]] = None
+        self._families: dict[str, str] = {}
+        # Locked manifest descriptors of open ZIP streams by key, and of the
+        # set each session shows. They have a lock of their own, so pinning
+        # never waits for an eviction.
+        self._pins_lock = threading.Lock()
+        self._streams: dict[str, list[int]] = {}
+        self._leases: dict[str, int] = {}
+
+    def _index(self) -> OrderedDict[str, dict[tuple[int, int], int]]:
+        if self._entries is None:
+            self.root.mkdir(parents=True, exist_ok=True)
+            self._entries = OrderedDict()
+            for entry in self.root.iterdir():
+                if entry.name.startswith(".") and _stale_staging(entry):
+                    # Staging directory of a job whose process is gone.
+                    shutil.rmtree(entry, ignore_errors=True)
+        found = []
+        for entry in self.root.iterdir():
+            if entry.name.startswith("."):
+                continue
+            try:
+                found.append(((entry / _MANIFEST).stat().st_mtime, entry.name))
+            except OSError:
+                # Not a set, or being evicted.
+                continue
+        entries = OrderedDict()
+        for _, key in sorted(found):
+            if key in self._entries:
+                entries[key] = self._entries[key]
+                continue
+            # Stored by another process, or before this one started.
+            entry = self.root / key
+            try:
+                self._families[key] = json.loads((entry / _MANIFEST).read_text())["family"]
+                entries[key] = _entry_inodes(entry)
+            except (OSError, ValueError, KeyError, TypeError):
+                shutil.rmtree(entry, ignore_errors=True)
+        for key in set(self._families) - set(entries):
+            del self._families[key]
+        self._entries = entries
+        return entries
+
+    def _touch(self, key: str) -> None:
+        try:
+            os.utime(self.root / key / _MANIFEST)
+        except OSError:
+            pass
+
+    def _lock_entry(self, key: str, operation: int) -> Optional[int]:
+        """Descriptor of key's manifest holding a flock, or None if the set
+        is gone or locked the other way."""
+        manifest = self.root / key / _MANIFEST
+        try:
+            fd = os.open(manifest, os.O_RDONLY)
+        except OSError:
+            return None
+        try:
+            fcntl.flock(fd, operation | fcntl.LOCK_NB)
+            # Evicted between the open and the lock.
+            if os.stat(manifest).st_ino != os.fstat(fd).st_ino:
+                raise FileNotFoundError(manifest)
+        except OSError:
+            os.close(fd)
+            return None
+        return fd
+
+    def _read_manifest(self, key: str) -> list[SegmentSpec]:
+        entry = self.root / key
+        records = json.loads((entry / _MANIFEST).read_text())["segments"]
+        return [
+            SegmentSpec(path=entry / record.pop("filename"), **record)
+            for record in records
+        ]
+
+    def _drop(self, key: str) -> None:
+        self._entries.pop(key, None)
+        self._families.pop(key, None)
+        shutil.rmtree(self.root / key, ignore_errors=True)
+
+    def lookup(self, key: str) -> Optional[list[SegmentSpec]]:
+        with self._lock:
+            entries = self._index()
+            specs = None
+            if key in entries:
+                try:
+                    specs = self._read_manifest(key)
+                except (OSError, ValueError, KeyError, TypeError):
+                    logging.exception(f"Dropping unreadable split cache entry {key}")
+                if specs is not None and not all(s.path.exists() for s in specs):
+                    specs = None
+                if specs is None:
+                    self._drop(key)
+            if specs is None:
+                self.misses += 1
+                return None
+            self._touch(key)
+            self.hits += 1
+            return specs
+
+    def entry_parts(self, key: str) -> Optional[list[SegmentSpec]]:
+        """The parts of a cached set, without counting a hit or a miss."""
+        with self._lock:
+            if key not in self._index():
+                return None
+            try:
+                return self._read_manifest(key)
+            except (OSError, ValueError, KeyError, TypeError):
+                return None
+
+    def family_parts(self, family: str) -> list[SegmentSpec]:
+        """Every cached part of the family, for reuse by a new split."""
+        with self._lock:
+            self._index()
+            parts = []
+            for key, entry_family in list(self._families.items()):
+                if entry_family != family:
+                    continue
+                try:
+                    parts.extend(self._read_manifest(key))
+                except (OSError, ValueError, KeyError, TypeError):
+                    logging.exception(f"Dropping unreadable split cache entry {key}")
+                    self._drop(key)
+                    continue
+                self._touch(key)
+            return parts
+
+    def pin(self, key: str) -> bool:
+        """Keep a cached set until unpin(key); False if it is not cached."""
+        fd = self._lock_entry(key, fcntl.LOCK_SH)
+        if fd is None:
+            return False
+        with self._pins_lock:
+            self._streams.setdefault(key, []).append(fd)
+        return True
+
+    def unpin(self, key: str) -> None:
+        with self._pins_lock:
+            fd = self._streams[key].pop()
+            if not self._streams[key]:
+                del self._streams[key]
+        os.close(fd)
+
+    def lease(self, holder: str, key: str) -> None:
+        """Keep a cached set while holder (a client token) shows it. A
+        holder has one lease; a new one replaces it."""
+        fd = self._lock_entry(key, fcntl.LOCK_SH)
+        with self._pins_lock:
+            old = self._leases.pop(holder, None)
+            if fd is not None:
+                self._leases[holder] = fd
+        if old is not None:
+            os.close(old)
+
+    def release_leases(self, holders: set[str]) -> None:
+        """Drop the leases of holders and evict what they kept over budget."""
+        with self._pins_lock:
+            released = [self._leases.pop(holder, None) for holder in holders]
+        for fd in released:
+            if fd is not None:
+                os.close(fd)
+        with self._lock:
+            self._evict()
+
+    async def watch_sessions(
+        self, connected_owners: Callable[[], Awaitable[set[str]]]
+    ) -> None:
+        """Release the leases of sessions that have been disconnected for
+        IDLE_SESSION_TIMEOUT, like JobQueue.watch_sessions."""
+        gone_since: dict[str, float] = {}
+        while True:
+            await asyncio.sleep(IDLE_SESSION_TIMEOUT / 4)
+            try:
+                connected = await connected_owners()
+            except Exception:
+                logging.exception("Could not check for idle sessions")
+                continue
+            now = time.monotonic()
+            gone_since = {
+                holder: gone_since.get(holder, now)
+                for holder in set(self._leases.copy()) - connected
+            }
+            expired = {
+                holder
+                for holder, since in gone_since.items()
+                if now - since >= IDLE_SESSION_TIMEOUT
+            }
+            if expired:
+                await asyncio.to_thread(self.release_leases, expired)
+
+    def staging_dir(self, key: str) -> Path:
+        with self._lock:
+            self._index()
+        return Path(tempfile.mkdtemp(prefix=f".{key}.{os.getpid()}.", dir=self.root))
+
+    def store(
+        self, key: str, family: str, staging: Path, specs: list[SegmentSpec]
+    ) -> list[SegmentSpec]:
+        """Move a finished staging directory into the cache and return the
+        specs with their paths inside the cache entry."""
+        records = [
+            {
+                "index": spec.index,
+                "filename": spec.path.name,
+                "requested_start": spec.requested_start,
+                "requested_end": spec.requested_end,
+                "start": spec.start,
+                "end": spec.end,
+            }
+            for spec in specs
+        ]
+        (staging / _MANIFEST).write_text(
+            json.dumps({"family": family, "segments": records})
+        )
+        with self._lock:
+            self._index()
+            target = self.root / key
+            stored = False
+            if not (target / _MANIFEST).exists():
+                try:
+                    os.rename(staging, target)
+                    stored = True
+                except OSError as e:
+                    if e.errno not in (errno.EEXIST, errno.ENOTEMPTY):
+                        raise
+            if not stored:
+                # A concurrent job, maybe of another process, finished the
+                # same set first; keep theirs.
+                shutil.rmtree(staging, ignore_errors=True)
+                self._touch(key)
+            self._evict(keep=key)
+            return self._read_manifest(key)
+
+    def discard(self, staging: Path) -> None:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        entries = self._index()
+        total = _total_bytes(entries)
+        links = Counter(inode for inodes in entries.values() for inode in inodes)
+        for key, inodes in list(entries.items()):
+            if total <= self.budget_bytes:
+                break
+            if key == keep:
+                continue
+            # Fails while any process has the set pinned.
+            fd = self._lock_entry(key, fcntl.LOCK_EX)
+            if fd is None:
+                continue
+            try:
+                self._drop(key)
+            finally:
+                os.close(fd)
+            for inode, size in inodes.items():
+                links[inode] -= 1
+                if not links[inode]:
+                    total -= size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._index()
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(entries),
+                "bytes": _total_bytes(entries),
+                "budget_bytes": self.budget_bytes,
+            }
+
+
+@functools.cache
+def get_split_cache() -> SplitCache:
+    return SplitCache(rx.get_upload_dir() / "split_cache", SPLIT_CACHE_BUDGET_BYTES)
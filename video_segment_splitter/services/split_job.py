@@ -0,0 +1,379 @@
+"""The "split" job of the job queue (see services/jobs.py)."""
+
+import asyncio
+import functools
+import logging
+import math
+import os
+import time
+from contextlib import aclosing
+from typing import Optional
+
+import reflex as rx
+from reflex.config import get_config
+
+from video_segment_splitter.services.encode_profiles import (
+    DEFAULT_ENCODE_PROFILE,
+    EncodeProfile,
+    get_encode_profile,
+    measure_throughput,
+    throughput_key,
+)
+from video_segment_splitter.services.jobs import ReportProgress
+from video_segment_splitter.services.remote_encode import remote_encoder
+from video_segment_splitter.services.scenes import scene_changes, scene_cut_points
+from video_segment_splitter.services.silence import silence_cut_points, silent_ranges
+from video_segment_splitter.services.split_cache import (
+    get_split_cache,
+    split_cache_key,
+    split_family_key,
+)
+from video_segment_splitter.services.splitter import (
+    EncodeProgress,
+    SegmentEncodeError,
+    SegmentSpec,
+    encode_segments,
+    equal_cut_points,
+    get_ffmpeg_path,
+    limit_part_length,
+    plan_segments,
+    split_segments,
+)
+
+# Where the parts are cut: at equal lengths, or at the scene changes
+# (see scenes.py) or pauses in the audio (see silence.py) closest to them.
+CUT_MODES = ("equal", "scenes", "silence")
+
+# How many parts: a given count, as many as needed for parts of at most
+# a target length (seconds), or of at most a target file size (MB).
+SPLIT_BY = ("count", "duration", "size")
+
+MAX_SEGMENTS = 1000
+
+# Size-limited splits aim this far below the limit, since the bitrate
+# varies along a file.
+SIZE_TARGET_MARGIN = 0.9
+
+# Parts that still come out over the size limit are cut again, at most
+# this many times.
+SIZE_CHECK_ROUNDS = 3
+
+MB = 1024 * 1024
+
+
+def split_job_params(
+    input_path: str,
+    content_hash: str,
+    stem: str,
+    duration: float,
+    segment_count: int,
+    split_mode: str,
+    profile: str,
+    cut_mode: str = "equal",
+    split_by: str = "count",
+    target: float = 0.0,
+    bitrate: int = 0,
+) -> dict:
+    """target is the part length (seconds) or size (MB) for split_by
+    "duration" and "size"; bitrate (bits per second, 0 if unknown) is the
+    source's, which size-limited splits start from."""
+    return {
+        "input_path": input_path,
+        "content_hash": content_hash,
+        "stem": stem,
+        "duration": duration,
+        "segment_count": segment_count,
+        "split_mode": split_mode,
+        "profile": profile,
+        "cut_mode": cut_mode,
+        "split_by": split_by,
+        "target": target,
+        "bitrate": bitrate,
+    }
+
+
+def planned_segment_count(
+    duration: float,
+    split_by: str,
+    segment_count: int,
+    target: float,
+    bitrate: int,
+) -> int:
+    """Parts a split starts out with. Size-limited splits assume the
+    output has the source's bitrate; parts that come out too big are cut
+    again after encoding."""
+    if split_by == "duration" and target > 0:
+        return max(1, math.ceil(duration / target))
+    if split_by == "size" and target > 0 and bitrate > 0:
+        return max(
+            1, math.ceil(duration * bitrate / 8 / (target * MB * SIZE_TARGET_MARGIN))
+        )
+    return segment_count
+
+
+def _segment_count(params: dict) -> int:
+    bitrate = params.get("bitrate") or 0
+    if not bitrate and params["duration"] > 0:
+        bitrate = int(os.path.getsize(params["input_path"]) * 8 / params["duration"])
+    return planned_segment_count(
+        params["duration"],
+        params.get("split_by", "count"),
+        params["segment_count"],
+        params.get("target", 0.0),
+        bitrate,
+    )
+
+
+def _profile(params: dict) -> EncodeProfile:
+    return get_encode_profile(params.get("profile", DEFAULT_ENCODE_PROFILE))
+
+
+def _family(params: dict) -> str:
+    if params["split_mode"] == "fast":
+        # Stream copy does not encode, so every profile gives the same parts.
+        return split_family_key(params["content_hash"], split_mode="fast")
+    return split_family_key(
+        params["content_hash"],
+        split_mode=params["split_mode"],
+        profile=_profile(params).name,
+    )
+
+
+def split_job_cache_key(params: dict) -> str:
+    split_by = params.get("split_by", "count")
+    segments = params["segment_count"]
+    if split_by == "duration":
+        segments = f"max {params['target']:g}s"
+    elif split_by == "size":
+        segments = f"max {params['target']:g}MB"
+    return split_cache_key(_family(params), segments, params.get("cut_mode", "equal"))
+
+
+async def plan_cut_points(
+    ffmpeg: str, params: dict, report: ReportProgress
+) -> list[float]:
+    cuts = await _cut_points(ffmpeg, params, _segment_count(params), report)
+    if params.get("split_by") == "duration":
+        # Cuts moved to scene changes or pauses can stretch a part.
+        cuts = limit_part_length(cuts, params["target"])
+    if len(cuts) - 1 > MAX_SEGMENTS:
+        raise ValueError(
+            f"This would make {len(cuts) - 1} parts; at most {MAX_SEGMENTS} are allowed"
+        )
+    return cuts
+
+
+async def _cut_points(
+    ffmpeg: str, params: dict, segment_count: int, report: ReportProgress
+) -> list[float]:
+    duration = params["duration"]
+    cut_mode = params.get("cut_mode", "equal")
+
+    def on_progress(seconds: float) -> None:
+        # The analysis pass is the job's "scenes" or "silence" stage.
+        report(min(1.0, seconds / duration) if duration > 0 else 0.0, {"stage": cut_mode})
+
+    if cut_mode == "scenes":
+        scenes = await scene_changes(
+            ffmpeg, params["input_path"], params["content_hash"], on_progress
+        )
+        return scene_cut_points(duration, segment_count, scenes)
+    if cut_mode == "silence":
+        silences = await silent_ranges(
+            ffmpeg, params["input_path"], params["content_hash"], on_progress
+        )
+        return silence_cut_points(duration, segment_count, silences)
+    return equal_cut_points(duration, segment_count)
+
+
+def oversized_cut_points(specs: list[SegmentSpec], limit: int) -> Optional[list[float]]:
+    """Cut points that split every part bigger than limit bytes into
+    equal pieces that should fit, or None if every part fits.
+
+    The other parts keep their requested cuts, so planning the new cut
+    points gives them the same ranges again and they are reused."""
+    cuts = [specs[0].requested_start]
+    oversized = False
+    for spec in specs:
+        size = spec.path.stat().st_size
+        if size > limit:
+            oversized = True
+            pieces = math.ceil(size / (limit * SIZE_TARGET_MARGIN))
+            # Split the requested range: in fast mode the written range
+            # starts at an earlier keyframe, and cuts taken from it could
+            # fall before the previous requested cut.
+            step = (spec.requested_end - spec.requested_start) / pieces
+            cuts += [spec.requested_start + i * step for i in range(1, pieces)]
+        cuts.append(spec.requested_end)
+    return cuts if oversized else None
+
+
+class SplitProgress:
+    """Folds the live progress of every part into the job's progress.
+
+    Parts assembled from earlier splits, or encoded remotely, count once
+    they are done; locally encoded ones also while they are written."""
+
+    def __init__(self, specs: list[SegmentSpec]):
+        self.durations = {spec.index: spec.duration for spec in specs}
+        self.total = sum(self.durations.values())
+        self.encoded: dict[int, float] = {}
+        # fps and speed of the parts being written right now.
+        self.running: dict[int, tuple[float, float]] = {}
+        self.started = time.monotonic()
+
+    def update(self, progress: EncodeProgress) -> None:
+        if progress.index not in self.durations:
+            return
+        self.encoded[progress.index] = min(
+            progress.encoded, self.durations[progress.index]
+        )
+        self.running[progress.index] = (progress.fps, progress.speed)
+
+    def finish(self, spec: SegmentSpec) -> None:
+        self.encoded[spec.index] = self.durations.get(spec.index, spec.duration)
+        self.running.pop(spec.index, None)
+
+    @property
+    def fraction(self) -> float:
+        return sum(self.encoded.values()) / self.total if self.total > 0 else 0.0
+
+    def detail(self) -> dict:
+        encoded = sum(self.encoded.values())
+        speed = sum(speed for _, speed in self.running.values())
+        elapsed = time.monotonic() - self.started
+        # ffmpeg's own speed reacts quickly; the overall average covers
+        # stretches without live progress (remote parts, between parts).
+        rate = speed or (encoded / elapsed if elapsed > 0 else 0.0)
+        remaining = max(0.0, self.total - encoded)
+        return {
+            "encoded": encoded,
+            "total": self.total,
+            "fps": sum(fps for fps, _ in self.running.values()),
+            "speed": speed,
+            "eta": remaining / rate if rate > 0 else None,
+        }
+
+
+async def run_split_job(params: dict, report: ReportProgress) -> dict:
+    """Split the video into the split cache. The result names the cache
+    entry and lists its parts (SegmentSpec records)."""
+    cache = get_split_cache()
+    split_mode = params["split_mode"]
+    profile = _profile(params)
+    family = _family(params)
+    cache_key = split_job_cache_key(params)
+    # An identical job queued earlier may have produced the set meanwhile.
+    cached = await asyncio.to_thread(cache.entry_parts, cache_key)
+    if cached is not None:
+        return {
+            "cache_key": cache_key,
+            "segments": [spec.to_record() for spec in cached],
+        }
+
+    # Parts of earlier splits of this video that the new cut points
+    # still line up with are reused instead of encoded again.
+    pool = await asyncio.to_thread(cache.family_parts, family)
+    staging = await asyncio.to_thread(cache.staging_dir, cache_key)
+    stagings = [staging]
+    ffmpeg = get_ffmpeg_path()
+    progress = SplitProgress([])
+
+    def on_progress(update: EncodeProgress) -> None:
+        # Only kept in memory here; the job queue saves it at a fixed
+        # rate, which is what sessions see.
+        progress.update(update)
+        report(progress.fraction, progress.detail())
+
+    encoder = remote_encoder(
+        ffmpeg,
+        params["input_path"],
+        rx.get_upload_dir(),
+        str(get_config().api_url or "http://localhost:8000"),
+        profile,
+        on_progress,
+    ) or functools.partial(
+        encode_segments,
+        ffmpeg,
+        params["input_path"],
+        profile=profile,
+        on_progress=on_progress,
+    )
+
+    def measured_encoder(to_encode: list[SegmentSpec], mode: str):
+        # Only the parts that are actually encoded count, not reused ones.
+        return measure_throughput(
+            encoder(to_encode, mode),
+            sum(spec.duration for spec in to_encode),
+            throughput_key(profile.name, mode),
+        )
+
+    async def encode(
+        specs: list[SegmentSpec], pool: list[SegmentSpec]
+    ) -> list[SegmentSpec]:
+        nonlocal progress
+        progress = SplitProgress(specs)
+        finished: dict[int, SegmentSpec] = {}
+        try:
+            async with aclosing(
+                split_segments(
+                    ffmpeg,
+                    params["input_path"],
+                    specs,
+                    split_mode,
+                    pool,
+                    measured_encoder if split_mode != "fast" else encoder,
+                )
+            ) as results:
+                async for spec in results:
+                    finished[spec.index] = spec
+                    progress.finish(spec)
+                    # Sessions show the part while the rest are encoded. A
+                    # later size round publishes its parts again, by index.
+                    report(progress.fraction, progress.detail(), [spec.to_record()])
+        except SegmentEncodeError as failure:
+            logging.error(
+                f"ffmpeg error for segment {failure.index + 1}: {failure.stderr}"
+            )
+            raise RuntimeError(f"ffmpeg failed on segment {failure.index + 1}")
+        return [finished[i] for i in sorted(finished)]
+
+    try:
+        specs = await encode(
+            await plan_segments(
+                params["input_path"],
+                staging,
+                params["stem"],
+                await plan_cut_points(ffmpeg, params, report),
+                split_mode,
+            ),
+            pool,
+        )
+        if params.get("split_by") == "size":
+            # The bitrate of an encode is only known afterwards. Parts that
+            # came out too big are cut again; the rest are linked over.
+            limit = int(params["target"] * MB)
+            for _ in range(SIZE_CHECK_ROUNDS):
+                cuts = await asyncio.to_thread(oversized_cut_points, specs, limit)
+                if cuts is None or len(cuts) - 1 > MAX_SEGMENTS:
+                    break
+                resplit = await asyncio.to_thread(cache.staging_dir, cache_key)
+                stagings.append(resplit)
+                planned = await plan_segments(
+                    params["input_path"], resplit, params["stem"], cuts, split_mode
+                )
+                if len(planned) <= len(specs):
+                    # Fast mode found no keyframe inside the big parts.
+                    break
+                specs = await encode(planned, [*pool, *specs])
+                staging = resplit
+            if await asyncio.to_thread(oversized_cut_points, specs, limit):
+                logging.warning(
+                    f"Some parts of {params['stem']} are still over {params['target']:g} MB"
+                )
+
+        stored = await asyncio.to_thread(cache.store, cache_key, family, staging, specs)
+    finally:
+        for path in stagings:
+            await asyncio.to_thread(cache.discard, path)
+    return {"cache_key": cache_key, "segments": [spec.to_record() for spec in stored]}
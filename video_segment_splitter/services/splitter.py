@@ -0,0 +1,703 @@
+import asyncio
+import logging
+import math
+import os
+import shutil
+import time
+from collections import deque
+from contextlib import aclosing
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import AsyncIterator, Callable, Optional, Sequence
+
+from video_segment_splitter.services import metrics
+from video_segment_splitter.services.cpu_governor import get_cpu_governor
+from video_segment_splitter.services.encode_profiles import (
+    DEFAULT_ENCODE_PROFILE,
+    ENCODE_PROFILES,
+    EncodeProfile,
+)
+from video_segment_splitter.services.mp4_cover import attach_cover, read_cover
+from video_segment_splitter.services.process_usage import track_process
+from video_segment_splitter.services.probe import (
+    probe_frame_rate,
+    probe_keyframes,
+    snap_to_keyframes,
+)
+
+# libx264 scales poorly below two threads, so never give a worker fewer.
+MIN_THREADS_PER_ENCODE = 2
+
+# "precise" re-encodes every segment at the exact cut time; "fast" remuxes
+# with stream copy and moves each cut to the nearest keyframe; "single_pass"
+# re-encodes the whole file once and lets the segment muxer cut it.
+SPLIT_MODES = ("precise", "fast", "single_pass")
+
+# Cut times of earlier splits are recomputed for a new segment count, so
+# two boundaries closer than this (well under one frame) are the same cut.
+REUSE_TOLERANCE = 1e-3
+
+
+@dataclass
+class SegmentSpec:
+    """One output part of a split job. start/end are the cut times that are
+    actually written, which fast mode moves onto keyframes."""
+
+    index: int
+    path: Path
+    requested_start: float
+    requested_end: float
+    start: float
+    end: float
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    def to_record(self) -> dict:
+        """JSON-safe form, e.g. for a job result."""
+        return {**asdict(self), "path": str(self.path)}
+
+    @classmethod
+    def from_record(cls, record: dict) -> "SegmentSpec":
+        return cls(**{**record, "path": Path(record["path"])})
+
+
+# Writes the given parts for a split mode, like encode_segments.
+Encoder = Callable[[list[SegmentSpec], str], AsyncIterator[SegmentSpec]]
+
+
+class SegmentEncodeError(Exception):
+    """Raised when ffmpeg fails to encode one segment of a split job."""
+
+    def __init__(self, index: int, stderr: str):
+        super().__init__(f"ffmpeg failed on segment {index + 1}")
+        self.index = index
+        self.stderr = stderr
+
+
+def get_ffmpeg_path() -> str:
+    """Find ffmpeg binary. Prefer system ffmpeg, fallback to imageio-ffmpeg."""
+    path = shutil.which("ffmpeg")
+    if path:
+        return path
+    try:
+        from imageio_ffmpeg import get_ffmpeg_exe
+        return get_ffmpeg_exe()
+    except Exception:
+        return "ffmpeg"
+
+
+@dataclass
+class EncodeProgress:
+    """Live state of one ffmpeg run, from its -progress output."""
+
+    # Part being written (see SegmentSpec.index) and seconds of it done.
+    index: int
+    encoded: float
+    fps: float
+    speed: float
+
+
+ProgressCallback = Callable[[EncodeProgress], None]
+
+
+# on_block(seconds written, frames written, fps, speed)
+ProgressBlockCallback = Callable[[float, int, float, float], None]
+
+
+def _parse_progress(fields: dict[str, str]) -> tuple[float, int, float, float]:
+    """(seconds written, frames written, fps, speed) from one -progress block."""
+
+    def number(value: str) -> float:
+        try:
+            return max(0.0, float(value.rstrip("x")))
+        except ValueError:
+            # "N/A" before the first frame is out.
+            return 0.0
+
+    return (
+        number(fields.get("out_time_us", "0")) / 1_000_000,
+        int(number(fields.get("frame", "0"))),
+        number(fields.get("fps", "0")),
+        number(fields.get("speed", "0")),
+    )
+
+
+async def _read_progress(
+    reader: asyncio.StreamReader, on_block: ProgressBlockCallback
+) -> None:
+    # key=value lines; every block ends with progress=continue|end.
+    fields: dict[str, str] = {}
+    async for line in reader:
+        key, _, value = line.decode(errors="replace").strip().partition("=")
+        fields[key] = value
+        if key == "progress":
+            on_block(*_parse_progress(fields))
+            fields = {}
+
+
+async def spawn_ffmpeg(
+    args: Sequence[str],
+    stdout: int,
+    on_block: Optional[ProgressBlockCallback] = None,
+) -> tuple[asyncio.subprocess.Process, Optional[asyncio.Task]]:
+    """Start ffmpeg with stderr piped, tracked for usage accounting and at
+    the governor's niceness. With on_block, ffmpeg also writes -progress
+    blocks to a pipe of their own (stdout may be in use), and the returned
+    task feeds them to on_block until ffmpeg exits."""
+    if on_block is None:
+        proc = await asyncio.create_subprocess_exec(
+            *args, stdout=stdout, stderr=asyncio.subprocess.PIPE
+        )
+        track_process(proc.pid)
+        get_cpu_governor().adopt(proc.pid)
+        return proc, None
+    read_fd, write_fd = os.pipe()
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            args[0],
+            "-progress", f"pipe:{write_fd}",
+            "-nostats",
+            *args[1:],
+            stdout=stdout,
+            stderr=asyncio.subprocess.PIPE,
+            pass_fds=(write_fd,),
+        )
+    except BaseException:
+        os.close(read_fd)
+        raise
+    finally:
+        os.close(write_fd)
+    track_process(proc.pid)
+    get_cpu_governor().adopt(proc.pid)
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    transport, _ = await loop.connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(reader), os.fdopen(read_fd, "rb")
+    )
+
+    async def forward():
+        try:
+            await _read_progress(reader, on_block)
+        finally:
+            transport.close()
+
+    return proc, asyncio.create_task(forward())
+
+
+async def run_ffmpeg(
+    *args: str, on_block: Optional[ProgressBlockCallback] = None
+) -> tuple[int, bytes]:
+    """Run an ffmpeg command and return (returncode, stderr).
+
+    on_block is called for every progress update ffmpeg writes (about
+    twice a second). If the awaiting task is
+    cancelled the child process is killed as well, so a cancelled encode
+    never keeps burning CPU in the background."""
+    proc, progress = await spawn_ffmpeg(args, asyncio.subprocess.DEVNULL, on_block)
+    try:
+        stderr = await proc.stderr.read()
+        await proc.wait()
+        if progress is not None:
+            await progress
+    except asyncio.CancelledError:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        raise
+    finally:
+        if progress is not None and not progress.done():
+            progress.cancel()
+    return proc.returncode, stderr
+
+
+async def _write_in_thread(func: Callable, *args) -> None:
+    """asyncio.to_thread for file writes. A thread cannot be stopped, so
+    if the caller is cancelled this still waits for it to finish: the
+    caller's cleanup must not remove files the thread is writing."""
+    write = asyncio.ensure_future(asyncio.to_thread(func, *args))
+    try:
+        await asyncio.shield(write)
+    except asyncio.CancelledError:
+        await asyncio.wait({write})
+        raise
+
+
+def plan_encode_workers(segment_count: int) -> tuple[int, int]:
+    """Return (workers, threads_per_worker) for a split job.
+
+    The cores encodes may use come from the CPU governor (see
+    cpu_governor.py), which leaves the rest to the web server; they are
+    shared between concurrent ffmpeg processes instead of handing every
+    process the whole budget. The budget changes over time, so call this
+    when an ffmpeg process is about to start."""
+    cpu_budget = get_cpu_governor().encode_cores
+    workers = max(1, min(segment_count, cpu_budget // MIN_THREADS_PER_ENCODE))
+    threads = max(1, cpu_budget // workers)
+    return workers, threads
+
+
+def segment_filename(stem: str, number: int) -> str:
+    return f"{stem}_part_{number:03d}.mp4"
+
+
+def equal_cut_points(total_duration: float, segment_count: int) -> list[float]:
+    """Boundaries of segment_count equal parts, including 0 and the end."""
+    segment_duration = total_duration / segment_count
+    cuts = [i * segment_duration for i in range(segment_count)]
+    cuts.append(total_duration)
+    return cuts
+
+
+def limit_part_length(cut_points: list[float], max_duration: float) -> list[float]:
+    """Split every part longer than max_duration into equal pieces."""
+    if max_duration <= 0:
+        return list(cut_points)
+    cuts = cut_points[:1]
+    for start, end in zip(cut_points, cut_points[1:]):
+        pieces = max(1, math.ceil((end - start) / max_duration - 1e-9))
+        cuts += [start + (end - start) * i / pieces for i in range(1, pieces)]
+        cuts.append(end)
+    return cuts
+
+
+async def plan_segments(
+    input_path: str,
+    output_dir: Path,
+    stem: str,
+    cut_points: list[float],
+    split_mode: str,
+) -> list[SegmentSpec]:
+    """Turn requested cut points into the list of parts to write."""
+    actual_cuts = list(cut_points)
+    if split_mode == "fast":
+        # Stream copy can only start a segment on a keyframe, so the inner
+        # cut points are moved there. The keyframe index is probed once for
+        # the whole file.
+        keyframes = await probe_keyframes(input_path)
+        actual_cuts[1:-1] = snap_to_keyframes(cut_points[1:-1], keyframes)
+
+    specs = []
+    for i in range(len(cut_points) - 1):
+        # Cuts that snapped onto the same keyframe leave an empty range.
+        if actual_cuts[i + 1] <= actual_cuts[i]:
+            continue
+        specs.append(
+            SegmentSpec(
+                index=len(specs),
+                path=output_dir / segment_filename(stem, len(specs) + 1),
+                requested_start=cut_points[i],
+                requested_end=cut_points[i + 1],
+                start=actual_cuts[i],
+                end=actual_cuts[i + 1],
+            )
+        )
+    return specs
+
+
+def encode_segments(
+    ffmpeg: str,
+    input_path: str,
+    specs: list[SegmentSpec],
+    split_mode: str,
+    profile: EncodeProfile = ENCODE_PROFILES[DEFAULT_ENCODE_PROFILE],
+    on_progress: Optional[ProgressCallback] = None,
+) -> AsyncIterator[SegmentSpec]:
+    """Write every part in specs and yield each one as soon as it is done.
+
+    Finished parts may arrive out of order. On failure SegmentEncodeError is
+    raised; closing the iterator early (use contextlib.aclosing) stops any
+    ffmpeg processes still running. Re-encoding modes use profile, and
+    on_progress gets live progress of the parts being written."""
+    if split_mode == "single_pass":
+        return _encode_single_pass(ffmpeg, input_path, specs, profile, on_progress)
+    return _encode_in_pool(
+        ffmpeg,
+        input_path,
+        specs,
+        copy=split_mode == "fast",
+        profile=profile,
+        on_progress=on_progress,
+    )
+
+
+def plan_reuse(
+    specs: list[SegmentSpec], pool: list[SegmentSpec]
+) -> dict[int, list[SegmentSpec]]:
+    """Find the new parts that existing parts of the same source already cover.
+
+    pool holds parts written by earlier splits with the same settings. A
+    new part is reusable if a run of consecutive pool parts starts and ends
+    on its cut points; the shortest such run is returned per spec index."""
+    by_start: dict[int, list[SegmentSpec]] = {}
+    for part in pool:
+        by_start.setdefault(round(part.start / REUSE_TOLERANCE), []).append(part)
+
+    def candidates(t: float) -> list[SegmentSpec]:
+        bucket = round(t / REUSE_TOLERANCE)
+        return [
+            part
+            for b in (bucket - 1, bucket, bucket + 1)
+            for part in by_start.get(b, [])
+            if abs(part.start - t) <= REUSE_TOLERANCE
+        ]
+
+    runs = {}
+    for spec in specs:
+        # Breadth-first over cut points, so the first run found is the one
+        # with the fewest parts to join.
+        queue = deque([(spec.start, [])])
+        seen = set()
+        while queue and spec.index not in runs:
+            t, run = queue.popleft()
+            for part in candidates(t):
+                if part.end > spec.end + REUSE_TOLERANCE or part.end <= t:
+                    continue
+                if abs(part.end - spec.end) <= REUSE_TOLERANCE:
+                    runs[spec.index] = run + [part]
+                    break
+                bucket = round(part.end / REUSE_TOLERANCE)
+                if bucket not in seen:
+                    seen.add(bucket)
+                    queue.append((part.end, run + [part]))
+    return runs
+
+
+def _link_or_copy(source: Path, target: Path) -> None:
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+async def assemble_segment(ffmpeg: str, spec: SegmentSpec, run: list[SegmentSpec]) -> None:
+    """Write spec from existing parts instead of encoding it.
+
+    A single matching part is hard-linked. Several consecutive parts are
+    joined with the concat demuxer in stream-copy mode, which is exact
+    because every part starts on a keyframe; the first part's thumbnail is
+    carried over."""
+    if len(run) == 1:
+        await _write_in_thread(_link_or_copy, run[0].path, spec.path)
+        return
+    list_path = spec.path.with_suffix(".concat.txt")
+    list_path.write_text(
+        "".join(
+            "file '{}'\n".format(str(part.path.resolve()).replace("'", "'\\''"))
+            for part in run
+        )
+    )
+    try:
+        returncode, stderr = await run_ffmpeg(
+            ffmpeg,
+            "-y",
+            "-f", "concat",
+            "-safe", "0",
+            "-i", str(list_path),
+            "-map", "0:v:0",
+            "-map", "0:a?",
+            "-c", "copy",
+            "-loglevel", "error",
+            str(spec.path),
+        )
+    finally:
+        list_path.unlink(missing_ok=True)
+    if returncode != 0:
+        raise SegmentEncodeError(spec.index, stderr.decode())
+    cover = await asyncio.to_thread(read_cover, run[0].path)
+    if cover:
+        await _write_in_thread(attach_cover, spec.path, cover)
+
+
+async def split_segments(
+    ffmpeg: str,
+    input_path: str,
+    specs: list[SegmentSpec],
+    split_mode: str,
+    pool: Sequence[SegmentSpec] = (),
+    encoder: Optional[Encoder] = None,
+) -> AsyncIterator[SegmentSpec]:
+    """Like encode_segments, but parts that earlier splits (pool) already
+    cover are assembled from those files and only the rest is encoded,
+    by encoder(specs, split_mode) if given (see remote_encode.py)."""
+    runs = plan_reuse(specs, list(pool))
+    to_encode = []
+    for spec in specs:
+        run = runs.get(spec.index)
+        if run is None:
+            to_encode.append(spec)
+            continue
+        try:
+            await assemble_segment(ffmpeg, spec, run)
+        except (OSError, ValueError, SegmentEncodeError):
+            # e.g. the pool entry was evicted meanwhile; encode it instead.
+            logging.exception(f"Could not reuse parts for {spec.path.name}")
+            spec.path.unlink(missing_ok=True)
+            to_encode.append(spec)
+            continue
+        yield spec
+
+    if to_encode and split_mode == "single_pass" and len(to_encode) < len(specs):
+        # The segment muxer writes a contiguous, gapless run of parts; the
+        # remaining ranges are encoded one by one with the same codecs.
+        split_mode = "precise"
+    if to_encode:
+        async with aclosing(
+            encoder(to_encode, split_mode)
+            if encoder is not None
+            else encode_segments(ffmpeg, input_path, to_encode, split_mode)
+        ) as results:
+            async for spec in results:
+                yield spec
+
+
+def segment_encode_args(
+    ffmpeg: str,
+    input_path: str,
+    start: float,
+    duration: float,
+    output_path: Path,
+    copy: bool,
+    threads: int,
+    profile: EncodeProfile = ENCODE_PROFILES[DEFAULT_ENCODE_PROFILE],
+) -> list[str]:
+    """ffmpeg command that writes one part of a precise or fast split.
+
+    input_path may also be an http(s) URL; ffmpeg then seeks with range
+    requests (see services/remote_encode.py)."""
+    # The first decoded frame is split off inside the same ffmpeg run and
+    # muxed as the attached_pic, so each part is written to disk once.
+    if copy:
+        codec_args = (
+            "-filter_complex", "[0:v]trim=end_frame=1[thumb]",
+            "-map", "0:v:0",
+            "-map", "0:a?",
+            "-map", "[thumb]",
+            "-c", "copy",
+            "-c:v:1", "png",
+            "-disposition:v:1", "attached_pic",
+            "-avoid_negative_ts", "make_zero",
+        )
+    else:
+        codec_args = (
+            "-filter_complex",
+            f"[0:v]setpts=PTS-STARTPTS,{profile.scale_filter()}split=2[v][t];"
+            "[t]trim=end_frame=1[thumb]",
+            "-map", "[v]",
+            "-map", "0:a?",
+            "-map", "[thumb]",
+            *profile.codec_args("-c:v:0"),
+            "-c:v:1", "png",
+            "-disposition:v:1", "attached_pic",
+            "-threads", str(threads),
+            "-af", "asetpts=PTS-STARTPTS",
+        )
+    return [
+        ffmpeg,
+        "-y",              # overwrite
+        "-ss", str(start),
+        "-i", str(input_path),
+        "-t", str(duration),
+        *codec_args,
+        "-loglevel", "error",
+        str(output_path),
+    ]
+
+
+async def _encode_in_pool(
+    ffmpeg: str,
+    input_path: str,
+    specs: list[SegmentSpec],
+    copy: bool,
+    profile: EncodeProfile,
+    on_progress: Optional[ProgressCallback] = None,
+) -> AsyncIterator[SegmentSpec]:
+    """One ffmpeg process per part. How many run at once and how many
+    threads a new one gets follow plan_encode_workers at the time it
+    starts, so the pool widens and narrows with the CPU governor."""
+    slots = asyncio.Condition()
+    running = 0
+
+    async def encode(spec: SegmentSpec) -> SegmentSpec:
+        nonlocal running
+        async with slots:
+            # Waiters are woken in order as parts finish, so parts still
+            # start in order.
+            await slots.wait_for(
+                lambda: running < plan_encode_workers(len(specs))[0]
+            )
+            running += 1
+            _, threads = plan_encode_workers(len(specs))
+        try:
+            # Call ffmpeg directly as an async subprocess.
+            # This runs in a completely separate OS process —
+            # zero GIL contention, zero blocking of the Python event loop.
+            started = time.monotonic()
+            returncode, stderr = await run_ffmpeg(
+                *segment_encode_args(
+                    ffmpeg,
+                    input_path,
+                    spec.start,
+                    spec.duration,
+                    spec.path,
+                    copy,
+                    threads,
+                    profile,
+                ),
+                on_block=(
+                    None
+                    if on_progress is None
+                    else lambda encoded, _, fps, speed: on_progress(
+                        EncodeProgress(spec.index, encoded, fps, speed)
+                    )
+                ),
+            )
+            if returncode != 0:
+                raise SegmentEncodeError(spec.index, stderr.decode())
+            metrics.segment_encode_seconds.observe(
+                time.monotonic() - started, "fast" if copy else "precise"
+            )
+        finally:
+            async with slots:
+                running -= 1
+                # The budget may have grown since, so more than one may go;
+                # waking one that cannot would send it to the back.
+                free = plan_encode_workers(len(specs))[0] - running
+                if free > 0:
+                    slots.notify(free)
+        return spec
+
+    tasks = [asyncio.create_task(encode(spec)) for spec in specs]
+    try:
+        for next_finished in asyncio.as_completed(tasks):
+            yield await next_finished
+    finally:
+        # Stop in-flight encodes if we are leaving early; their ffmpeg
+        # processes are killed by run_ffmpeg.
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _encode_single_pass(
+    ffmpeg: str,
+    input_path: str,
+    specs: list[SegmentSpec],
+    profile: EncodeProfile,
+    on_progress: Optional[ProgressCallback] = None,
+) -> AsyncIterator[SegmentSpec]:
+    """Decode the source once and let the segment muxer write every part.
+
+    Keyframes are forced at each cut so the parts start exactly where they
+    were requested and the specs' times stay as planned. The muxer writes
+    one segment-list line to stdout per closed part, which drives progress.
+
+    The segment muxer cannot carry an attached_pic past the first part, so
+    the same run also writes the first frame of every part to a small PNG.
+    It is then patched into the finished part's moov atom in place."""
+    if not specs:
+        return
+    _, threads = plan_encode_workers(1)
+    inner_cuts = ",".join(f"{spec.start:.6f}" for spec in specs[1:])
+    # Parts are numbered from 1 in order, so the stem can be recovered from
+    # the first file name; "%" must be escaped for the muxer's pattern.
+    stem = specs[0].path.name[: -len(segment_filename("", 1))]
+    pattern = specs[0].path.with_name(f"{stem.replace('%', '%%')}_part_%03d.mp4")
+    thumb_pattern = pattern.with_suffix(".thumb.png")
+    # Pick the first frame at or after each cut from the decoded stream.
+    first_frames = "+".join(
+        "isnan(prev_t)" if spec.start <= 0
+        else f"gte(t\\,{spec.start:.6f})*lt(prev_t\\,{spec.start:.6f})"
+        for spec in specs
+    )
+
+    args = [
+        ffmpeg,
+        "-y",
+        "-i", str(input_path),
+        "-filter_complex",
+        f"[0:v]{profile.scale_filter()}split=2[v][t];[t]select='{first_frames}'[thumbs]",
+        "-map", "[v]",
+        "-map", "0:a?",
+        *profile.codec_args(),
+        "-threads", str(threads),
+        "-f", "segment",
+        "-segment_format", "mp4",
+        "-segment_start_number", "1",
+        "-reset_timestamps", "1",
+        "-segment_list", "pipe:1",
+        "-segment_list_type", "csv",
+        "-loglevel", "error",
+    ]
+    if inner_cuts:
+        args += ["-force_key_frames", inner_cuts, "-segment_times", inner_cuts]
+    else:
+        # A single part: never start a second file.
+        args += ["-segment_time", f"{specs[-1].end + 1:.6f}"]
+    args += [
+        str(pattern),
+        "-map", "[thumbs]",
+        "-c:v", "png",
+        "-fps_mode", "vfr",
+        "-start_number", "1",
+        "-f", "image2",
+        str(thumb_pattern),
+    ]
+
+    done = 0
+    # ffmpeg reports the output time of the thumbnail stream here, which
+    # only moves at cuts, so the position is counted in frames instead.
+    frame_rate = await probe_frame_rate(input_path) if on_progress else 0.0
+
+    def on_block(position: float, frames: int, fps: float, speed: float) -> None:
+        if frame_rate:
+            position = frames / frame_rate
+            speed = fps / frame_rate
+        # One run writes every part; progress belongs to the open one.
+        spec = specs[min(done, len(specs) - 1)]
+        encoded = min(max(0.0, position - spec.start), spec.duration)
+        on_progress(EncodeProgress(spec.index, encoded, fps, speed))
+
+    proc, progress = await spawn_ffmpeg(
+        args, asyncio.subprocess.PIPE, on_block if on_progress else None
+    )
+    stderr_task = asyncio.create_task(proc.stderr.read())
+    # Parts are written one after the other, each from the end of the last.
+    part_started = time.monotonic()
+    try:
+        async for line in proc.stdout:
+            if not line.strip() or done >= len(specs):
+                continue
+            spec = specs[done]
+            done += 1
+            now = time.monotonic()
+            metrics.segment_encode_seconds.observe(now - part_started, "single_pass")
+            part_started = now
+            await _write_in_thread(_attach_thumbnail, spec.path)
+            yield spec
+        await proc.wait()
+    finally:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        stderr = await stderr_task
+        if progress is not None:
+            # The pipe closes with ffmpeg; this only drops what is unread.
+            progress.cancel()
+        for spec in specs:
+            spec.path.with_suffix(".thumb.png").unlink(missing_ok=True)
+    if proc.returncode != 0:
+        raise SegmentEncodeError(done, stderr.decode())
+
+
+def _attach_thumbnail(segment_path: Path) -> None:
+    """Move the part's .thumb.png into the file as its attached_pic."""
+    thumb_path = segment_path.with_suffix(".thumb.png")
+    try:
+        with metrics.thumbnail_seconds.time():
+            attach_cover(segment_path, thumb_path.read_bytes())
+    except Exception:
+        logging.exception(f"Could not attach thumbnail to {segment_path.name}")
+    finally:
+        thumb_path.unlink(missing_ok=True)
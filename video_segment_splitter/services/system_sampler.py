@@ -0,0 +1,124 @@
+"""One host-stats sampler per backend process, shared by every session.
+
+The sampler collects CPU, memory and load figures every
+SYSTEM_SAMPLE_INTERVAL (a Reflex lifespan task) and keeps the last
+SYSTEM_HISTORY_SAMPLES in a ring buffer for the monitor's sparklines.
+Open System Monitor panels only wait for the next sample, so the cost of
+sampling does not grow with the number of viewers, and psutil's CPU
+figures always cover a whole interval instead of the time since some
+other panel last asked.
+"""
+
+import asyncio
+import functools
+import logging
+import time
+from collections import deque
+from typing import AsyncIterator, Callable, Optional
+
+import psutil
+
+SYSTEM_SAMPLE_INTERVAL = 2.0
+
+# Two minutes of history.
+SYSTEM_HISTORY_SAMPLES = 60
+
+# Fixed while the host is up, so it is read once.
+_BOOT_TIME = psutil.boot_time()
+
+
+def _collect_system_stats() -> dict:
+    """Collect system stats. Blocking; run it in a worker thread. The CPU
+    governor (see cpu_governor.py) reads the per-core usage and load from
+    these samples to decide how many cores encodes may take from the web
+    server."""
+    cpu_percents = psutil.cpu_percent(interval=None, percpu=True)
+    # The average of the cores, without a second pass over /proc/stat.
+    cpu_total = round(sum(cpu_percents) / len(cpu_percents), 1) if cpu_percents else 0.0
+
+    mem = psutil.virtual_memory()
+    swap = psutil.swap_memory()
+    load1, load5, load15 = psutil.getloadavg()
+    pids_count = len(psutil.pids())
+
+    uptime_seconds = int(time.time() - _BOOT_TIME)
+    days = uptime_seconds // 86400
+    hours = (uptime_seconds % 86400) // 3600
+    minutes = (uptime_seconds % 3600) // 60
+    seconds = uptime_seconds % 60
+
+    return {
+        "cpu_percents": cpu_percents,
+        "cpu_percent_total": cpu_total,
+        "mem_total_gb": f"{mem.total / (1024 ** 3):.1f}",
+        "mem_used_gb": f"{mem.used / (1024 ** 3):.1f}",
+        "mem_percent": mem.percent,
+        "swap_total_gb": f"{swap.total / (1024 ** 3):.2f}",
+        "swap_used_gb": f"{swap.used / (1024 ** 3):.2f}",
+        "swap_percent": swap.percent,
+        "load_avg_1": f"{load1:.2f}",
+        "load_avg_5": f"{load5:.2f}",
+        "load_avg_15": f"{load15:.2f}",
+        "task_count": pids_count,
+        "uptime_str": f"{days} days, {hours:02d}:{minutes:02d}:{seconds:02d}",
+    }
+
+
+class SystemSampler:
+    def __init__(self, interval: float = SYSTEM_SAMPLE_INTERVAL):
+        self.interval = interval
+        # Oldest first; the last one is the latest sample.
+        self.history: deque[dict] = deque(maxlen=SYSTEM_HISTORY_SAMPLES)
+        # Set and replaced with every new sample.
+        self._sampled = asyncio.Event()
+        # Further figures collected with every sample (see add_source).
+        self._sources: dict[str, Callable[[], object]] = {}
+        # Prime psutil so the first non-blocking call returns real values.
+        psutil.cpu_percent(interval=None, percpu=True)
+
+    @property
+    def latest(self) -> Optional[dict]:
+        return self.history[-1] if self.history else None
+
+    def add_source(self, name: str, collect: Callable[[], object]) -> None:
+        """Put collect() into every sample as name. collect is blocking and
+        runs in the sampling thread."""
+        self._sources[name] = collect
+
+    def _collect(self) -> dict:
+        stats = _collect_system_stats()
+        for name, collect in self._sources.items():
+            try:
+                stats[name] = collect()
+            except Exception:
+                logging.exception(f"Could not collect {name} for system stats")
+        return stats
+
+    async def sample(self) -> dict:
+        """Collect a sample now and pass it to every subscriber."""
+        stats = await asyncio.to_thread(self._collect)
+        self.history.append(stats)
+        sampled, self._sampled = self._sampled, asyncio.Event()
+        sampled.set()
+        return stats
+
+    async def run_forever(self) -> None:
+        while True:
+            try:
+                await self.sample()
+            except Exception:
+                logging.exception("Could not sample system stats")
+            await asyncio.sleep(self.interval)
+
+    async def subscribe(self) -> AsyncIterator[dict]:
+        """Yield the latest sample, then every new one as it comes."""
+        if self.latest is not None:
+            yield self.latest
+        while True:
+            await self._sampled.wait()
+            yield self.latest
+
+
+@functools.cache
+def get_system_sampler() -> SystemSampler:
+    return SystemSampler()
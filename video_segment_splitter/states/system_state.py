@@ -1,48 +1,54 @@
 import reflex as rx
-import psutil
-import asyncio
-import time
-
-
-# Prime psutil so first non-blocking call returns real values
-psutil.cpu_percent(percpu=True)
-
-
-def _collect_system_stats() -> dict:
-    """Collect system stats. Called via asyncio.to_thread to avoid
-    blocking the event loop. The real fix for UI responsiveness during
-    heavy encoding is limiting ffmpeg's thread count (see video_state.py),
-    so that CPU cores remain available for the web server and this function."""
-    cpu_percents = psutil.cpu_percent(interval=None, percpu=True)
-    cpu_total = psutil.cpu_percent(interval=None)
-
-    mem = psutil.virtual_memory()
-    swap = psutil.swap_memory()
-    load1, load5, load15 = psutil.getloadavg()
-    pids_count = len(psutil.pids())
-
-    boot_time = psutil.boot_time()
-    uptime_seconds = int(time.time() - boot_time)
-    days = uptime_seconds // 86400
-    hours = (uptime_seconds % 86400) // 3600
-    minutes = (uptime_seconds % 3600) // 60
-    seconds = uptime_seconds % 60
-
-    return {
-        "cpu_percents": cpu_percents,
-        "cpu_percent_total": cpu_total,
-        "mem_total_gb": f"{mem.total / (1024 ** 3):.1f}",
-        "mem_used_gb": f"{mem.used / (1024 ** 3):.1f}",
-        "mem_percent": mem.percent,
-        "swap_total_gb": f"{swap.total / (1024 ** 3):.2f}",
-        "swap_used_gb": f"{swap.used / (1024 ** 3):.2f}",
-        "swap_percent": swap.percent,
-        "load_avg_1": f"{load1:.2f}",
-        "load_avg_5": f"{load5:.2f}",
-        "load_avg_15": f"{load15:.2f}",
-        "task_count": pids_count,
-        "uptime_str": f"{days} days, {hours:02d}:{minutes:02d}:{seconds:02d}",
-    }
+from pydantic import BaseModel
+from video_segment_splitter.services.jobs import Job
+from video_segment_splitter.services.system_sampler import get_system_sampler
+
+
+def _format_bytes(count: int) -> str:
+    if count >= 1024 ** 3:
+        return f"{count / 1024 ** 3:.1f} GB"
+    return f"{count / 1024 ** 2:.0f} MB"
+
+
+def _format_cpu_time(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}m {seconds:02d}s" if minutes else f"{seconds}s"
+
+
+class JobUsage(BaseModel):
+    """A running job's subprocesses, as shown in the System Busy panel."""
+
+    label: str = ""
+    # This tab's own job.
+    mine: bool = False
+    cpu_percent: str = ""
+    cpu_time: str = ""
+    memory: str = ""
+    io: str = ""
+    processes: str = ""
+
+
+def _job_usage(job: Job, token: str) -> JobUsage:
+    usage = job.usage or {}
+    params = job.params
+    label = " · ".join(
+        str(params[key]) for key in ("stem", "split_mode", "profile") if key in params
+    )
+    return JobUsage(
+        label=label or job.kind,
+        mine=job.owner == token,
+        cpu_percent=f"{usage.get('cpu_percent', 0.0):.0f}%",
+        cpu_time=_format_cpu_time(usage.get("cpu_seconds", 0.0)),
+        memory=(
+            f"{_format_bytes(usage.get('rss', 0))}"
+            f" (peak {_format_bytes(usage.get('peak_rss', 0))})"
+        ),
+        io=(
+            f"R {_format_bytes(usage.get('read_bytes', 0))}"
+            f" · W {_format_bytes(usage.get('write_bytes', 0))}"
+        ),
+        processes=f"{usage.get('running', 0)} running, {usage.get('processes', 0)} total",
+    )
 
 
 class SystemState(rx.State):
@@ -60,6 +66,13 @@ class SystemState(rx.State):
     load_avg_15: str = "0.00"
     task_count: int = 0
     uptime_str: str = ""
+    # Oldest first, one value per sample, for the sparklines.
+    cpu_history: list[float] = []
+    mem_history: list[float] = []
+    # Running jobs of the whole server, with their ffmpeg processes' usage.
+    jobs: list[JobUsage] = []
+    # The CPU governor's budget for encodes (see services/cpu_governor.py).
+    encode_budget: str = ""
 
     @rx.event
     def toggle_system_modal(self):
@@ -79,22 +92,21 @@ class SystemState(rx.State):
 
     @rx.event(background=True)
     async def auto_refresh_once(self):
-        """Single-shot stats collection in a thread."""
-        stats = await asyncio.to_thread(_collect_system_stats)
-        async with self:
-            self._apply_stats(stats)
+        """Take a sample right away; every open panel gets it."""
+        await get_system_sampler().sample()
 
     @rx.event(background=True)
     async def auto_refresh(self):
-        """Continuously refresh stats every 2s while modal is open.
-        Stats are collected in a thread via asyncio.to_thread."""
-        while True:
-            stats = await asyncio.to_thread(_collect_system_stats)
+        """Follow the shared sampler (see services/system_sampler.py) while
+        the modal is open."""
+        sampler = get_system_sampler()
+        async for stats in sampler.subscribe():
             async with self:
                 if not self.show_system_modal:
                     return
                 self._apply_stats(stats)
-            await asyncio.sleep(2.0)
+                self.cpu_history = [s["cpu_percent_total"] for s in sampler.history]
+                self.mem_history = [s["mem_percent"] for s in sampler.history]
 
     def _apply_stats(self, stats: dict):
         """Assign pre-collected stats to state vars. Very fast."""
@@ -111,3 +123,12 @@ class SystemState(rx.State):
         self.load_avg_15 = stats["load_avg_15"]
         self.task_count = stats["task_count"]
         self.uptime_str = stats["uptime_str"]
+        token = self.router.session.client_token
+        self.jobs = [_job_usage(job, token) for job in stats.get("jobs", [])]
+        governor = stats.get("governor")
+        if governor is not None:
+            self.encode_budget = (
+                f"{governor['encode_cores']} cores, nice {governor['nice']},"
+                f" lag {governor['latency'] * 1000:.0f}"
+                f"/{governor['target_latency'] * 1000:.0f} ms"
+            )
@@ -1,84 +1,106 @@
 import reflex as rx
-import os
-import random
-import string
 import asyncio
-import shutil
+import math
+import os
 from typing import Optional
-from moviepy import VideoFileClip
 from pathlib import Path
 from pydantic import BaseModel
 from reflex.config import get_config
-
-
-def _get_ffmpeg_path() -> str:
-    """Find ffmpeg binary. Prefer system ffmpeg, fallback to imageio-ffmpeg."""
-    path = shutil.which("ffmpeg")
-    if path:
-        return path
+from reflex.utils.format import format_event_handler
+from video_segment_splitter.api.upload import store_upload, upload_content_hash
+from video_segment_splitter.api.zip_stream import (
+    cancel_zip_stream,
+    issue_zip_download,
+    zip_filename,
+)
+from video_segment_splitter.services import metrics
+from video_segment_splitter.services.encode_profiles import (
+    DEFAULT_ENCODE_PROFILE,
+    ENCODE_PROFILES,
+    get_throughput_log,
+    throughput_key,
+)
+from video_segment_splitter.services.jobs import get_job_queue
+from video_segment_splitter.services.probe import probe_media
+from video_segment_splitter.services.split_cache import get_split_cache
+from video_segment_splitter.services.split_job import (
+    CUT_MODES,
+    MAX_SEGMENTS,
+    SPLIT_BY,
+    planned_segment_count,
+    split_job_cache_key,
+    split_job_params,
+)
+from video_segment_splitter.services.splitter import (
+    SPLIT_MODES,
+    SegmentSpec,
+    segment_filename,
+)
+
+# Clips per page of the clip grid. Only the shown page is part of the
+# client's state, so updates stay this small however many parts there are.
+CLIPS_PER_PAGE = 24
+
+
+def _format_duration(seconds: float) -> str:
+    h = int(seconds // 3600)
+    m = int(seconds % 3600 // 60)
+    s = int(seconds % 60)
+    return f"{h:02d}:{m:02d}:{s:02d}"
+
+
+def _format_timestamp(seconds: float) -> str:
+    """HH:MM:SS.mmm, precise enough to show keyframe-snapped cut points."""
+    millis = int(round(seconds * 1000))
+    h, rem = divmod(millis, 3600_000)
+    m, rem = divmod(rem, 60_000)
+    s, ms = divmod(rem, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d}.{ms:03d}"
+
+
+def _segment_from_spec(
+    spec: SegmentSpec, api_url: str, upload_dir: Path, stem: str, ready: bool = True
+) -> "VideoSegment":
+    """ready is False for parts of a running split, which are still in a
+    staging directory and cannot be downloaded yet."""
+    # Cached parts keep the name of the upload that produced them, so the
+    # shown name is derived from the current upload instead.
     try:
-        from imageio_ffmpeg import get_ffmpeg_exe
-        return get_ffmpeg_exe()
-    except Exception:
-        return "ffmpeg"
-
-
-async def _embed_thumbnail(ffmpeg: str, segment_path: Path) -> None:
-    """Extract the first frame of segment_path and embed it as attached_pic."""
-    import logging
-
-    thumb_path = segment_path.with_suffix(".thumb.png")
-    muxed_path = segment_path.with_suffix(".muxed.mp4")
-    try:
-        # Step 1: extract first frame
-        proc1 = await asyncio.create_subprocess_exec(
-            ffmpeg,
-            "-y",
-            "-i", str(segment_path),
-            "-vframes", "1",
-            "-an",
-            "-loglevel", "error",
-            str(thumb_path),
-            stdout=asyncio.subprocess.DEVNULL,
-            stderr=asyncio.subprocess.PIPE,
-        )
-        _, stderr1 = await proc1.communicate()
-        if proc1.returncode != 0:
-            logging.warning(f"thumbnail extract failed: {stderr1.decode()}")
-            return
-
-        # Step 2: mux thumbnail as attached_pic into a new file
-        proc2 = await asyncio.create_subprocess_exec(
-            ffmpeg,
-            "-y",
-            "-i", str(segment_path),
-            "-i", str(thumb_path),
-            "-map", "0",
-            "-map", "1",
-            "-c", "copy",
-            "-c:v:1", "png",
-            "-disposition:v:1", "attached_pic",
-            "-loglevel", "error",
-            str(muxed_path),
-            stdout=asyncio.subprocess.DEVNULL,
-            stderr=asyncio.subprocess.PIPE,
-        )
-        _, stderr2 = await proc2.communicate()
-        if proc2.returncode != 0:
-            logging.warning(f"thumbnail mux failed: {stderr2.decode()}")
-            return
-
-        # Replace original segment with the muxed version
-        os.replace(str(muxed_path), str(segment_path))
-    except Exception:
-        logging.exception("Unexpected error embedding thumbnail")
-    finally:
-        for p in (thumb_path, muxed_path):
-            try:
-                if p.exists():
-                    p.unlink()
-            except Exception:
-                pass
+        size_formatted = f"{spec.path.stat().st_size / (1024 * 1024):.1f} MB"
+    except OSError:
+        size_formatted = ""
+    return VideoSegment(
+        number=spec.index + 1,
+        filename=segment_filename(stem, spec.index + 1),
+        duration_formatted=_format_duration(spec.duration),
+        file_path=str(spec.path),
+        download_url=(
+            f"{api_url}/_upload/{spec.path.relative_to(upload_dir).as_posix()}"
+            if ready
+            else ""
+        ),
+        ready=ready,
+        start_time=spec.start,
+        end_time=spec.end,
+        requested_start_time=spec.requested_start,
+        requested_end_time=spec.requested_end,
+        cut_range_formatted=(
+            f"{_format_timestamp(spec.start)} - {_format_timestamp(spec.end)}"
+        ),
+        requested_range_formatted=(
+            f"{_format_timestamp(spec.requested_start)} - "
+            f"{_format_timestamp(spec.requested_end)}"
+        ),
+        size_formatted=size_formatted,
+    )
+
+
+def _page_count(clip_count: int) -> int:
+    return max(1, math.ceil(clip_count / CLIPS_PER_PAGE))
+
+
+# Jobs some session of this process is following (see _follow_job).
+_followed_jobs: set[str] = set()
 
 
 class VideoMetadata(BaseModel):
@@ -88,13 +110,33 @@ class VideoMetadata(BaseModel):
     resolution: str = "0x0"
     file_size_mb: str = "0.0"
     file_path: str = ""
+    # See services/content_hash.py; computed while the upload streams in.
+    content_hash: str = ""
+    video_codec: str = ""
+    bitrate_kbps: int = 0
+    fps: float = 0.0
+    # Average distance between keyframes, sampled from the start of the file.
+    keyframe_interval: float = 0.0
 
 
 class VideoSegment(BaseModel):
+    # 1-based part number.
+    number: int = 0
     filename: str = ""
     duration_formatted: str = ""
     file_path: str = ""
     download_url: str = ""
+    # Actual cut times of the written file. In fast (stream copy) mode these
+    # are keyframe positions and may differ from the requested times.
+    start_time: float = 0.0
+    end_time: float = 0.0
+    requested_start_time: float = 0.0
+    requested_end_time: float = 0.0
+    cut_range_formatted: str = ""
+    requested_range_formatted: str = ""
+    size_formatted: str = ""
+    # False while the split that writes it is still running.
+    ready: bool = True
 
 
 class VideoState(rx.State):
@@ -102,25 +144,86 @@ class VideoState(rx.State):
     upload_progress: int = 0
     video_metadata: Optional[VideoMetadata] = None
     segment_count: int = 5
+    # "count" uses segment_count; "duration" and "size" make as many parts
+    # as needed to stay under target_seconds or target_mb.
+    split_by: str = "count"
+    target_seconds: int = 60
+    target_mb: int = 25
+    split_mode: str = "precise"
+    # Equal-length parts, or cuts moved to nearby scene changes or pauses.
+    cut_mode: str = "equal"
+    # See services/encode_profiles.py; used by the re-encoding modes.
+    encode_profile: str = DEFAULT_ENCODE_PROFILE
+    # Measured encode speed (video seconds per second) by "profile/mode".
+    encode_speeds: dict[str, float] = {}
     drag_active: bool = False
     is_processing: bool = False
     processing_progress: int = 0
+    # The clips of the current page of the clip grid; _segments holds all
+    # of them and stays on the server.
     generated_segments: list[VideoSegment] = []
-    zip_download_url: str = ""
+    _segments: list[VideoSegment] = []
+    clip_count: int = 0
+    clip_page: int = 0
+    # The current clips, for download_zip (see api/zip_stream.py), and the
+    # ID of the ZIP download started last.
+    _zip_cache_key: str = ""
+    _zip_stem: str = ""
+    _zip_download_id: str = ""
     is_zipping: bool = False
+    zip_progress: int = 0
+    zip_status: str = ""
+    # The split job this tab follows (see services/jobs.py); job_status is
+    # "queued", "running" or "cancelling" while it is pending.
+    job_id: str = ""
+    job_status: str = ""
+    queue_position: int = 0
+    # Non-empty while the job analyses the source before encoding, e.g.
+    # "scenes" or "silence".
+    job_stage: str = ""
+    # Live encoder figures of the running split, from ffmpeg -progress.
+    encoded_seconds: float = 0.0
+    encode_fps: float = 0.0
+    encode_speed: float = 0.0
+    # Seconds left, or -1 while unknown.
+    eta_seconds: float = -1.0
 
     @rx.var
     def has_video(self) -> bool:
         return self.video_metadata is not None
 
+    @rx.var
+    def clip_page_count(self) -> int:
+        return _page_count(self.clip_count)
+
+    @rx.var
+    def split_target(self) -> float:
+        if self.split_by == "duration":
+            return float(self.target_seconds)
+        if self.split_by == "size":
+            return float(self.target_mb)
+        return 0.0
+
+    @rx.var
+    def planned_segment_count(self) -> int:
+        if not self.video_metadata:
+            return self.segment_count
+        return planned_segment_count(
+            self.video_metadata.duration_raw,
+            self.split_by,
+            self.segment_count,
+            self.split_target,
+            self.video_metadata.bitrate_kbps * 1000,
+        )
+
     @rx.var
     def segment_duration_formatted(self) -> str:
         if not self.video_metadata:
             return "00:00:00"
         total_seconds = self.video_metadata.duration_raw
-        if self.segment_count <= 0:
+        if self.planned_segment_count <= 0:
             return "00:00:00"
-        seg_seconds = total_seconds / self.segment_count
+        seg_seconds = total_seconds / self.planned_segment_count
         hours = int(seg_seconds // 3600)
         minutes = int(seg_seconds % 3600 // 60)
         seconds = int(seg_seconds % 60)
@@ -130,45 +233,141 @@ class VideoState(rx.State):
     def set_segment_count(self, value: float):
         try:
             val = int(value)
-            if 1 <= val <= 20:
+            if 1 <= val <= MAX_SEGMENTS:
                 self.segment_count = val
         except (ValueError, TypeError):
             pass
 
     @rx.event
-    async def handle_upload(self, files: list[rx.UploadFile]):
+    def set_split_by(self, value: str):
+        if value in SPLIT_BY:
+            self.split_by = value
+
+    @rx.event
+    def set_target_seconds(self, value: float):
+        try:
+            val = int(value)
+            if val >= 1:
+                self.target_seconds = val
+        except (ValueError, TypeError):
+            pass
+
+    @rx.event
+    def set_target_mb(self, value: float):
+        try:
+            val = int(value)
+            if val >= 1:
+                self.target_mb = val
+        except (ValueError, TypeError):
+            pass
+
+    @rx.event
+    def set_split_mode(self, value: str):
+        if value in SPLIT_MODES:
+            self.split_mode = value
+
+    @rx.event
+    def set_cut_mode(self, value: str):
+        if value in CUT_MODES:
+            self.cut_mode = value
+
+    @rx.event
+    def set_encode_profile(self, value: str):
+        if value in ENCODE_PROFILES:
+            self.encode_profile = value
+
+    @rx.event
+    async def load_encode_speeds(self):
+        self.encode_speeds = await asyncio.to_thread(get_throughput_log().speeds)
+
+    @rx.var
+    def encode_speed_labels(self) -> dict[str, str]:
+        """Measured throughput of each profile in the current split mode."""
+        labels = {}
+        for name in ENCODE_PROFILES:
+            speed = self.encode_speeds.get(throughput_key(name, self.split_mode))
+            labels[name] = f"{speed:.1f}× realtime" if speed else "Not measured yet"
+        return labels
+
+    @rx.event
+    def set_upload_progress(self, progress: dict):
+        """Byte-level progress reported by the browser while the body is sent."""
         self.is_uploading = True
+        self.upload_progress = int(progress.get("progress", 0) * 100)
+
+    @rx.event
+    def upload_failed(self, message: str):
+        """The browser gave up on a resumable upload (see
+        assets/resumable_upload.js)."""
+        self.is_uploading = False
         self.upload_progress = 0
+        return rx.toast.error(f"Upload failed: {message}")
+
+    @rx.event
+    def set_zip_progress(self, progress: dict):
+        """Per-file and per-byte progress of this tab's ZIP download."""
+        if progress.get("done"):
+            self.is_zipping = False
+            self.zip_status = ""
+            if progress.get("outcome") == "cancelled":
+                return rx.toast.info("ZIP download stopped")
+            return
+        self.is_zipping = True
+        self.zip_progress = int(progress.get("progress", 0) * 100)
+        self.zip_status = (
+            f"{progress.get('files_done', 0)}/{progress.get('files_total', 0)} clips"
+        )
+
+    @rx.event
+    def download_zip(self):
+        """Stream the current clips as one ZIP through a fresh single-use
+        download link."""
+        if not self._zip_cache_key:
+            return
+        self._zip_download_id = issue_zip_download(
+            self.router.session.client_token,
+            self._zip_cache_key,
+            self._zip_stem,
+            format_event_handler(VideoState.set_zip_progress),
+        )
+        api_url = str(get_config().api_url or "http://localhost:8000")
+        return rx.download(
+            # A Var, because rx.download only takes same-origin paths as str.
+            url=rx.Var.create(f"{api_url}/_zip/{self._zip_download_id}"),
+            filename=zip_filename(self._zip_stem),
+        )
+
+    @rx.event
+    def cancel_zip(self):
+        cancel_zip_stream(self._zip_download_id)
+
+    @rx.event
+    async def handle_upload(self, files: list[rx.UploadFile]):
+        self.is_uploading = True
+        upload_dir = rx.get_upload_dir()
+        upload_dir.mkdir(parents=True, exist_ok=True)
         for file in files:
-            upload_data = await file.read()
-            upload_dir = rx.get_upload_dir()
-            upload_dir.mkdir(parents=True, exist_ok=True)
-            unique_name = (
-                "".join(random.choices(string.ascii_letters + string.digits, k=10))
-                + "_"
-                + file.name
-            )
-            file_path = upload_dir / unique_name
-            with file_path.open("wb") as f:
-                f.write(upload_data)
+            # api/upload.py has already streamed the body to disk in chunks;
+            # nothing here reads the whole upload into memory.
+            file_path = await store_upload(file, upload_dir)
             try:
-                clip = VideoFileClip(file_path)
-                duration = clip.duration
-                width, height = clip.size
-                h = int(duration // 3600)
-                m = int(duration % 3600 // 60)
-                s = int(duration % 60)
-                formatted_time = f"{h:02d}:{m:02d}:{s:02d}"
+                with metrics.probe_seconds.time():
+                    info = await probe_media(str(file_path))
+                content_hash = await upload_content_hash(file_path)
                 size_mb = f"{os.path.getsize(file_path) / (1024 * 1024):.1f}"
                 self.video_metadata = VideoMetadata(
                     filename=file.name,
-                    duration_raw=duration,
-                    duration_formatted=formatted_time,
-                    resolution=f"{width}x{height}",
+                    duration_raw=info.duration,
+                    duration_formatted=_format_duration(info.duration),
+                    resolution=f"{info.width}x{info.height}",
                     file_size_mb=size_mb,
                     file_path=str(file_path),
+                    content_hash=content_hash,
+                    video_codec=info.video_codec,
+                    bitrate_kbps=info.bitrate // 1000,
+                    fps=round(info.fps, 3),
+                    keyframe_interval=round(info.keyframe_interval, 2),
                 )
-                clip.close()
             except Exception as e:
                 import logging
 
@@ -186,130 +385,250 @@ class VideoState(rx.State):
     def toggle_drag(self):
         self.drag_active = not self.drag_active
 
+    @rx.var
+    def processing_label(self) -> str:
+        if self.job_status == "queued":
+            if self.queue_position:
+                return f"Waiting in queue ({self.queue_position} ahead)..."
+            return "Waiting in queue..."
+        if self.job_status == "cancelling":
+            return "Cancelling..."
+        if self.job_stage == "scenes":
+            return "Finding scene changes..."
+        if self.job_stage == "silence":
+            return "Finding pauses in the audio..."
+        return "Processing..."
+
+    @rx.var
+    def processing_stats(self) -> str:
+        if self.job_status != "running" or self.job_stage or not self.video_metadata:
+            return ""
+        parts = [
+            f"{_format_duration(self.encoded_seconds)} of "
+            f"{_format_duration(self.video_metadata.duration_raw)}"
+        ]
+        if self.encode_fps:
+            parts.append(f"{self.encode_fps:.0f} fps")
+        if self.encode_speed:
+            parts.append(f"{self.encode_speed:.1f}×")
+        if self.eta_seconds >= 0:
+            parts.append(f"ETA {_format_duration(self.eta_seconds)}")
+        return " · ".join(parts)
+
     @rx.event(background=True)
     async def split_video(self):
         async with self:
             if not self.video_metadata or self.is_processing:
                 return
+            if self.planned_segment_count > MAX_SEGMENTS:
+                yield rx.toast.error(
+                    f"That makes {self.planned_segment_count} parts; "
+                    f"at most {MAX_SEGMENTS} are allowed"
+                )
+                return
             self.is_processing = True
             self.processing_progress = 0
-            self.generated_segments = []
+            self._set_segments([])
         try:
             async with self:
-                input_path = self.video_metadata.file_path
+                metadata = self.video_metadata
                 segment_count = self.segment_count
-                original_filename = self.video_metadata.filename
-                total_duration = self.video_metadata.duration_raw
-
-            segment_duration = total_duration / segment_count
-            generated_segments = []
-            upload_dir = rx.get_upload_dir()
-            ffmpeg = _get_ffmpeg_path()
-            max_threads = max(1, (os.cpu_count() or 4) // 2)
-
-            for i in range(segment_count):
-                start_time = i * segment_duration
-                end_time = min((i + 1) * segment_duration, total_duration)
-                seg_len = end_time - start_time
-
-                safe_filename = Path(original_filename).stem
-                segment_filename = f"{safe_filename}_part_{i + 1:03d}.mp4"
-                segment_path = upload_dir / segment_filename
-
-                # Call ffmpeg directly as an async subprocess.
-                # This runs in a completely separate OS process —
-                # zero GIL contention, zero blocking of the Python event loop.
-                proc = await asyncio.create_subprocess_exec(
-                    ffmpeg,
-                    "-y",              # overwrite
-                    "-ss", str(start_time),
-                    "-i", str(input_path),
-                    "-t", str(seg_len),
-                    "-c:v", "libx264",
-                    "-c:a", "aac",
-                    "-threads", str(max_threads),
-                    "-vf", "setpts=PTS-STARTPTS",
-                    "-af", "asetpts=PTS-STARTPTS",
-                    "-loglevel", "error",
-                    str(segment_path),
-                    stdout=asyncio.subprocess.DEVNULL,
-                    stderr=asyncio.subprocess.PIPE,
-                )
-                _, stderr = await proc.communicate()
-
-                if proc.returncode != 0:
-                    import logging
-                    logging.error(f"ffmpeg error for segment {i+1}: {stderr.decode()}")
-                    async with self:
-                        self.is_processing = False
-                    yield rx.toast.error(f"ffmpeg failed on segment {i+1}")
-                    return
-
-                # Embed first-frame thumbnail as attached_pic
-                await _embed_thumbnail(ffmpeg, segment_path)
-
-                h = int(seg_len // 3600)
-                m = int(seg_len % 3600 // 60)
-                s = int(seg_len % 60)
-                formatted_duration = f"{h:02d}:{m:02d}:{s:02d}"
-                api_url = str(get_config().api_url or "http://localhost:8000")
-                segment = VideoSegment(
-                    filename=segment_filename,
-                    duration_formatted=formatted_duration,
-                    file_path=str(segment_path),
-                    download_url=f"{api_url}/_upload/{segment_filename}",
-                )
-                generated_segments.append(segment)
-                progress = int((i + 1) / segment_count * 100)
+                split_mode = self.split_mode
+                encode_profile = self.encode_profile
+                cut_mode = self.cut_mode
+                split_by = self.split_by
+                target = self.split_target
+                token = self.router.session.client_token
+            content_hash = metadata.content_hash or await upload_content_hash(
+                Path(metadata.file_path)
+            )
+            params = split_job_params(
+                input_path=metadata.file_path,
+                content_hash=content_hash,
+                stem=Path(metadata.filename).stem,
+                duration=metadata.duration_raw,
+                segment_count=segment_count,
+                split_mode=split_mode,
+                profile=encode_profile,
+                cut_mode=cut_mode,
+                split_by=split_by,
+                target=target,
+                bitrate=metadata.bitrate_kbps * 1000,
+            )
+            cache_key = split_job_cache_key(params)
+            cached = await asyncio.to_thread(get_split_cache().lookup, cache_key)
+            metrics.split_requests.inc("miss" if cached is None else "hit")
+            if cached is not None:
                 async with self:
-                    self.processing_progress = progress
+                    self._show_segments(cache_key, cached, params["stem"])
+                    self.is_processing = False
+                yield rx.toast.success(f"Loaded {len(cached)} clips from cache")
+                return
 
+            # The upload's metadata rides along so a reloaded page can pick
+            # the job up again (see resume_job).
+            job_id = await get_job_queue().submit(
+                token,
+                "split",
+                {**params, "metadata": metadata.model_dump()},
+            )
             async with self:
-                self.generated_segments = generated_segments
-                self.is_processing = False
-                self.zip_download_url = ""
-            yield rx.toast.success("Video split successfully!")
+                self.job_id = job_id
+                self.job_status = "queued"
+            async for event in self._follow_job(job_id):
+                yield event
         except Exception as e:
             import logging
 
             logging.exception(f"Error splitting video: {e}")
             async with self:
                 self.is_processing = False
+                self.job_status = ""
                 yield rx.toast.error(f"Error splitting video: {str(e)}")
 
-    @rx.event(background=True)
-    async def create_zip_download(self):
-        import zipfile
+    @rx.event
+    async def cancel_split(self):
+        """Stop this tab's split and release the controls right away; the
+        job's cleanup finishes in the background."""
+        if not self.job_id:
+            return
+        await get_job_queue().cancel(self.job_id)
+        # Detaches the follower as well (see _follow_job).
+        self.job_id = ""
+        self.is_processing = False
+        self.job_status = ""
+        self.job_stage = ""
+        self.processing_progress = 0
+        return rx.toast.info("Split cancelled")
 
+    @rx.event(background=True)
+    async def resume_job(self):
+        """On page load, re-attach to this tab's queued or running split,
+        e.g. after a reload or a server restart."""
         async with self:
-            if not self.generated_segments or self.is_zipping:
+            if self.job_id in _followed_jobs:
+                # Still followed by the split_video that submitted it.
                 return
-            self.is_zipping = True
-        try:
+            token = self.router.session.client_token
+        job = await get_job_queue().active_job(token)
+        if job is None:
             async with self:
-                segments = self.generated_segments
-                original_name = (
-                    Path(self.video_metadata.filename).stem
-                    if self.video_metadata
-                    else "video"
-                )
-            upload_dir = rx.get_upload_dir()
-            zip_filename = f"{original_name}_all_parts.zip"
-            zip_path = upload_dir / zip_filename
-            with zipfile.ZipFile(zip_path, "w") as zipf:
-                for seg in segments:
-                    file_to_add = Path(seg.file_path)
-                    if file_to_add.exists():
-                        zipf.write(file_to_add, arcname=seg.filename)
+                if self.job_id:
+                    # Followed by a process that is gone, and finished since.
+                    self.job_id = ""
+                    self.is_processing = False
+                    self.job_status = ""
+            return
+        async with self:
+            self.video_metadata = VideoMetadata(**job.params["metadata"])
+            self.segment_count = job.params["segment_count"]
+            self.split_mode = job.params["split_mode"]
+            self.encode_profile = job.params.get("profile", DEFAULT_ENCODE_PROFILE)
+            self.cut_mode = job.params.get("cut_mode", "equal")
+            self.split_by = job.params.get("split_by", "count")
+            if self.split_by == "duration":
+                self.target_seconds = int(job.params["target"])
+            elif self.split_by == "size":
+                self.target_mb = int(job.params["target"])
+            self.job_id = job.id
+            self.is_processing = True
+            self._set_segments([])
+        async for event in self._follow_job(job.id):
+            yield event
+
+    async def _follow_job(self, job_id: str):
+        """Mirror the job's state into this session until it finishes.
+
+        Parts show up in the clip grid as they are finished, without
+        download links until the whole split is done."""
+        _followed_jobs.add(job_id)
+        upload_dir = rx.get_upload_dir()
+        api_url = str(get_config().api_url or "http://localhost:8000")
+        # Finished parts by index, and how many job outputs have been read.
+        finished: dict[int, VideoSegment] = {}
+        seen = 0
+        try:
+            async for job in get_job_queue().watch(job_id):
+                if job.status == "running" and job.outputs > seen:
+                    records = await get_job_queue().outputs(job_id, seen)
+                    seen += len(records)
+                    for record in records:
+                        spec = SegmentSpec.from_record(record)
+                        finished[spec.index] = _segment_from_spec(
+                            spec, api_url, upload_dir, job.params["stem"], ready=False
+                        )
+                    async with self:
+                        if self.job_id != job_id:
+                            return
+                        self._set_segments([finished[i] for i in sorted(finished)])
+                async with self:
+                    if self.job_id != job_id:
+                        # Another split replaced this one.
+                        return
+                    self.job_status = job.status
+                    self.queue_position = job.position
+                    self.processing_progress = int(job.progress * 100)
+                    detail = job.detail or {}
+                    self.job_stage = detail.get("stage", "")
+                    self.encoded_seconds = detail.get("encoded", 0.0)
+                    self.encode_fps = detail.get("fps", 0.0)
+                    self.encode_speed = detail.get("speed", 0.0)
+                    eta = detail.get("eta")
+                    self.eta_seconds = -1.0 if eta is None else eta
+                if job.status == "done":
+                    specs = [SegmentSpec.from_record(r) for r in job.result["segments"]]
+                    async with self:
+                        self._show_segments(
+                            job.result["cache_key"], specs, job.params["stem"]
+                        )
+                    yield VideoState.load_encode_speeds
+                    yield rx.toast.success("Video split successfully!")
+                elif job.status == "failed":
+                    yield rx.toast.error(f"Error splitting video: {job.error}")
+                elif job.status == "cancelled":
+                    yield rx.toast.info("Split cancelled")
+        finally:
+            _followed_jobs.discard(job_id)
             async with self:
-                api_url = str(get_config().api_url or "http://localhost:8000")
-                self.zip_download_url = f"{api_url}/_upload/{zip_filename}"
-                self.is_zipping = False
-            yield rx.toast.success("ZIP archive created!")
-        except Exception as e:
-            import logging
+                if self.job_id == job_id:
+                    self.is_processing = False
+                    self.job_status = ""
+                    self.job_stage = ""
+
+    def _show_segments(self, cache_key: str, specs: list[SegmentSpec], stem: str):
+        upload_dir = rx.get_upload_dir()
+        api_url = str(get_config().api_url or "http://localhost:8000")
+        self._set_segments(
+            [_segment_from_spec(spec, api_url, upload_dir, stem) for spec in specs]
+        )
+        self.processing_progress = 100
+        self._zip_cache_key = cache_key
+        self._zip_stem = stem
+        # Kept in the cache while this tab shows them.
+        get_split_cache().lease(self.router.session.client_token, cache_key)
+
+    def _set_segments(self, segments: list[VideoSegment]):
+        """Replace the clips, staying on the current page if it still
+        exists."""
+        self._segments = segments
+        self.clip_count = len(segments)
+        self._show_clip_page(min(self.clip_page, _page_count(self.clip_count) - 1))
+
+    def _show_clip_page(self, page: int):
+        self.clip_page = page
+        start = page * CLIPS_PER_PAGE
+        shown = self._segments[start : start + CLIPS_PER_PAGE]
+        # Unchanged pages are not sent again, e.g. while parts of a
+        # running split land on later pages.
+        if shown != self.generated_segments:
+            self.generated_segments = shown
 
-            logging.exception(f"Error creating ZIP: {e}")
-            async with self:
-                self.is_zipping = False
-            yield rx.toast.error("Failed to create ZIP archive")
\ No newline at end of file
+    @rx.event
+    def next_clip_page(self):
+        self._show_clip_page(
+            min(self.clip_page + 1, _page_count(self.clip_count) - 1)
+        )
+
+    @rx.event
+    def prev_clip_page(self):
+        self._show_clip_page(max(self.clip_page - 1, 0))
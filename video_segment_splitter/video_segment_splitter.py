@@ -1,4 +1,11 @@
 import reflex as rx
+from video_segment_splitter.api.events import connected_tokens
+from video_segment_splitter.api.routes import api
+from video_segment_splitter.services.cpu_governor import get_cpu_governor
+from video_segment_splitter.services.jobs import get_job_queue
+from video_segment_splitter.services.split_cache import get_split_cache
+from video_segment_splitter.services.split_job import run_split_job
+from video_segment_splitter.services.system_sampler import get_system_sampler
 from video_segment_splitter.states.video_state import VideoState
 from video_segment_splitter.components.upload_zone import upload_zone
 from video_segment_splitter.components.metadata_card import metadata_card
@@ -9,6 +16,32 @@ from video_segment_splitter.components.system_monitor import (
 )
 
 
+def _page_button(icon: str, on_click: rx.EventHandler, disabled: rx.Var) -> rx.Component:
+    return rx.el.button(
+        rx.icon(icon, class_name="h-4 w-4"),
+        on_click=on_click,
+        disabled=disabled,
+        class_name="flex items-center justify-center h-9 w-9 bg-white border border-gray-200 rounded-xl text-gray-700 hover:bg-gray-100 disabled:opacity-40 disabled:cursor-not-allowed transition-all",
+    )
+
+
+def clip_pager() -> rx.Component:
+    return rx.el.div(
+        _page_button(
+            "chevron-left", VideoState.prev_clip_page, VideoState.clip_page == 0
+        ),
+        rx.el.span(
+            f"Page {VideoState.clip_page + 1} of {VideoState.clip_page_count}",
+            class_name="text-sm font-bold text-gray-500",
+        ),
+        _page_button(
+            "chevron-right",
+            VideoState.next_clip_page,
+            VideoState.clip_page + 1 >= VideoState.clip_page_count,
+        ),
+        class_name="flex items-center justify-center gap-4 mt-8",
+    )
+
 def index() -> rx.Component:
     return rx.el.main(
         rx.el.div(
@@ -60,42 +93,51 @@ def index() -> rx.Component:
                         rx.el.div(
                             rx.el.div(class_name="h-px bg-gray-100 w-full my-12"),
                             rx.el.div(
-                                rx.el.h3(
-                                    "Output Clips",
-                                    class_name="text-2xl font-black text-gray-900",
+                                rx.el.div(
+                                    rx.el.h3(
+                                        "Output Clips",
+                                        class_name="text-2xl font-black text-gray-900",
+                                    ),
+                                    rx.cond(
+                                        VideoState.clip_count > 0,
+                                        rx.el.span(
+                                            rx.cond(
+                                                VideoState.is_processing,
+                                                f"{VideoState.clip_count} ready so far",
+                                                f"{VideoState.clip_count} clips",
+                                            ),
+                                            class_name="text-sm font-bold text-gray-400",
+                                        ),
+                                    ),
+                                    class_name="flex items-baseline gap-3",
                                 ),
                                 rx.cond(
-                                    VideoState.generated_segments.length() > 0,
+                                    (VideoState.clip_count > 0)
+                                    & ~VideoState.is_processing,
                                     rx.cond(
-                                        VideoState.zip_download_url != "",
-                                        rx.el.a(
+                                        VideoState.is_zipping,
+                                        rx.el.div(
                                             rx.icon(
-                                                "archive", class_name="h-4 w-4 mr-2"
+                                                "squirrel",
+                                                class_name="h-4 w-4 animate-spin",
+                                            ),
+                                            rx.el.span(
+                                                f"Zipping {VideoState.zip_status} · {VideoState.zip_progress}%",
                                             ),
-                                            "Download ZIP Bundle",
-                                            href=VideoState.zip_download_url,
-                                            target="_blank",
-                                            class_name="flex items-center px-4 py-2 bg-blue-600 text-white rounded-xl text-sm font-bold hover:bg-blue-700 transition-all shadow-sm",
+                                            rx.el.button(
+                                                "Cancel",
+                                                on_click=VideoState.cancel_zip,
+                                                class_name="text-xs text-red-600 hover:text-red-800 underline",
+                                            ),
+                                            class_name="flex items-center gap-2 px-4 py-2 bg-gray-100 text-gray-700 rounded-xl text-sm font-bold",
                                         ),
                                         rx.el.button(
-                                            rx.cond(
-                                                VideoState.is_zipping,
-                                                rx.icon(
-                                                    "squirrel",
-                                                    class_name="h-4 w-4 animate-spin",
-                                                ),
-                                                rx.icon(
-                                                    "folder-archive",
-                                                    class_name="h-4 w-4 mr-2",
-                                                ),
-                                            ),
-                                            rx.cond(
-                                                VideoState.is_zipping,
-                                                "Creating...",
-                                                "Zip All Clips",
+                                            rx.icon(
+                                                "folder-archive",
+                                                class_name="h-4 w-4 mr-2",
                                             ),
-                                            on_click=VideoState.create_zip_download,
-                                            disabled=VideoState.is_zipping,
+                                            "Zip All Clips",
+                                            on_click=VideoState.download_zip,
                                             class_name="flex items-center px-4 py-2 bg-gray-100 text-gray-700 rounded-xl text-sm font-bold hover:bg-gray-200 transition-all",
                                         ),
                                     ),
@@ -103,52 +145,86 @@ def index() -> rx.Component:
                                 class_name="flex justify-between items-end mb-8",
                             ),
                             rx.cond(
-                                VideoState.generated_segments.length() > 0,
+                                VideoState.clip_count > 0,
                                 rx.el.div(
-                                    rx.foreach(
-                                        VideoState.generated_segments,
-                                        lambda segment, i: rx.el.div(
-                                            rx.el.div(
+                                    rx.el.div(
+                                        rx.foreach(
+                                            VideoState.generated_segments,
+                                            lambda segment: rx.el.div(
                                                 rx.el.div(
-                                                    rx.icon(
-                                                        "clapperboard",
-                                                        class_name="h-5 w-5 text-blue-600",
+                                                    rx.el.div(
+                                                        rx.icon(
+                                                            "clapperboard",
+                                                            class_name="h-5 w-5 text-blue-600",
+                                                        ),
+                                                        rx.el.span(
+                                                            f"PART {segment.number}",
+                                                            class_name="text-[10px] font-black text-blue-600 tracking-widest uppercase",
+                                                        ),
+                                                        class_name="flex items-center gap-2 mb-3 bg-blue-50 px-3 py-1 rounded-full w-fit",
                                                     ),
-                                                    rx.el.span(
-                                                        f"PART {i + 1}",
-                                                        class_name="text-[10px] font-black text-blue-600 tracking-widest uppercase",
+                                                    rx.el.h4(
+                                                        segment.filename,
+                                                        class_name="font-bold text-gray-900 text-sm truncate max-w-[200px] mb-1",
                                                     ),
-                                                    class_name="flex items-center gap-2 mb-3 bg-blue-50 px-3 py-1 rounded-full w-fit",
-                                                ),
-                                                rx.el.h4(
-                                                    segment.filename,
-                                                    class_name="font-bold text-gray-900 text-sm truncate max-w-[200px] mb-1",
-                                                ),
-                                                rx.el.div(
-                                                    rx.icon(
-                                                        "clock",
-                                                        class_name="h-3 w-3 mr-1",
+                                                    rx.el.div(
+                                                        rx.icon(
+                                                            "clock",
+                                                            class_name="h-3 w-3 mr-1",
+                                                        ),
+                                                        rx.el.span(
+                                                            segment.duration_formatted
+                                                        ),
+                                                        rx.el.span(
+                                                            segment.size_formatted,
+                                                            class_name="ml-2",
+                                                        ),
+                                                        class_name="flex items-center text-xs font-bold text-gray-400",
                                                     ),
                                                     rx.el.span(
-                                                        segment.duration_formatted
+                                                        segment.cut_range_formatted,
+                                                        class_name="text-[11px] font-mono text-gray-400 mt-1",
+                                                    ),
+                                                    rx.cond(
+                                                        segment.cut_range_formatted
+                                                        != segment.requested_range_formatted,
+                                                        rx.el.span(
+                                                            "requested "
+                                                            + segment.requested_range_formatted,
+                                                            class_name="text-[11px] font-mono text-amber-500",
+                                                        ),
                                                     ),
-                                                    class_name="flex items-center text-xs font-bold text-gray-400",
+                                                    class_name="flex flex-col flex-1",
                                                 ),
-                                                class_name="flex flex-col flex-1",
-                                            ),
-                                            rx.el.a(
-                                                rx.icon(
-                                                    "download", class_name="h-4 w-4"
+                                                rx.cond(
+                                                    segment.ready,
+                                                    rx.el.a(
+                                                        rx.icon(
+                                                            "download", class_name="h-4 w-4"
+                                                        ),
+                                                        href=segment.download_url,
+                                                        download=segment.filename,
+                                                        target="_blank",
+                                                        class_name="flex items-center justify-center h-10 w-10 bg-white border border-gray-200 rounded-xl text-gray-700 hover:bg-blue-600 hover:text-white hover:border-blue-600 transition-all duration-200",
+                                                    ),
+                                                    rx.el.div(
+                                                        rx.icon(
+                                                            "hourglass",
+                                                            class_name="h-4 w-4",
+                                                        ),
+                                                        title="Downloadable once the split is done",
+                                                        class_name="flex items-center justify-center h-10 w-10 bg-gray-50 border border-gray-100 rounded-xl text-gray-300",
+                                                    ),
                                                 ),
-                                                href=segment.download_url,
-                                                download=segment.filename,
-                                                target="_blank",
-                                                class_name="flex items-center justify-center h-10 w-10 bg-white border border-gray-200 rounded-xl text-gray-700 hover:bg-blue-600 hover:text-white hover:border-blue-600 transition-all duration-200",
+                                                class_name="flex items-center justify-between p-5 bg-white border border-gray-100 rounded-2xl hover:border-blue-200 hover:shadow-lg transition-all duration-300 animate-in fade-in slide-in-from-bottom-2",
                                             ),
-                                            class_name="flex items-center justify-between p-5 bg-white border border-gray-100 rounded-2xl hover:border-blue-200 hover:shadow-lg transition-all duration-300 animate-in fade-in slide-in-from-bottom-2",
                                         ),
+                                        class_name="grid grid-cols-1 md:grid-cols-2 gap-4 max-w-4xl mx-auto",
+                                    ),
+                                    rx.cond(
+                                        VideoState.clip_page_count > 1,
+                                        clip_pager(),
                                     ),
-                                    class_name="grid grid-cols-1 md:grid-cols-2 gap-4 max-w-4xl mx-auto",
                                 ),
                                 rx.el.div(
                                     rx.el.div(
@@ -172,7 +248,7 @@ def index() -> rx.Component:
             ),
             rx.el.footer(
                 rx.el.p(
-                    "© 2026 ClipShift. Powered by Reflex & MoviePy.",
+                    "© 2026 ClipShift. Powered by Reflex & FFmpeg.",
                     class_name="text-sm text-gray-400 font-medium",
                 ),
                 class_name="mt-24 pb-12 text-center",
@@ -187,7 +263,9 @@ def index() -> rx.Component:
 
 app = rx.App(
     theme=rx.theme(appearance="light"),
+    api_transformer=api,
     head_components=[
+        rx.script(src="/resumable_upload.js"),
         rx.el.link(rel="preconnect", href="https://fonts.googleapis.com"),
         rx.el.link(rel="preconnect", href="https://fonts.gstatic.com", cross_origin=""),
         rx.el.link(
@@ -196,4 +274,21 @@ app = rx.App(
         ),
     ],
 )
-app.add_page(index, route="/")
\ No newline at end of file
+job_queue = get_job_queue()
+job_queue.register("split", run_split_job)
+app.register_lifespan_task(job_queue.run_forever)
+app.register_lifespan_task(job_queue.watch_sessions, connected_owners=connected_tokens)
+app.register_lifespan_task(
+    get_split_cache().watch_sessions, connected_owners=connected_tokens
+)
+# The System Busy panel lists every running job with its resource usage.
+get_system_sampler().add_source("jobs", job_queue.store.running)
+app.register_lifespan_task(get_system_sampler().run_forever)
+# Adjusts the CPU budget of encodes with every system sample.
+get_system_sampler().add_source("governor", get_cpu_governor().status)
+app.register_lifespan_task(get_cpu_governor().run_forever, sampler=get_system_sampler())
+app.add_page(
+    index,
+    route="/",
+    on_load=[VideoState.resume_job, VideoState.load_encode_speeds],
+)
\ No newline at end of file